@@ -2,9 +2,10 @@
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Set, Tuple
+from typing import Dict, List, Mapping, Optional, Set
 
 from dotenv import load_dotenv
+import json
 import os
 
 
@@ -12,6 +13,10 @@ import os
 class GoogleSheetsConfig:
     sheet_id: str
     service_account_json: Path
+    write_behind: bool = False
+    projected_reads: bool = False
+    snapshot_ttl: float = 60.0
+    mirror_path: Optional[Path] = None
 
 
 @dataclass(frozen=True)
@@ -25,6 +30,10 @@ class TelegraphConfig:
 class VKConfig:
     user_access_token: str
     group_id: int
+    upload_url_ttl: float = 900.0
+    short_link_cache_path: Optional[Path] = None
+    short_link_ttl: float = 30 * 24 * 3600.0
+    scheduled_posts_path: Optional[Path] = None
 
 
 @dataclass(frozen=True)
@@ -33,6 +42,56 @@ class TelegramConfig:
     channel_username: str
 
 
+@dataclass(frozen=True)
+class ImageCacheConfig:
+    directory: Path
+    max_bytes: int
+    fresh_seconds: float
+    normalize: bool = False
+    workers: int = 2
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    vk_per_second: float = 3.0
+    telegram_per_minute: float = 20.0
+    telegraph_per_minute: float = 60.0
+    sheets_per_minute: float = 60.0
+
+
+@dataclass(frozen=True)
+class ScheduleConfig:
+    timezone: str = "Europe/Moscow"
+    rss: str = "0 8,20 * * *"
+    vk: str = "0 18 * * *"
+    setka: str = "0 18 * * *"
+    state_path: Optional[Path] = None
+    catch_up_hours: float = 6.0
+    flow_workers: int = 3
+    drain_seconds: float = 120.0
+    warmup_minutes: float = 0.0
+    publish_at_scan: str = ""
+    vk_push: str = "0 4 * * *"
+    vk_reconcile: str = "*/15 * * * *"
+    vk_push_horizon_hours: float = 24.0
+
+
+@dataclass(frozen=True)
+class QueueConfig:
+    path: Path
+    workers: int = 1
+    scan_interval: float = 300.0
+    visibility_timeout: float = 600.0
+    max_attempts: int = 3
+
+
+@dataclass(frozen=True)
+class RetryConfig:
+    budget_per_flow: int = 20
+    breaker_threshold: int = 5
+    breaker_reset_seconds: float = 60.0
+
+
 @dataclass(frozen=True)
 class AppConfig:
     google: GoogleSheetsConfig
@@ -41,51 +100,109 @@ class AppConfig:
     telegram: TelegramConfig
     log_level: str
     rss_use_average_post: bool
-    vk_schedule_days: Set[int]
-    setka_schedule_days: Set[int]
-    rss_hours: Tuple[int, int]
-    vk_hour: int
-    setka_hour: int
+    rss_batch_size: int
+    rss_post_interval: float
+    schedule: ScheduleConfig
     run_on_start: bool
+    image_cache: Optional[ImageCacheConfig]
+    rate_limits: RateLimitConfig
+    retry: RetryConfig
+    journal_path: Optional[Path] = None
+    queue: Optional[QueueConfig] = None
+    stage_workers: int = 4
+    async_http: bool = False
+    async_http_connections: int = 100
+
+
+@dataclass(frozen=True)
+class TenantSpec:
+    name: str
+    env: Dict[str, str]
 
 
-def _require(env_name: str) -> str:
+# Файлы локального состояния клиента: путь из общего .env у каждого клиента свой (в подкаталоге с его именем).
+# Кэши изображений и коротких ссылок тоже разводятся: закрепление файлов кэша действует только внутри процесса
+TENANT_STATE_PATHS = (
+    "PUBLISH_JOURNAL_PATH",
+    "SHEETS_MIRROR_PATH",
+    "QUEUE_PATH",
+    "VK_SCHEDULED_POSTS_PATH",
+    "IMAGE_CACHE_DIR",
+    "VK_SHORT_LINK_CACHE_PATH",
+)
+
+
+def _require(env: Mapping[str, str], env_name: str) -> str:
     """Возвращает обязательную переменную окружения."""
-    value = os.getenv(env_name)
+    value = env.get(env_name)
     if not value:
         raise ValueError(f"Переменная окружения {env_name} не задана")
     return value
 
 
-def load_config() -> AppConfig:
-    """Загружает конфигурацию из окружения."""
+def load_config(overrides: Optional[Mapping[str, str]] = None, tenant: Optional[str] = None) -> AppConfig:
+    """Загружает конфигурацию из окружения; overrides (настройки клиента) имеют приоритет.
+
+    Для клиента tenant унаследованные из общего окружения пути TENANT_STATE_PATHS
+    переносятся в подкаталог с его именем, чтобы клиенты не делили файлы состояния.
+    """
     load_dotenv()
+    env: Dict[str, str] = {**os.environ, **(overrides or {})}
+    if tenant is not None:
+        for name in TENANT_STATE_PATHS:
+            path = _optional_path(env.get(name, ""))
+            if path is not None and name not in (overrides or {}):
+                env[name] = str(path.parent / tenant / path.name)
 
     google = GoogleSheetsConfig(
-        sheet_id=_require("GOOGLE_SHEET_ID"),
-        service_account_json=_resolve_path(_require("GOOGLE_SERVICE_ACCOUNT_JSON")),
+        sheet_id=_require(env, "GOOGLE_SHEET_ID"),
+        service_account_json=_resolve_path(_require(env, "GOOGLE_SERVICE_ACCOUNT_JSON")),
+        write_behind=_parse_bool(env.get("SHEETS_WRITE_BEHIND", "false")),
+        projected_reads=_parse_bool(env.get("SHEETS_PROJECTED_READS", "false")),
+        snapshot_ttl=float(env.get("SHEETS_SNAPSHOT_TTL", "60")),
+        mirror_path=_optional_path(env.get("SHEETS_MIRROR_PATH", "")),
     )
 
     telegraph = TelegraphConfig(
-        access_token=os.getenv("TELEGRAPH_ACCESS_TOKEN"),
-        author_name=_require("TELEGRAPH_AUTHOR_NAME"),
-        author_url=_require("TELEGRAPH_AUTHOR_URL"),
+        access_token=env.get("TELEGRAPH_ACCESS_TOKEN"),
+        author_name=_require(env, "TELEGRAPH_AUTHOR_NAME"),
+        author_url=_require(env, "TELEGRAPH_AUTHOR_URL"),
     )
 
     vk = VKConfig(
-        user_access_token=_require("VK_USER_ACCESS_TOKEN"),
-        group_id=int(_require("VK_GROUP_ID")),
+        user_access_token=_require(env, "VK_USER_ACCESS_TOKEN"),
+        group_id=int(_require(env, "VK_GROUP_ID")),
+        upload_url_ttl=float(env.get("VK_UPLOAD_URL_TTL", "900")),
+        short_link_cache_path=_optional_path(env.get("VK_SHORT_LINK_CACHE_PATH", "")),
+        short_link_ttl=float(env.get("VK_SHORT_LINK_TTL_DAYS", "30")) * 24 * 3600,
+        scheduled_posts_path=_optional_path(env.get("VK_SCHEDULED_POSTS_PATH", "")),
     )
 
     telegram = TelegramConfig(
-        bot_token=_require("TELEGRAM_BOT_TOKEN"),
-        channel_username=_require("TELEGRAM_CHANNEL_USERNAME"),
+        bot_token=_require(env, "TELEGRAM_BOT_TOKEN"),
+        channel_username=_require(env, "TELEGRAM_CHANNEL_USERNAME"),
     )
 
-    log_level = os.getenv("LOG_LEVEL", "INFO")
+    log_level = env.get("LOG_LEVEL", "INFO")
 
-    vk_days = _parse_publish_days(os.getenv("VK_PUBLISH_DAYS", "mon,tue,wed,thu,fri,sat,sun"))
-    setka_days = _parse_publish_days(os.getenv("SETKA_PUBLISH_DAYS", "mon,tue,wed,thu,fri,sat,sun"))
+    vk_days = _parse_publish_days(env.get("VK_PUBLISH_DAYS", "mon,tue,wed,thu,fri,sat,sun"))
+    setka_days = _parse_publish_days(env.get("SETKA_PUBLISH_DAYS", "mon,tue,wed,thu,fri,sat,sun"))
+    schedule = ScheduleConfig(
+        timezone=env.get("SCHEDULE_TIMEZONE") or "Europe/Moscow",
+        rss=(env.get("RSS_SCHEDULE") or "0 8,20 * * *").strip(),
+        # Без явного cron дни публикации берутся из VK_PUBLISH_DAYS / SETKA_PUBLISH_DAYS
+        vk=(env.get("VK_SCHEDULE") or f"0 18 * * {_cron_weekdays(vk_days)}").strip(),
+        setka=(env.get("SETKA_SCHEDULE") or f"0 18 * * {_cron_weekdays(setka_days)}").strip(),
+        state_path=_optional_path(env.get("SCHEDULE_STATE_PATH", "")),
+        catch_up_hours=float(env.get("SCHEDULE_CATCH_UP_HOURS", "6")),
+        flow_workers=max(1, int(env.get("FLOW_WORKERS", "3"))),
+        drain_seconds=float(env.get("FLOW_DRAIN_SECONDS", "120")),
+        warmup_minutes=max(0.0, float(env.get("WARMUP_MINUTES", "0"))),
+        publish_at_scan=env.get("PUBLISH_AT_SCAN_SCHEDULE", "").strip(),
+        vk_push=(env.get("VK_SCHEDULED_PUSH_SCHEDULE") or "0 4 * * *").strip(),
+        vk_reconcile=(env.get("VK_SCHEDULED_RECONCILE_SCHEDULE") or "*/15 * * * *").strip(),
+        vk_push_horizon_hours=float(env.get("VK_SCHEDULED_HORIZON_HOURS", "24")),
+    )
 
     return AppConfig(
         google=google,
@@ -93,13 +210,98 @@ def load_config() -> AppConfig:
         vk=vk,
         telegram=telegram,
         log_level=log_level,
-        rss_use_average_post=_parse_bool(os.getenv("RSS_USE_AVERAGE_POST", "false")),
-        vk_schedule_days=vk_days,
-        setka_schedule_days=setka_days,
-        rss_hours=(8, 20),
-        vk_hour=18,
-        setka_hour=18,
-        run_on_start=_parse_bool(os.getenv("RUN_ON_START", "false")),
+        rss_use_average_post=_parse_bool(env.get("RSS_USE_AVERAGE_POST", "false")),
+        rss_batch_size=int(env.get("RSS_BATCH_SIZE", "1")),
+        rss_post_interval=float(env.get("RSS_POST_INTERVAL_SECONDS", "0")),
+        schedule=schedule,
+        run_on_start=_parse_bool(env.get("RUN_ON_START", "false")),
+        image_cache=_load_image_cache_config(env),
+        rate_limits=RateLimitConfig(
+            vk_per_second=float(env.get("RATE_LIMIT_VK_PER_SECOND", "3")),
+            telegram_per_minute=float(env.get("RATE_LIMIT_TELEGRAM_PER_MINUTE", "20")),
+            telegraph_per_minute=float(env.get("RATE_LIMIT_TELEGRAPH_PER_MINUTE", "60")),
+            sheets_per_minute=float(env.get("RATE_LIMIT_SHEETS_PER_MINUTE", "60")),
+        ),
+        retry=RetryConfig(
+            budget_per_flow=int(env.get("RETRY_BUDGET_PER_FLOW", "20")),
+            breaker_threshold=max(1, int(env.get("CIRCUIT_BREAKER_THRESHOLD", "5"))),
+            breaker_reset_seconds=float(env.get("CIRCUIT_BREAKER_RESET_SECONDS", "60")),
+        ),
+        journal_path=_optional_path(env.get("PUBLISH_JOURNAL_PATH", "")),
+        queue=_load_queue_config(env),
+        stage_workers=max(1, int(env.get("STAGE_WORKERS", "4"))),
+        async_http=_parse_bool(env.get("ASYNC_HTTP", "false")),
+        async_http_connections=max(1, int(env.get("ASYNC_HTTP_CONNECTIONS", "100"))),
+    )
+
+
+def load_tenants(path: Path) -> List[TenantSpec]:
+    """Читает JSON-список клиентов: имя и переменные окружения, переопределяющие общий .env."""
+    with path.open(encoding="utf-8") as handle:
+        raw = json.load(handle)
+    if isinstance(raw, dict):
+        raw = raw.get("tenants", [])
+    tenants: List[TenantSpec] = []
+    for index, item in enumerate(raw):
+        name = str(item.get("name", "")).strip()
+        if not name:
+            raise ValueError(f"У клиента №{index + 1} в {path} не задано имя")
+        if any(tenant.name == name for tenant in tenants):
+            raise ValueError(f"Клиент {name} указан в {path} несколько раз")
+        tenants.append(TenantSpec(name, {key: str(value) for key, value in item.get("env", {}).items()}))
+    if not tenants:
+        raise ValueError(f"В {path} не указано ни одного клиента")
+    return tenants
+
+
+def check_tenant_state_paths(configs: Mapping[str, AppConfig]) -> None:
+    """Проверяет, что файлы состояния клиентов (журнал, зеркало, очередь, отложенные посты, кэши) не совпадают."""
+    owners: Dict[Path, str] = {}
+    for name, config in configs.items():
+        paths = (
+            config.journal_path,
+            config.google.mirror_path,
+            config.queue.path if config.queue is not None else None,
+            config.vk.scheduled_posts_path,
+            config.image_cache.directory if config.image_cache is not None else None,
+            config.vk.short_link_cache_path,
+        )
+        for path in paths:
+            if path is None:
+                continue
+            owner = owners.setdefault(path.resolve(), name)
+            if owner != name:
+                raise ValueError(f"Клиенты {owner} и {name} используют один файл состояния {path}")
+
+
+def _load_image_cache_config(env: Mapping[str, str]) -> Optional[ImageCacheConfig]:
+    """Читает настройки дискового кэша изображений; без IMAGE_CACHE_DIR кэш отключён."""
+    directory = _optional_path(env.get("IMAGE_CACHE_DIR", ""))
+    normalize = _parse_bool(env.get("IMAGE_NORMALIZE", "false"))
+    if directory is None:
+        if normalize:
+            raise ValueError("IMAGE_NORMALIZE требует IMAGE_CACHE_DIR: обработанные изображения хранятся в кэше")
+        return None
+    return ImageCacheConfig(
+        directory=directory,
+        max_bytes=int(float(env.get("IMAGE_CACHE_MAX_MB", "500")) * 1024 * 1024),
+        fresh_seconds=float(env.get("IMAGE_CACHE_FRESH_SECONDS", "3600")),
+        normalize=normalize,
+        workers=max(1, int(env.get("IMAGE_WORKERS", "2"))),
+    )
+
+
+def _load_queue_config(env: Mapping[str, str]) -> Optional[QueueConfig]:
+    """Читает настройки очереди публикаций; без QUEUE_PATH строки читаются из таблицы в момент публикации."""
+    path = _optional_path(env.get("QUEUE_PATH", ""))
+    if path is None:
+        return None
+    return QueueConfig(
+        path=path,
+        workers=max(1, int(env.get("QUEUE_WORKERS", "1"))),
+        scan_interval=float(env.get("QUEUE_SCAN_INTERVAL_SECONDS", "300")),
+        visibility_timeout=float(env.get("QUEUE_VISIBILITY_TIMEOUT_SECONDS", "600")),
+        max_attempts=max(1, int(env.get("QUEUE_MAX_ATTEMPTS", "3"))),
     )
 
 
@@ -137,10 +339,23 @@ def _parse_publish_days(raw: str) -> Set[int]:
     return result
 
 
+def _cron_weekdays(days: Set[int]) -> str:
+    """Переводит дни недели (0=понедельник) в поле cron (0=воскресенье)."""
+    if len(days) == 7:
+        return "*"
+    return ",".join(str((day + 1) % 7) for day in sorted(days))
+
+
 def _parse_bool(raw: str) -> bool:
     return raw.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _optional_path(raw: str) -> Optional[Path]:
+    """Возвращает путь к локальному файлу состояния или None, если он не задан."""
+    value = raw.strip()
+    return Path(value).expanduser() if value else None
+
+
 def _resolve_path(raw: str) -> Path:
     """Находит существующий путь к файлу сервисного аккаунта."""
     primary = Path(raw).expanduser()
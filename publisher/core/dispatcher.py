@@ -0,0 +1,94 @@
+"""Запуск флоу в пуле фоновых потоков с ограничением параллельности."""
+
+import contextvars
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from publisher.core.logger import get_logger
+
+# Флоу в очереди пула: ключ, функция, контекст вызывающего кода и обработчик успешного завершения
+_Task = Tuple[str, Callable[[], None], contextvars.Context, Optional[Callable[[], None]]]
+
+
+class FlowDispatcher:
+    """Выполняет флоу в пуле из max_workers фоновых потоков, не более одного флоу на ключ.
+
+    Планировщик не ждёт завершения флоу, поэтому медленный или зависший флоу не задерживает
+    остальные. Флоу сверх max_workers ждут свободного потока в очереди; после drain ждущие
+    флоу не запускаются. Потоки — демоны: после истечения времени drain процесс может
+    завершиться, не дожидаясь зависшего запроса.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self._queue: "queue.Queue[_Task]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        # Принятые флоу: ключ -> запущен ли (False — ждёт свободного потока)
+        self._running: Dict[str, bool] = {}
+        self._closed = False
+        self._logger = get_logger("publisher.dispatcher")
+        for index in range(max(1, max_workers)):
+            threading.Thread(target=self._work, name=f"flow-worker-{index + 1}", daemon=True).start()
+
+    def busy(self, key: str) -> bool:
+        """Проверяет, выполняется ли (или ждёт свободного потока) флоу с этим ключом."""
+        with self._lock:
+            return key in self._running
+
+    def submit(self, key: str, func: Callable[[], None], on_done: Optional[Callable[[], None]] = None) -> bool:
+        """Ставит флоу в очередь пула; False, если флоу с этим ключом ещё выполняется или приём остановлен.
+
+        on_done вызывается в потоке флоу, только если флоу запустился и завершился без исключения.
+        """
+        with self._lock:
+            if self._closed or key in self._running:
+                return False
+            self._running[key] = False
+        # Флоу наследует контекст логирования (имя клиента) вызывающего кода
+        self._queue.put((key, func, contextvars.copy_context(), on_done))
+        return True
+
+    def drain(self, timeout: float) -> bool:
+        """Прекращает приём и запуск новых флоу и ждёт выполняющиеся не дольше timeout; True, если все завершились."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._closed = True
+            dropped = sorted(key for key, started in self._running.items() if not started)
+            for key in dropped:
+                del self._running[key]
+            if dropped:
+                self._logger.warning("Ожидавшие флоу не будут запущены", extra={"flows": dropped})
+            if self._running:
+                self._logger.info("Ожидание завершения флоу", extra={"flows": sorted(self._running), "timeout": timeout})
+            while self._running and time.monotonic() < deadline:
+                self._idle.wait(deadline - time.monotonic())
+            unfinished = sorted(self._running)
+        if unfinished:
+            self._logger.warning("Флоу не завершились за отведённое время", extra={"flows": unfinished})
+        return not unfinished
+
+    def _work(self) -> None:
+        while True:
+            key, func, context, on_done = self._queue.get()
+            with self._lock:
+                # Флоу, снятый drain, пока ждал свободного потока, не запускается
+                if self._closed or key not in self._running:
+                    self._running.pop(key, None)
+                    self._idle.notify_all()
+                    continue
+                self._running[key] = True
+            context.run(self._run, key, func, on_done)
+
+    def _run(self, key: str, func: Callable[[], None], on_done: Optional[Callable[[], None]]) -> None:
+        try:
+            func()
+            if on_done is not None:
+                on_done()
+        except Exception as exc:  # noqa: BLE001
+            self._logger.error("Флоу завершился ошибкой", extra={"flow": key, "error": str(exc)})
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+                self._idle.notify_all()
@@ -0,0 +1,97 @@
+"""Общий пул HTTP-соединений клиентов площадок: сессия requests и асинхронный клиент httpx."""
+
+import asyncio
+from concurrent.futures import Future
+import contextvars
+import functools
+import threading
+from typing import Any, Awaitable, TypeVar
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Соединений на хост: с запасом на параллельные флоу и этапы публикации всех клиентов процесса
+POOL_SIZE = 32
+
+T = TypeVar("T")
+
+
+def create_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """Создаёт сессию с пулом keep-alive соединений, общую для клиентов площадок процесса."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def create_async_http_client(max_connections: int = 100, timeout: float = 20.0) -> httpx.AsyncClient:
+    """Создаёт AsyncClient с пулом keep-alive соединений для всех асинхронных клиентов."""
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+class EventLoopThread:
+    """Event loop в фоновом потоке: в нём выполняются запросы асинхронных клиентов всех клиентов процесса."""
+
+    def __init__(self, name: str = "publisher-http") -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Выполняет корутину в event loop и ждёт результата, блокируя вызывающий поток.
+
+        Задача получает контекст вызывающего потока: клиент (предохранители), запас повторов флоу и поля логов.
+        """
+        context = contextvars.copy_context()
+        result: "Future[T]" = Future()
+
+        def start() -> None:
+            task = self._loop.create_task(coro, context=context)
+            task.add_done_callback(functools.partial(_copy_outcome, result))
+
+        self._loop.call_soon_threadsafe(start)
+        return result.result()
+
+    def close(self) -> None:
+        """Останавливает event loop и его поток."""
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def _copy_outcome(result: "Future[Any]", task: "asyncio.Task[Any]") -> None:
+    """Передаёт результат задачи event loop ожидающему потоку."""
+    if task.cancelled():
+        result.cancel()
+    elif task.exception() is not None:
+        result.set_exception(task.exception())
+    else:
+        result.set_result(task.result())
+
+
+class BlockingClient:
+    """Синхронный интерфейс асинхронного клиента площадки: корутины выполняются в общем event loop.
+
+    Так PublisherService со всеми своими сценариями (журнал, очередь, Publish At, отложенные посты)
+    работает с асинхронными клиентами, а запросы всех потоков делят один пул соединений httpx.
+    """
+
+    def __init__(self, client: Any, loop: EventLoopThread) -> None:
+        self._client = client
+        self._loop = loop
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._client, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args: Any, **kwargs: Any) -> Any:
+            return self._loop.run(attribute(*args, **kwargs))
+
+        return call
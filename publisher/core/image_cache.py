@@ -0,0 +1,246 @@
+"""Дисковый кэш изображений с адресацией по содержимому и вытеснением LRU."""
+
+import asyncio
+from dataclasses import dataclass
+import hashlib
+import os
+from pathlib import Path
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, Optional
+
+import httpx
+import requests
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    validated_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_access ON images (last_access);
+"""
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    path: Path
+    content_type: Optional[str]
+    sha256: str
+    size: int
+
+
+class ImageCache:
+    """Хранит изображения по URL: файлы адресуются хэшем содержимого, индекс лежит в SQLite.
+
+    Изображение, полученное с pin=True, закреплено до release: вытеснение не удаляет его файл
+    и обработанные версии, пока поток, получивший путь, ещё работает с ним.
+    """
+
+    # Изображения крупнее этого размера при асинхронном скачивании буферизуются на диске
+    SPOOL_MAX_SIZE = 1024 * 1024
+
+    def __init__(self, directory: Path, max_bytes: int, fresh_seconds: float = 3600.0) -> None:
+        self._directory = directory
+        self._blobs = directory / "blobs"
+        self._blobs.mkdir(parents=True, exist_ok=True)
+        self._variants = directory / "variants"
+        self._variants.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._fresh_seconds = fresh_seconds
+        self._lock = threading.Lock()
+        # sha256 -> число потоков, работающих с файлом изображения
+        self._pins: Dict[str, int] = {}
+        self._connection = sqlite3.connect(str(directory / "index.sqlite3"), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def fresh(self, url: str, pin: bool = False) -> Optional[CachedImage]:
+        """Возвращает изображение без запроса к источнику, если оно проверялось недавно."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sha256, content_type, size, validated_at FROM images WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or time.time() - row[3] > self._fresh_seconds:
+            return None
+        return self._hit(url, pin)
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Возвращает заголовки условного запроса (If-None-Match / If-Modified-Since)."""
+        with self._lock:
+            row = self._connection.execute("SELECT etag, last_modified FROM images WHERE url = ?", (url,)).fetchone()
+        headers: Dict[str, str] = {}
+        if row is None:
+            return headers
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def revalidated(self, url: str, pin: bool = False) -> Optional[CachedImage]:
+        """Отмечает, что источник ответил 304, и возвращает сохранённую копию."""
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE images SET validated_at = ? WHERE url = ?", (time.time(), url))
+        return self._hit(url, pin)
+
+    def store(
+        self,
+        url: str,
+        chunks: Iterable[bytes],
+        content_type: Optional[str],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        pin: bool = False,
+    ) -> CachedImage:
+        """Сохраняет содержимое изображения и обновляет индекс."""
+        digest = hashlib.sha256()
+        size = 0
+        handle, temp_name = tempfile.mkstemp(dir=self._blobs, prefix=".partial-")
+        try:
+            with os.fdopen(handle, "wb") as target:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    target.write(chunk)
+            sha256 = digest.hexdigest()
+            os.replace(temp_name, self._blob_path(sha256))
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, sha256, content_type, etag, last_modified, size, now, now),
+            )
+            if pin:
+                self._pin(sha256)
+        self._evict(keep=sha256)
+        return CachedImage(self._blob_path(sha256), content_type, sha256, size)
+
+    def fetch(self, url: str, session: requests.Session, timeout: float = 20, pin: bool = False) -> CachedImage:
+        """Возвращает изображение из кэша, при необходимости скачивая или перепроверяя его.
+
+        С pin=True изображение закрепляется; вызывающий код освобождает его через release.
+        """
+        cached = self.fresh(url, pin)
+        if cached is not None:
+            return cached
+        response = session.get(url, headers=self.validators(url), stream=True, timeout=timeout)
+        response.raise_for_status()
+        if response.status_code == 304:
+            cached = self.revalidated(url, pin)
+            if cached is not None:
+                return cached
+            response = session.get(url, stream=True, timeout=timeout)
+            response.raise_for_status()
+        return self.store(
+            url,
+            response.iter_content(chunk_size=64 * 1024),
+            response.headers.get("Content-Type"),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            pin,
+        )
+
+    async def fetch_async(
+        self, url: str, http: httpx.AsyncClient, timeout: float = 20, pin: bool = False
+    ) -> CachedImage:
+        """Асинхронный вариант fetch: скачивание не блокирует event loop, запись на диск идёт в потоке."""
+        cached = self.fresh(url, pin)
+        if cached is not None:
+            return cached
+        with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE) as spool:
+            response = await self._download_async(http, url, spool, self.validators(url), timeout)
+            if response.status_code == 304:
+                cached = self.revalidated(url, pin)
+                if cached is not None:
+                    return cached
+                response = await self._download_async(http, url, spool, {}, timeout)
+            spool.seek(0)
+            return await asyncio.to_thread(
+                self.store,
+                url,
+                iter(lambda: spool.read(64 * 1024), b""),
+                response.headers.get("Content-Type"),
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                pin,
+            )
+
+    def release(self, image: CachedImage) -> None:
+        """Снимает закрепление, полученное через pin=True."""
+        with self._lock:
+            count = self._pins.get(image.sha256, 0) - 1
+            if count > 0:
+                self._pins[image.sha256] = count
+            else:
+                self._pins.pop(image.sha256, None)
+
+    @staticmethod
+    async def _download_async(
+        http: httpx.AsyncClient, url: str, target: BinaryIO, headers: Dict[str, str], timeout: float
+    ) -> httpx.Response:
+        """Скачивает изображение кусками в target; ответ 304 возвращается без тела."""
+        target.seek(0)
+        target.truncate()
+        async with http.stream("GET", url, headers=headers, timeout=timeout) as response:
+            if response.status_code != 304:
+                response.raise_for_status()
+            async for chunk in response.aiter_bytes(64 * 1024):
+                target.write(chunk)
+        return response
+
+    def _hit(self, url: str, pin: bool = False) -> Optional[CachedImage]:
+        """Обновляет время доступа и возвращает запись, если файл на месте."""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT sha256, content_type, size FROM images WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            path = self._blob_path(row[0])
+            if not path.exists():
+                self._connection.execute("DELETE FROM images WHERE url = ?", (url,))
+                return None
+            self._connection.execute("UPDATE images SET last_access = ? WHERE url = ?", (time.time(), url))
+            if pin:
+                self._pin(row[0])
+        return CachedImage(path, row[1], row[0], row[2])
+
+    def _evict(self, keep: str) -> None:
+        """Удаляет давно не использованные изображения, пока кэш превышает лимит; закреплённые не трогает."""
+        with self._lock, self._connection:
+            blobs = self._connection.execute(
+                "SELECT sha256, MAX(size), MAX(last_access) FROM images GROUP BY sha256 ORDER BY MAX(last_access)"
+            ).fetchall()
+            total = sum(size for _, size, _ in blobs)
+            for sha256, size, _ in blobs:
+                if total <= self._max_bytes:
+                    break
+                if sha256 == keep or sha256 in self._pins:
+                    continue
+                self._connection.execute("DELETE FROM images WHERE sha256 = ?", (sha256,))
+                self._blob_path(sha256).unlink(missing_ok=True)
+                for variant in self._variants.glob(f"{sha256}-*"):
+                    variant.unlink(missing_ok=True)
+                total -= size
+
+    def variant_path(self, sha256: str, profile: str) -> Path:
+        """Путь к обработанной версии изображения; удаляется вместе с исходником."""
+        return self._variants / f"{sha256}-{profile}.jpg"
+
+    def _pin(self, sha256: str) -> None:
+        """Закрепляет изображение; вызывается под self._lock."""
+        self._pins[sha256] = self._pins.get(sha256, 0) + 1
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self._blobs / sha256
@@ -0,0 +1,105 @@
+"""Подготовка изображений перед загрузкой: уменьшение, пережатие и конвертация в JPEG."""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import multiprocessing
+import os
+import threading
+from typing import Optional, Set, Tuple
+
+from PIL import Image, ImageOps
+
+try:  # pragma: no cover - зависит от окружения
+    # Pillow 10 без плагина не открывает AVIF
+    import pillow_avif  # noqa: F401
+except ImportError:  # pragma: no cover
+    pillow_avif = None
+
+from publisher.core.image_cache import CachedImage, ImageCache
+from publisher.core.logger import get_logger
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    name: str
+    max_side: int
+    quality: int
+    max_bytes: int
+
+
+VK_PHOTO_PROFILE = ImageProfile("vk", max_side=2560, quality=87, max_bytes=2 * 1024 * 1024)
+TELEGRAM_PHOTO_PROFILE = ImageProfile("telegram", max_side=1280, quality=85, max_bytes=1024 * 1024)
+
+
+def normalize_file(source: str, target: str, max_side: int, quality: int, max_bytes: int) -> bool:
+    """Пережимает изображение в JPEG; False означает, что исходник уже подходит под профиль."""
+    with Image.open(source) as image:
+        if image.format == "JPEG" and max(image.size) <= max_side and os.path.getsize(source) <= max_bytes:
+            return False
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            # Прозрачность накладывается на белый фон, JPEG её не поддерживает
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        partial = f"{target}.{os.getpid()}.partial"
+        image.save(partial, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(partial, target)
+    return True
+
+
+class ImageNormalizer:
+    """Готовит изображения под профиль площадки в пуле процессов и кэширует результат."""
+
+    def __init__(self, cache: ImageCache, workers: int = 2) -> None:
+        self._cache = cache
+        self._workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._originals: Set[Tuple[str, str]] = set()
+        self._logger = get_logger("publisher.images")
+
+    def normalize(self, image: CachedImage, profile: ImageProfile) -> CachedImage:
+        """Возвращает версию изображения для профиля; при ошибке обработки — исходное изображение."""
+        key = (image.sha256, profile.name)
+        if key in self._originals:
+            return image
+        target = self._cache.variant_path(image.sha256, profile.name)
+        if not target.exists():
+            try:
+                future = self._executor().submit(
+                    normalize_file, str(image.path), str(target), profile.max_side, profile.quality, profile.max_bytes
+                )
+                if not future.result():
+                    self._originals.add(key)
+                    return image
+            except Exception as exc:  # noqa: BLE001
+                if (image.content_type or "").startswith("image/avif") and pillow_avif is None:
+                    self._logger.warning(
+                        "AVIF не поддерживается без pillow-avif-plugin, используется исходное изображение",
+                        extra={"sha256": image.sha256, "profile": profile.name},
+                    )
+                    return image
+                self._logger.warning(
+                    "Не удалось обработать изображение, используется исходное",
+                    extra={"sha256": image.sha256, "profile": profile.name, "error": str(exc)},
+                )
+                return image
+        return CachedImage(target, "image/jpeg", image.sha256, target.stat().st_size)
+
+    def close(self) -> None:
+        """Останавливает пул процессов."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        """Создаёт пул процессов при первом обращении."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
@@ -1,9 +1,11 @@
 """Настройка структурированного логирования."""
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 import json
 import logging
 import sys
-from typing import Any, Dict
+from typing import Any, Dict, Iterator
 
 _RESERVED_LOG_RECORD_KEYS = {
     "name",
@@ -29,6 +31,19 @@ _RESERVED_LOG_RECORD_KEYS = {
     "message",
 }
 
+# Поля, добавляемые ко всем записям в текущем контексте (например, имя клиента)
+_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Добавляет поля ко всем записям лога внутри блока, включая этапы в пуле потоков."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
 
 class JsonFormatter(logging.Formatter):
     """Форматтер, сериализующий записи в JSON."""
@@ -38,6 +53,7 @@ class JsonFormatter(logging.Formatter):
             "level": record.levelname,
             "message": record.getMessage(),
             "logger": record.name,
+            **_context.get(),
         }
         if record.exc_info:
             payload["exception"] = self.formatException(record.exc_info)
@@ -0,0 +1,65 @@
+"""Потоковое тело multipart/form-data для загрузки файлов без буферизации в памяти."""
+
+from io import BytesIO
+import os
+from typing import AsyncIterator, BinaryIO, Dict, Iterator
+import uuid
+
+
+class MultipartFile:
+    """Тело запроса с одним файлом: читается кусками, длина известна заранее."""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, field: str, filename: str, fileobj: BinaryIO, content_type: str) -> None:
+        boundary = uuid.uuid4().hex
+        safe_name = filename.replace('"', "%22").replace("\r", "").replace("\n", "")
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{safe_name}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+        self._file = fileobj
+        fileobj.seek(0, os.SEEK_END)
+        self._file_size = fileobj.tell()
+        self.rewind()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Заголовки запроса с типом и точной длиной тела."""
+        return {"Content-Type": self.content_type, "Content-Length": str(len(self))}
+
+    def rewind(self) -> None:
+        """Возвращает чтение в начало тела перед очередной попыткой отправки."""
+        self._file.seek(0)
+        self._parts = [BytesIO(self._head), self._file, BytesIO(self._tail)]
+
+    def read(self, size: int = -1) -> bytes:
+        """Читает следующий кусок тела запроса."""
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(self.CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    async def aiter_chunks(self) -> AsyncIterator[bytes]:
+        """Отдаёт тело кусками для асинхронных HTTP-клиентов."""
+        for chunk in self:
+            yield chunk
+
+    def __len__(self) -> int:
+        return len(self._head) + self._file_size + len(self._tail)
@@ -0,0 +1,146 @@
+"""Ограничение частоты запросов к площадкам: ведро токенов на площадку и токен доступа."""
+
+import asyncio
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, Hashable, Mapping, Optional, Tuple
+
+_FLOOD_WAIT = re.compile(r"FLOOD_WAIT_(\d+)")
+
+
+class RateLimitedError(RuntimeError):
+    """Площадка попросила подождать; retry_after — рекомендованная пауза в секундах."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Пропускает rate запросов в секунду с всплеском до capacity."""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self._rate = rate
+        self._capacity = max(1.0, capacity)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Ждёт свободный токен, блокируя поток."""
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """Ждёт свободный токен, не блокируя event loop."""
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def defer(self, seconds: float) -> None:
+        """Приостанавливает выдачу токенов по подсказке сервера (Retry-After)."""
+        with self._lock:
+            until = time.monotonic() + max(0.0, seconds)
+            if until > self._blocked_until:
+                self._blocked_until = until
+                self._tokens = 0.0
+                self._updated = until
+
+    def _reserve(self) -> float:
+        """Забирает токен и возвращает 0 либо время ожидания до следующей попытки."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+
+class RateLimiterRegistry:
+    """Общие вёдра токенов: одно на пару «площадка — ключ доступа» для всех клиентов процесса."""
+
+    def __init__(self, limits: Mapping[str, Tuple[float, float]]) -> None:
+        self._limits = dict(limits)
+        self._buckets: Dict[Tuple[str, Hashable], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, platform: str, key: Hashable) -> Optional[TokenBucket]:
+        """Возвращает ведро площадки для ключа; None, если для площадки нет лимита."""
+        limit = self._limits.get(platform)
+        if limit is None or limit[0] <= 0:
+            return None
+        with self._lock:
+            bucket = self._buckets.get((platform, key))
+            if bucket is None:
+                bucket = TokenBucket(*limit)
+                self._buckets[(platform, key)] = bucket
+            return bucket
+
+
+def retry_after_seconds(
+    headers: Optional[Mapping[str, str]] = None,
+    payload: Optional[Dict[str, Any]] = None,
+) -> Optional[float]:
+    """Извлекает паузу из Retry-After, parameters.retry_after (Telegram) или FLOOD_WAIT_N (Telegraph)."""
+    if payload:
+        parameters = payload.get("parameters")
+        if isinstance(parameters, dict) and parameters.get("retry_after") is not None:
+            return float(parameters["retry_after"])
+        match = _FLOOD_WAIT.search(str(payload.get("error", "")))
+        if match:
+            return float(match.group(1))
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+def json_payload(content: bytes) -> Optional[Dict[str, Any]]:
+    """Разбирает тело ответа как JSON-объект; для прочих ответов возвращает None."""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def raise_for_rate_limit(
+    limiter: Optional[TokenBucket],
+    status_code: int,
+    headers: Optional[Mapping[str, str]] = None,
+    payload: Optional[Dict[str, Any]] = None,
+    default: float = 1.0,
+) -> None:
+    """Поднимает RateLimitedError, если площадка попросила подождать, и приостанавливает ведро."""
+    seconds = None
+    if status_code == 429:
+        seconds = retry_after_seconds(headers, payload) or default
+    elif payload and _FLOOD_WAIT.search(str(payload.get("error", ""))):
+        seconds = retry_after_seconds(payload=payload)
+    if seconds is None:
+        return
+    if limiter is not None:
+        limiter.defer(seconds)
+    raise RateLimitedError(f"Площадка ограничила частоту запросов, пауза {seconds:g} с", seconds)
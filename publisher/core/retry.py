@@ -1,17 +1,248 @@
 """Утилиты повторного выполнения операций."""
 
-from typing import Iterable, Type
+from contextlib import contextmanager
+from contextvars import ContextVar
+import asyncio
+import functools
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Type
 
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import httpx
+import requests
+from tenacity import RetryCallState, retry, retry_if_exception
 
+from publisher.core.rate_limit import RateLimitedError
 
-def retry_on_exceptions(exceptions: Iterable[Type[BaseException]]):
-    """Создаёт декоратор с тремя попытками и экспоненциальной паузой."""
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 8.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Площадка недоступна: после серии сбоев запросы к ней временно не отправляются."""
+
+
+class RetryBudget:
+    """Общий на флоу запас повторов: исчерпав его, ошибки пробрасываются без новых попыток."""
+
+    def __init__(self, limit: int) -> None:
+        self._remaining = limit
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        """Забирает один повтор; False, если запас исчерпан."""
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+
+_budget: ContextVar[Optional[RetryBudget]] = ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(limit: Optional[int]) -> Iterator[Optional[RetryBudget]]:
+    """Ограничивает общее число повторов внутри блока (флоу публикации); None — без ограничения."""
+    if limit is None:
+        yield None
+        return
+    budget = RetryBudget(limit)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold сбоев подряд и пропускает пробный запрос через reset_timeout."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Пропускает запрос или поднимает CircuitOpenError, пока площадка считается недоступной."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError(f"{self.name}: площадка временно недоступна, запрос не отправлен")
+
+    def record_success(self) -> None:
+        """Замыкает цепь после успешного запроса."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Учитывает сбой площадки; пробный запрос со сбоем снова размыкает цепь."""
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+# Порог и время восстановления по клиентам; ключ "" — значения по умолчанию
+_breaker_settings: Dict[str, Dict[str, float]] = {"": {"failure_threshold": 5, "reset_timeout": 60.0}}
+_breakers_lock = threading.Lock()
+
+_tenant: ContextVar[str] = ContextVar("retry_tenant", default="")
+
+
+@contextmanager
+def tenant_scope(tenant: str) -> Iterator[None]:
+    """Относит вызовы внутри блока к клиенту: предохранители площадок у клиентов раздельные."""
+    token = _tenant.set(tenant)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def circuit_breaker(name: str, tenant: Optional[str] = None) -> CircuitBreaker:
+    """Возвращает предохранитель площадки для клиента (по умолчанию — текущего в контексте)."""
+    tenant = _tenant.get() if tenant is None else tenant
+    with _breakers_lock:
+        breaker = _breakers.get((tenant, name))
+        if breaker is None:
+            settings = _breaker_settings.get(tenant, _breaker_settings[""])
+            breaker = CircuitBreaker(name, int(settings["failure_threshold"]), settings["reset_timeout"])
+            _breakers[(tenant, name)] = breaker
+        return breaker
+
+
+def configure_circuit_breakers(failure_threshold: int, reset_timeout: float, tenant: str = "") -> None:
+    """Задаёт порог и время восстановления предохранителей клиента; без tenant — значения по умолчанию."""
+    with _breakers_lock:
+        _breaker_settings[tenant] = {"failure_threshold": failure_threshold, "reset_timeout": reset_timeout}
+        for (owner, _), breaker in _breakers.items():
+            if owner == tenant or (not tenant and owner not in _breaker_settings):
+                breaker.failure_threshold = failure_threshold
+                breaker.reset_timeout = reset_timeout
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    """Достаёт HTTP-статус из исключения requests, httpx или gspread."""
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Сетевые сбои, 429 и 5xx стоит повторить; остальные ответы 4xx не исправятся повтором."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, RateLimitedError):
+        return True
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return not isinstance(exc, (requests.RequestException, httpx.HTTPError))
+
+
+def _is_outage(exc: BaseException) -> bool:
+    """Сбой, говорящий о недоступности площадки; просьба подождать (429) к ним не относится."""
+    return is_retryable(exc) and not isinstance(exc, RateLimitedError) and _status_code(exc) != 429
+
+
+def _stop(retry_state: RetryCallState) -> bool:
+    """Останавливает повторы по числу попыток или при исчерпании запаса флоу."""
+    if retry_state.attempt_number >= MAX_ATTEMPTS:
+        return True
+    budget = _budget.get()
+    return budget is not None and not budget.take()
+
+
+def _wait(retry_state: RetryCallState) -> float:
+    """Экспоненциальная пауза с полным джиттером; паузу по лимиту выдерживает ведро токенов."""
+    if isinstance(retry_state.outcome.exception(), RateLimitedError):
+        return 0.0
+    ceiling = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (retry_state.attempt_number - 1))
+    return random.uniform(BACKOFF_BASE / 2, ceiling)
+
+
+def _guard(
+    func: Callable[..., Any], destination: str, is_failure: Callable[[BaseException], bool]
+) -> Callable[..., Any]:
+    """Оборачивает попытку проверкой предохранителя; ответы площадки с ошибкой запроса его замыкают."""
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def guarded_async(*args: Any, **kwargs: Any) -> Any:
+            breaker = circuit_breaker(destination)
+            breaker.before_call()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as exc:
+                if is_failure(exc):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            breaker.record_success()
+            return result
+
+        return guarded_async
+
+    @functools.wraps(func)
+    def guarded(*args: Any, **kwargs: Any) -> Any:
+        # Предохранитель выбирается при вызове: один и тот же клиент площадки обслуживает разных клиентов
+        breaker = circuit_breaker(destination)
+        breaker.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            if is_failure(exc):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+    return guarded
+
+
+def retry_on_exceptions(exceptions: Iterable[Type[BaseException]], destination: Optional[str] = None):
+    """Создаёт декоратор повторов: до трёх попыток с джиттером только для повторяемых ошибок.
+
+    destination включает предохранитель площадки: при её недоступности вызовы сразу
+    завершаются CircuitOpenError, не расходуя попытки и время. Предохранитель свой у каждого
+    клиента (``tenant_scope``), а запас повторов — у каждого флоу (``retry_budget``).
+    """
     exceptions_tuple = tuple(exceptions)
 
-    return retry(
-        retry=retry_if_exception_type(exceptions_tuple),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=8),
+    def should_retry(exc: BaseException) -> bool:
+        return isinstance(exc, exceptions_tuple) and is_retryable(exc)
+
+    def is_failure(exc: BaseException) -> bool:
+        return should_retry(exc) and _is_outage(exc)
+
+    policy = retry(
+        retry=retry_if_exception(should_retry),
+        stop=_stop,
+        wait=_wait,
         reraise=True,
     )
+    if destination is None:
+        return policy
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        return policy(_guard(func, destination, is_failure))
+
+    return decorator
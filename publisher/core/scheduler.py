@@ -0,0 +1,310 @@
+"""Планировщик по cron-выражениям с сохранением времени последнего запуска."""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import heapq
+import itertools
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import pytz
+from pytz.tzinfo import BaseTzInfo
+
+from publisher.core.logger import get_logger
+
+# Пределы полей cron: минута, час, день месяца, месяц, день недели (0 и 7 — воскресенье)
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_DAY_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+# Самый длинный промежуток поиска следующего срабатывания (високосные 29 февраля)
+_SEARCH_LIMIT_DAYS = 366 * 8
+# Дольше спать нельзя: после паузы контейнера часы должны быть перепроверены
+MAX_SLEEP = 60.0
+
+
+def _parse_field(raw: str, low: int, high: int, names: Optional[Dict[str, int]] = None) -> Set[int]:
+    """Разбирает поле cron: *, списки, диапазоны и шаги (*/15, 1-5, mon-fri)."""
+    values: Set[int] = set()
+    for part in raw.lower().split(","):
+        body, _, step_raw = part.partition("/")
+        step = int(step_raw) if step_raw else 1
+        if step < 1:
+            raise ValueError(f"Неверный шаг в поле cron: {raw}")
+        if body == "*":
+            start, end = low, high
+        else:
+            first, _, last = body.partition("-")
+            start = names[first] if names and first in names else int(first)
+            end = (names[last] if names and last in names else int(last)) if last else (high if step_raw else start)
+        if not low <= start <= end <= high:
+            raise ValueError(f"Значение поля cron вне диапазона {low}-{high}: {raw}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """Cron-выражение из пяти полей: минута, час, день месяца, месяц, день недели."""
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron-выражение должно состоять из пяти полей: {expression!r}")
+        self.expression = expression
+        self._minutes, self._hours, self._days, self._months, weekdays = (
+            _parse_field(raw, low, high, _DAY_NAMES if index == 4 else None)
+            for index, (raw, (low, high)) in enumerate(zip(fields, _FIELD_RANGES))
+        )
+        # Воскресенье допускается как 0 и как 7; дальше дни недели в нумерации Python (0 — понедельник)
+        self._weekdays = {(day - 1) % 7 for day in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def next_after(self, moment: datetime, tz: BaseTzInfo) -> datetime:
+        """Возвращает ближайшее срабатывание строго после moment в часовом поясе tz."""
+        local = moment.astimezone(tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=_SEARCH_LIMIT_DAYS)
+        while local < limit:
+            if local.month not in self._months:
+                local = (local.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(local):
+                local = (local + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if local.hour not in self._hours:
+                local = (local + timedelta(hours=1)).replace(minute=0)
+                continue
+            if local.minute not in self._minutes:
+                local += timedelta(minutes=1)
+                continue
+            return tz.normalize(tz.localize(local))
+        raise ValueError(f"Cron-выражение {self.expression!r} не срабатывает никогда")
+
+    def _day_matches(self, local: datetime) -> bool:
+        """День подходит по правилу cron: если заданы оба поля дня, достаточно совпадения одного."""
+        by_day = local.day in self._days
+        by_weekday = local.weekday() in self._weekdays
+        if self._any_day or self._any_weekday:
+            return by_day and by_weekday
+        return by_day or by_weekday
+
+
+def parse_publish_at(raw: str, tz: BaseTzInfo) -> datetime:
+    """Разбирает время публикации из таблицы (ISO или ДД.ММ.ГГГГ ЧЧ:ММ); без пояса — в поясе tz."""
+    value = raw.strip()
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        for pattern in ("%d.%m.%Y %H:%M", "%d.%m.%Y %H:%M:%S"):
+            try:
+                moment = datetime.strptime(value, pattern)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"Не удалось разобрать время публикации: {raw!r}") from None
+    if moment.tzinfo is None:
+        return tz.normalize(tz.localize(moment))
+    return moment
+
+
+class ScheduleState:
+    """Хранит время последнего выполненного срабатывания каждой задачи (SQLite или память)."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._lock = threading.Lock()
+        self._memory: Dict[str, datetime] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(path), check_same_thread=False)
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS last_runs (job TEXT PRIMARY KEY, fired_at TEXT NOT NULL)"
+                )
+
+    def get(self, job: str) -> Optional[datetime]:
+        """Возвращает время последнего выполненного срабатывания задачи."""
+        with self._lock:
+            if self._connection is None:
+                return self._memory.get(job)
+            row = self._connection.execute("SELECT fired_at FROM last_runs WHERE job = ?", (job,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def set(self, job: str, fired_at: datetime) -> None:
+        """Запоминает выполненное срабатывание."""
+        with self._lock:
+            if self._connection is None:
+                self._memory[job] = fired_at
+                return
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO last_runs VALUES (?, ?)", (job, fired_at.isoformat())
+                )
+
+
+@dataclass
+class Job:
+    """Задача расписания; group объединяет задачи одного клиента.
+
+    lead сдвигает срабатывание раньше окна cron (подготовка к публикации); задачи с persistent=False
+    не сохраняют время запуска и не догоняются после простоя. Задача без cron однократная,
+    её время задаётся через Scheduler.schedule.
+    """
+
+    name: str
+    cron: Optional[CronExpression]
+    tz: BaseTzInfo
+    func: Callable[[], None]
+    group: str = ""
+    lead: timedelta = timedelta(0)
+    persistent: bool = True
+    fire_at: Optional[datetime] = None
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        """Ближайшее срабатывание задачи строго после moment с учётом сдвига lead (None — однократная)."""
+        if self.cron is None:
+            return None
+        return self.cron.next_after(moment + self.lead, self.tz) - self.lead
+
+
+class Scheduler:
+    """Очередь срабатываний по времени: спит до ближайшего события, пропущенные окна догоняет.
+
+    Задачи, срабатывающие одновременно, передаются в dispatch одной пачкой. Срабатывание,
+    пропущенное во время простоя не более чем на catch_up, выполняется сразу после старта.
+    Время срабатывания сохраняется через complete, когда задача успешно завершилась, поэтому
+    перезапуск не повторит выполненное окно, но догонит прерванное. dispatch, выполняющий
+    задачи асинхронно, сам вызывает complete по их завершении.
+
+    Однократные задачи (строки с временем публикации) добавляются из других потоков через
+    schedule и cancel. Перенесённые и отменённые записи остаются в куче и пропускаются при
+    извлечении, поэтому обе операции стоят O(log n).
+    """
+
+    def __init__(
+        self,
+        jobs: Sequence[Job],
+        state: ScheduleState,
+        catch_up: timedelta,
+        dispatch: Optional[Callable[[List[Job]], None]] = None,
+    ) -> None:
+        self._state = state
+        self._catch_up = catch_up
+        self._dispatch = dispatch or self._run_each
+        self._logger = get_logger("publisher.scheduler")
+        self._counter = itertools.count()
+        self._heap: List[Tuple[datetime, int, Job]] = []
+        # Актуальное время однократных задач: имя -> срабатывание
+        self._one_shot: Dict[str, datetime] = {}
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        now = datetime.now(pytz.utc)
+        for job in jobs:
+            self._push(job, self._first_fire(job, now))
+
+    def run_forever(self, stop: Optional[threading.Event] = None) -> None:
+        """Выполняет задачи по расписанию до установки stop."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            with self._lock:
+                delay = (self._heap[0][0] - datetime.now(pytz.utc)).total_seconds() if self._heap else MAX_SLEEP
+            if delay > 0:
+                self._wake.wait(min(delay, MAX_SLEEP))
+                self._wake.clear()
+                continue
+            self.run_due()
+
+    def wake(self) -> None:
+        """Прерывает ожидание: расписание изменилось или пора остановиться."""
+        self._wake.set()
+
+    def schedule(self, job: Job, fire_at: datetime) -> None:
+        """Планирует однократную задачу; повторный вызов с тем же именем переносит её."""
+        with self._lock:
+            self._one_shot[job.name] = fire_at
+            self._push(job, fire_at)
+        self.wake()
+
+    def cancel(self, name: str) -> None:
+        """Отменяет однократную задачу, если она ещё не выполнена."""
+        with self._lock:
+            self._one_shot.pop(name, None)
+
+    def run_due(self, now: Optional[datetime] = None) -> List[Job]:
+        """Выполняет все наступившие срабатывания и планирует следующие."""
+        now = now or datetime.now(pytz.utc)
+        due: List[Job] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, _, job = heapq.heappop(self._heap)
+                if job.cron is None:
+                    if self._one_shot.get(job.name) != fire_at:
+                        continue
+                    del self._one_shot[job.name]
+                job.fire_at = fire_at
+                due.append(job)
+        if not due:
+            return due
+        try:
+            self._dispatch(due)
+        finally:
+            for job in due:
+                next_fire = job.next_after(max(job.fire_at, now))
+                if next_fire is not None:
+                    with self._lock:
+                        self._push(job, next_fire)
+            with self._lock:
+                upcoming = {job.name: fire_at.isoformat() for fire_at, _, job in self._heap if job.cron is not None}
+                pending = len(self._one_shot)
+            self._logger.info("Следующие срабатывания", extra={"jobs": upcoming, "pending": pending})
+        return due
+
+    def complete(self, job: Job, fire_at: datetime) -> None:
+        """Запоминает успешно выполненное срабатывание задачи, чтобы перезапуск его не повторил."""
+        if not job.persistent:
+            return
+        with self._lock:
+            last = self._state.get(job.name)
+            if last is None or fire_at > last:
+                self._state.set(job.name, fire_at)
+
+    def next_fire_times(self) -> Dict[str, datetime]:
+        """Ближайшие срабатывания задач (для логов и проверок)."""
+        with self._lock:
+            return {
+                job.name: fire_at
+                for fire_at, _, job in self._heap
+                if job.cron is not None or self._one_shot.get(job.name) == fire_at
+            }
+
+    def _first_fire(self, job: Job, now: datetime) -> datetime:
+        """Первое срабатывание: последнее окно, пропущенное за время простоя, или ближайшее будущее.
+
+        Из нескольких пропущенных окон догоняется только самое позднее, если оно не старше catch_up.
+        """
+        last = self._state.get(job.name) if job.persistent else None
+        if last is not None:
+            # Окна старше catch_up не догоняются, поэтому перебор начинается с границы догона
+            missed = job.next_after(max(last, now - self._catch_up - timedelta(seconds=1)))
+            if missed <= now:
+                following = job.next_after(missed)
+                while following <= now:
+                    missed, following = following, job.next_after(following)
+                extra = {"job": job.name, "window": missed.isoformat()}
+                self._logger.info("Пропущенное окно будет выполнено сейчас", extra=extra)
+                return missed
+            stale = job.next_after(last)
+            if stale <= now:
+                extra = {"job": job.name, "window": stale.isoformat()}
+                self._logger.warning("Пропущенное окно слишком старое, пропускается", extra=extra)
+        return job.next_after(now)
+
+    def _run_each(self, due: List[Job]) -> None:
+        for job in due:
+            job.func()
+            self.complete(job, job.fire_at)
+
+    def _push(self, job: Job, fire_at: datetime) -> None:
+        """Кладёт срабатывание задачи в кучу."""
+        heapq.heappush(self._heap, (fire_at, next(self._counter), job))
@@ -0,0 +1,55 @@
+"""Исполнитель графа этапов публикации."""
+
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+import contextvars
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class StageGraph:
+    """Граф этапов: этапы без взаимных зависимостей выполняются параллельно в пуле потоков."""
+
+    def __init__(self) -> None:
+        self._stages: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+
+    def add(self, name: str, func: Callable[..., Any], after: Iterable[str] = ()) -> None:
+        """Добавляет этап; результаты этапов из after передаются в func именованными аргументами."""
+        dependencies = tuple(after)
+        unknown = [dependency for dependency in dependencies if dependency not in self._stages]
+        if unknown:
+            raise ValueError(f"Этап {name} зависит от неизвестных этапов: {unknown}")
+        self._stages[name] = (func, dependencies)
+
+    def run(self, executor: Executor) -> Dict[str, Any]:
+        """Выполняет этапы по мере готовности зависимостей и возвращает их результаты.
+
+        При ошибке новые этапы не запускаются, уже запущенные дожидаются завершения,
+        после чего первая ошибка пробрасывается вызывающему коду.
+        """
+        results: Dict[str, Any] = {}
+        running: Dict[Future, str] = {}
+        pending = dict(self._stages)
+        error: Optional[BaseException] = None
+        while pending or running:
+            if error is None:
+                for name, (func, dependencies) in list(pending.items()):
+                    if all(dependency in results for dependency in dependencies):
+                        kwargs = {dependency: results[dependency] for dependency in dependencies}
+                        # Этап видит контекст вызывающего потока (например, запас повторов флоу)
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, func, **kwargs)] = name
+                        del pending[name]
+            else:
+                pending.clear()
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                exc = future.exception()
+                if exc is not None:
+                    error = error or exc
+                else:
+                    results[name] = future.result()
+        if error is not None:
+            raise error
+        return results
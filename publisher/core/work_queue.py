@@ -0,0 +1,126 @@
+"""Локальная очередь задач публикации на SQLite."""
+
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    flow TEXT NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    priority REAL NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (flow, dedupe_key)
+);
+CREATE INDEX IF NOT EXISTS items_ready ON items (flow, visible_at, priority);
+"""
+
+
+@dataclass(frozen=True)
+class QueueItem:
+    id: int
+    flow: str
+    key: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class WorkQueue:
+    """Очередь строк к публикации: взятая задача скрыта на время visibility_timeout.
+
+    Задача, не подтверждённая через ack (процесс упал или публикация не удалась),
+    снова становится доступной после таймаута; после max_attempts попыток она
+    остаётся в очереди, но больше не выдаётся, пока строка не исчезнет из сканирования.
+    Подтверждённая задача тоже хранится до тех пор: сканирование, прочитавшее таблицу
+    до записи статуса, не поставит строку в очередь повторно.
+    """
+
+    def __init__(self, path: Path, visibility_timeout: float = 600.0, max_attempts: int = 3) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._visibility_timeout = visibility_timeout
+        self._max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+
+    def sync(self, flow: str, entries: Iterable[Tuple[str, float, Dict[str, Any]]]) -> int:
+        """Приводит очередь флоу к результату сканирования: (ключ, приоритет, данные строки).
+
+        Новые строки добавляются, данные ожидающих обновляются, а задачи строк, которых
+        больше нет среди готовых, удаляются (кроме взятых в работу). Возвращает число новых задач.
+        """
+        now = time.time()
+        rows = [(flow, key, priority, json.dumps(payload, ensure_ascii=False), now) for key, priority, payload in entries]
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS scanned (dedupe_key TEXT PRIMARY KEY)")
+            self._connection.execute("DELETE FROM scanned")
+            self._connection.executemany("INSERT OR IGNORE INTO scanned VALUES (?)", [(row[1],) for row in rows])
+            self._connection.execute(
+                "DELETE FROM items WHERE flow = ? AND visible_at <= ? AND dedupe_key NOT IN (SELECT dedupe_key FROM scanned)",
+                (flow, now),
+            )
+            after_delete = self._count(flow)
+            self._connection.executemany(
+                """
+                INSERT INTO items (flow, dedupe_key, priority, payload, visible_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (flow, dedupe_key) DO UPDATE SET priority = excluded.priority, payload = excluded.payload
+                """,
+                rows,
+            )
+            return self._count(flow) - after_delete
+
+    def claim(self, flow: str, limit: int = 1) -> List[QueueItem]:
+        """Берёт до limit доступных задач с наибольшим приоритетом и скрывает их на время обработки."""
+        now = time.time()
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                """
+                SELECT id, dedupe_key, payload, attempts FROM items
+                WHERE flow = ? AND done = 0 AND visible_at <= ? AND attempts < ?
+                ORDER BY priority DESC, id LIMIT ?
+                """,
+                (flow, now, self._max_attempts, limit),
+            ).fetchall()
+            self._connection.executemany(
+                "UPDATE items SET attempts = attempts + 1, visible_at = ? WHERE id = ?",
+                [(now + self._visibility_timeout, row[0]) for row in rows],
+            )
+        return [QueueItem(row[0], flow, row[1], json.loads(row[2]), row[3] + 1) for row in rows]
+
+    def peek(self, flow: str, limit: int = 1) -> List[QueueItem]:
+        """Возвращает задачи, которые claim выдал бы следующими, не забирая их."""
+        with self._lock:
+            rows = self._connection.execute(
+                """
+                SELECT id, dedupe_key, payload, attempts FROM items
+                WHERE flow = ? AND done = 0 AND visible_at <= ? AND attempts < ?
+                ORDER BY priority DESC, id LIMIT ?
+                """,
+                (flow, time.time(), self._max_attempts, limit),
+            ).fetchall()
+        return [QueueItem(row[0], flow, row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    def ack(self, item: QueueItem) -> None:
+        """Отмечает задачу выполненной."""
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE items SET done = 1, visible_at = ? WHERE id = ?", (time.time(), item.id))
+
+    def size(self, flow: str) -> int:
+        """Число невыполненных задач флоу, которые ещё могут быть выданы."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM items WHERE flow = ? AND done = 0 AND attempts < ?", (flow, self._max_attempts)
+            ).fetchone()[0]
+
+    def _count(self, flow: str) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM items WHERE flow = ?", (flow,)).fetchone()[0]
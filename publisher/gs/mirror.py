@@ -0,0 +1,116 @@
+"""Локальное зеркало вкладок Google Sheets в SQLite."""
+
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    tab TEXT PRIMARY KEY,
+    modified_time TEXT NOT NULL,
+    headers TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rows (
+    tab TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (tab, row_number)
+);
+CREATE INDEX IF NOT EXISTS rows_status ON rows (tab, status);
+"""
+
+
+class SheetMirror:
+    """Хранит строки вкладок с хэшами содержимого для инкрементальной синхронизации."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def modified_time(self, tab: str) -> Optional[str]:
+        """Возвращает время изменения таблицы, на котором синхронизирована вкладка."""
+        with self._lock:
+            row = self._connection.execute("SELECT modified_time FROM sync_state WHERE tab = ?", (tab,)).fetchone()
+        return row[0] if row else None
+
+    def apply(self, tab: str, values: List[List[str]], modified_time: str) -> int:
+        """Сохраняет новое состояние вкладки и возвращает число изменённых строк."""
+        headers = [header.strip() for header in values[0]] if values else []
+        rows = values[1:]
+        with self._lock, self._connection:
+            state = self._connection.execute("SELECT headers FROM sync_state WHERE tab = ?", (tab,)).fetchone()
+            if state is None or json.loads(state[0]) != headers:
+                # Схема изменилась: индекс вкладки строится заново
+                self._connection.execute("DELETE FROM rows WHERE tab = ?", (tab,))
+            known = dict(self._connection.execute("SELECT row_number, hash FROM rows WHERE tab = ?", (tab,)))
+            status_index = headers.index("Status") if "Status" in headers else None
+            changed = []
+            for row_number, row_values in enumerate(rows, start=2):
+                row_hash = _row_hash(row_values)
+                if known.pop(row_number, None) == row_hash:
+                    continue
+                cells = [value.strip() for value in row_values]
+                status = cells[status_index] if status_index is not None and status_index < len(cells) else ""
+                changed.append((tab, row_number, row_hash, status.lower(), json.dumps(cells, ensure_ascii=False)))
+            self._connection.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?)", changed)
+            self._connection.executemany(
+                "DELETE FROM rows WHERE tab = ? AND row_number = ?",
+                [(tab, row_number) for row_number in known],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (tab, modified_time, json.dumps(headers, ensure_ascii=False)),
+            )
+        return len(changed)
+
+    def rows(self, tab: str, status: Optional[str] = None) -> Tuple[List[str], List[Tuple[int, List[str]]]]:
+        """Возвращает заголовки и строки вкладки, при необходимости отфильтрованные по статусу."""
+        with self._lock:
+            state = self._connection.execute("SELECT headers FROM sync_state WHERE tab = ?", (tab,)).fetchone()
+            if status is None:
+                cursor = self._connection.execute(
+                    "SELECT row_number, data FROM rows WHERE tab = ? ORDER BY row_number", (tab,)
+                )
+            else:
+                cursor = self._connection.execute(
+                    "SELECT row_number, data FROM rows WHERE tab = ? AND status = ? ORDER BY row_number",
+                    (tab, status.lower()),
+                )
+            rows = [(row_number, json.loads(data)) for row_number, data in cursor]
+        headers = json.loads(state[0]) if state else []
+        return headers, rows
+
+    def patch_cell(self, tab: str, row_number: int, column_index: int, value: str) -> None:
+        """Переносит записанное сервисом значение в зеркало."""
+        with self._lock, self._connection:
+            state = self._connection.execute("SELECT headers FROM sync_state WHERE tab = ?", (tab,)).fetchone()
+            row = self._connection.execute(
+                "SELECT data FROM rows WHERE tab = ? AND row_number = ?", (tab, row_number)
+            ).fetchone()
+            if state is None or row is None:
+                return
+            headers = json.loads(state[0])
+            cells = json.loads(row[0])
+            if column_index >= len(cells):
+                cells.extend([""] * (column_index + 1 - len(cells)))
+            cells[column_index] = value
+            status_index = headers.index("Status") if "Status" in headers else None
+            status = cells[status_index] if status_index is not None and status_index < len(cells) else ""
+            # Хэш сбрасывается, чтобы при следующей синхронизации строка была сверена с таблицей
+            self._connection.execute(
+                "UPDATE rows SET hash = '', status = ?, data = ? WHERE tab = ? AND row_number = ?",
+                (status.lower(), json.dumps(cells, ensure_ascii=False), tab, row_number),
+            )
+
+
+def _row_hash(row_values: List[str]) -> str:
+    """Считает хэш содержимого строки."""
+    return hashlib.sha1(json.dumps(row_values, ensure_ascii=False).encode("utf-8")).hexdigest()
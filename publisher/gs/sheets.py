@@ -1,17 +1,27 @@
 """Работа с Google Sheets."""
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from itertools import islice
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import gspread
 from gspread.exceptions import APIError
-from gspread.utils import rowcol_to_a1
+from gspread.utils import absolute_range_name, rowcol_to_a1
 
 from publisher.config import GoogleSheetsConfig
+from publisher.gs.mirror import SheetMirror
+from publisher.gs.table import RowView, SheetTable
+from publisher.core.rate_limit import RateLimiterRegistry, retry_after_seconds
 from publisher.core.retry import retry_on_exceptions
 
+# Записи текущего флоу копятся до flush (SheetsClient.deferred_writes)
+_deferred: ContextVar[bool] = ContextVar("sheets_deferred_writes", default=False)
 
-@dataclass
+@dataclass(slots=True)
 class RSSRow:
     row_number: int
     gpt_post_title: str
@@ -24,9 +34,28 @@ class RSSRow:
     vk_post_link: str
     telegram_post_link: str
     status: str
+    score: float = 0.0
+    publish_at: str = ""
 
 
-@dataclass
+# Колонки вкладки RSS, из которых собирается RSSRow
+RSS_HEADERS = (
+    "GPT Post Title",
+    "GPT Post",
+    "Short Post",
+    "Average Post",
+    "Link",
+    "Image URL",
+    "Telegraph Link",
+    "VK Post Link",
+    "TG Post Link",
+    "Status",
+    "Score",
+    "Publish At",
+)
+
+
+@dataclass(slots=True)
 class VKRow:
     row_number: int
     title: str
@@ -34,9 +63,10 @@ class VKRow:
     image_url: str
     post_link: str
     status: str
+    publish_at: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class SetkaRow:
     row_number: int
     title: str
@@ -44,43 +74,160 @@ class SetkaRow:
     image_url: str
     post_link: str
     status: str
+    publish_at: str = ""
+
+
+def _build_rss_row(view: RowView) -> RSSRow:
+    """Собирает строку RSS напрямую из представления строки таблицы."""
+    return RSSRow(
+        row_number=view.row_number,
+        gpt_post_title=view.get("GPT Post Title"),
+        gpt_post=view.get("GPT Post"),
+        short_post=view.get("Short Post"),
+        average_post=view.get("Average Post"),
+        link=view.get("Link"),
+        image_url=view.get("Image URL"),
+        telegraph_link=view.get("Telegraph Link"),
+        vk_post_link=view.get("VK Post Link"),
+        telegram_post_link=view.get("TG Post Link"),
+        status=view.get("Status"),
+        score=_parse_score(view.get("Score")),
+        publish_at=view.get("Publish At"),
+    )
+
+
+def _build_vk_row(view: RowView) -> VKRow:
+    """Собирает строку VK из представления строки таблицы."""
+    return VKRow(
+        row_number=view.row_number,
+        title=view.get("Title"),
+        content=view.get("Content"),
+        image_url=view.get("Image URL"),
+        post_link=view.get("Post Link"),
+        status=view.get("Status"),
+        publish_at=view.get("Publish At"),
+    )
+
+
+def _build_setka_row(view: RowView) -> SetkaRow:
+    """Собирает строку Setka из представления строки таблицы."""
+    return SetkaRow(
+        row_number=view.row_number,
+        title=view.get("Title"),
+        content=view.get("Content"),
+        image_url=view.get("Image URL"),
+        post_link=view.get("Post Link"),
+        status=view.get("Status"),
+        publish_at=view.get("Publish At"),
+    )
+
+
+def _parse_score(raw: str) -> float:
+    """Преобразует значение колонки Score в число, пустые и некорректные значения дают 0."""
+    try:
+        return float(raw.replace(",", ".").replace(" ", ""))
+    except ValueError:
+        return 0.0
+
+
+def _column_letter(index: int) -> str:
+    """Возвращает буквенное обозначение колонки по индексу с нуля."""
+    return rowcol_to_a1(1, index + 1)[:-1]
+
+
+def _column_runs(indexes: List[int]) -> List[Tuple[int, int]]:
+    """Группирует отсортированные индексы колонок в непрерывные отрезки."""
+    runs: List[Tuple[int, int]] = []
+    for index in indexes:
+        if runs and runs[-1][1] == index - 1:
+            runs[-1] = (runs[-1][0], index)
+        else:
+            runs.append((index, index))
+    return runs
 
 
 class SheetsClient:
     """Клиент для чтения и обновления строк Google Sheets."""
 
-    def __init__(self, config: GoogleSheetsConfig) -> None:
+    PROJECTED_CHUNK_SIZE = 20
+    # Пауза после превышения квоты, если Google не прислал Retry-After
+    QUOTA_BACKOFF = 10.0
+
+    def __init__(self, config: GoogleSheetsConfig, rate_limits: Optional[RateLimiterRegistry] = None) -> None:
         self._client = gspread.service_account(filename=str(config.service_account_json))
         self._spreadsheet = self._client.open_by_key(config.sheet_id)
+        # Квота Sheets считается на сервисный аккаунт
+        self._limiter = rate_limits.bucket("sheets", str(config.service_account_json)) if rate_limits else None
+        self._write_behind = config.write_behind
+        self._projected_reads = config.projected_reads
+        self._snapshot_ttl = config.snapshot_ttl
+        # Снимки вкладок: имя -> (время загрузки, значения)
+        self._snapshots: Dict[str, Tuple[float, List[List[str]]]] = {}
+        self._mirror = SheetMirror(config.mirror_path) if config.mirror_path else None
+        # Время последней сверки вкладки зеркала с метаданными таблицы
+        self._mirror_checked: Dict[str, float] = {}
+        self._worksheets: Dict[str, gspread.Worksheet] = {}
+        self._header_maps: Dict[str, Dict[str, int]] = {}
+        self._absent_headers: Dict[str, Set[str]] = {}
+        # Накопленные изменения ячеек: A1-диапазон -> значение
+        self._pending_updates: Dict[str, str] = {}
+        # Положение ячеек очереди записи для снимка и зеркала: A1-диапазон -> (вкладка, строка, колонка)
+        self._pending_cells: Dict[str, Tuple[str, int, int]] = {}
+        # Кэши и очередь записи общие для потока сканирования очереди и публикующих потоков
+        self._lock = threading.RLock()
 
-    def fetch_rss_ready_rows(self) -> List[RSSRow]:
+    def fetch_rss_ready_rows(self, limit: Optional[int] = None) -> List[RSSRow]:
         """Возвращает строки RSS со статусом Revised."""
-        worksheet, header_map, rows = self._fetch_rows("RSS")
-        result: List[RSSRow] = []
-        for row_number, data in rows:
-            status = data.get("Status", "")
-            if status.lower() != "revised":
-                continue
-            result.append(
-                RSSRow(
-                    row_number=row_number,
-                    gpt_post_title=data.get("GPT Post Title", ""),
-                    gpt_post=data.get("GPT Post", ""),
-                    short_post=data.get("Short Post", ""),
-                    average_post=data.get("Average Post", ""),
-                    link=data.get("Link", ""),
-                    image_url=data.get("Image URL", ""),
-                    telegraph_link=data.get("Telegraph Link", ""),
-                    vk_post_link=data.get("VK Post Link", ""),
-                    telegram_post_link=data.get("TG Post Link", ""),
-                    status=status,
-                )
-            )
-        return result
+        if self._projected_reads and self._mirror is None and self._snapshot_values("RSS") is None:
+            chunk_size = min(limit, self.PROJECTED_CHUNK_SIZE) if limit else self.PROJECTED_CHUNK_SIZE
+            return list(islice(self.iter_rss_ready_rows(chunk_size=chunk_size), limit))
+        table = self._fetch_table("RSS", status="Revised")
+        return [_build_rss_row(view) for view in islice(table.where("Status", "Revised"), limit)]
+
+    def iter_rss_ready_rows(self, chunk_size: int = PROJECTED_CHUNK_SIZE) -> Iterator[RSSRow]:
+        """Лениво выдаёт строки RSS со статусом Revised, читая только нужные колонки."""
+        header_map = self._load_header_map("RSS")
+        status_index = header_map.get("Status")
+        if status_index is None:
+            return
+        status_column = _column_letter(status_index)
+        status_range = absolute_range_name("RSS", f"{status_column}2:{status_column}")
+        candidates: List[Tuple[int, str]] = []
+        for row_number, values in enumerate(self._batch_get([status_range])[0], start=2):
+            status = values[0].strip() if values else ""
+            if status.lower() == "revised":
+                candidates.append((row_number, status))
+
+        # Колонки читаются непрерывными отрезками, чтобы не тянуть длинные тексты соседей
+        headers_by_index = {header_map[header]: header for header in RSS_HEADERS if header in header_map}
+        headers_by_index.pop(status_index, None)
+        runs = _column_runs(sorted(headers_by_index))
+        headers = [headers_by_index[index] for first, last in runs for index in range(first, last + 1)]
+        headers.append("Status")
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start : start + chunk_size]
+            ranges = [
+                absolute_range_name("RSS", f"{_column_letter(first)}{row_number}:{_column_letter(last)}{row_number}")
+                for row_number, _ in chunk
+                for first, last in runs
+            ]
+            value_ranges = iter(self._batch_get(ranges)) if ranges else iter(())
+            rows: List[List[str]] = []
+            for _, status in chunk:
+                cells: List[str] = []
+                for first, last in runs:
+                    values = next(value_ranges)
+                    run_cells = values[0] if values else []
+                    cells.extend(run_cells[: last - first + 1])
+                    cells.extend([""] * (last - first + 1 - len(run_cells)))
+                cells.append(status)
+                rows.append(cells)
+            table = SheetTable(headers, rows, [row_number for row_number, _ in chunk])
+            for index in range(len(table)):
+                yield _build_rss_row(RowView(table, index))
 
     def update_rss_row(self, row: RSSRow, telegraph_link: str, vk_link: str, telegram_link: str) -> None:
         """Обновляет ссылки и статус строки RSS."""
-        worksheet, header_map, _ = self._fetch_rows("RSS")
         updates = {
             "Telegraph Link": telegraph_link,
             "VK Post Link": vk_link,
@@ -88,124 +235,247 @@ class SheetsClient:
             "Status": "Published",
             "Notes": "",
         }
-        self._update_cells(worksheet, header_map, row.row_number, updates)
+        self._update_cells("RSS", row.row_number, updates)
+
+    def write_rss_telegraph_link(self, row: RSSRow, telegraph_link: str) -> None:
+        """Записывает ссылку на заранее созданную страницу Telegraph, не меняя статус строки."""
+        self._update_cells("RSS", row.row_number, {"Telegraph Link": telegraph_link})
 
     def write_rss_error(self, row: RSSRow, message: str) -> None:
         """Записывает ошибку для строки RSS."""
-        worksheet, header_map, _ = self._fetch_rows("RSS")
         updates = {
             "Notes": message,
         }
-        self._update_cells(worksheet, header_map, row.row_number, updates)
+        self._update_cells("RSS", row.row_number, updates)
 
     def fetch_vk_rows(self) -> List[VKRow]:
         """Возвращает строки вкладки VK, требующие публикации."""
-        _, _, rows = self._fetch_rows("VK")
-        result: List[VKRow] = []
-        for row_number, data in rows:
-            status = data.get("Status", "")
-            if status.lower() != "revised":
-                continue
-            result.append(
-                VKRow(
-                    row_number=row_number,
-                    title=data.get("Title", ""),
-                    content=data.get("Content", ""),
-                    image_url=data.get("Image URL", ""),
-                    post_link=data.get("Post Link", ""),
-                    status=status,
-                )
-            )
-        return result
+        table = self._fetch_table("VK", status="Revised")
+        return [_build_vk_row(view) for view in table.where("Status", "Revised")]
 
     def mark_vk_published(self, row: VKRow, link: str) -> None:
         """Отмечает строку VK как опубликованную."""
-        worksheet, header_map, _ = self._fetch_rows("VK")
         updates = {
             "Post Link": link,
             "Status": "Published",
             "Publish Note": "",
         }
-        self._update_cells(worksheet, header_map, row.row_number, updates)
+        self._update_cells("VK", row.row_number, updates)
 
     def write_vk_error(self, row: VKRow, message: str) -> None:
         """Записывает ошибку для строки VK."""
-        worksheet, header_map, _ = self._fetch_rows("VK")
         updates = {
             "Publish Note": message,
         }
-        self._update_cells(worksheet, header_map, row.row_number, updates)
+        self._update_cells("VK", row.row_number, updates)
 
     def fetch_setka_rows(self) -> List[SetkaRow]:
         """Возвращает строки вкладки Setka, требующие публикации."""
-        _, _, rows = self._fetch_rows("Setka")
-        result: List[SetkaRow] = []
-        for row_number, data in rows:
-            status = data.get("Status", "")
-            if status.lower() != "revised":
-                continue
-            result.append(
-                SetkaRow(
-                    row_number=row_number,
-                    title=data.get("Title", ""),
-                    content=data.get("Content", ""),
-                    image_url=data.get("Image URL", ""),
-                    post_link=data.get("Post Link", ""),
-                    status=status,
-                )
-            )
-        return result
+        table = self._fetch_table("Setka", status="Revised")
+        return [_build_setka_row(view) for view in table.where("Status", "Revised")]
 
     def mark_setka_published(self, row: SetkaRow, link: str) -> None:
         """Отмечает строку Setka как опубликованную."""
-        worksheet, header_map, _ = self._fetch_rows("Setka")
         updates = {
             "Post Link": link,
             "Status": "Published",
             "Publish Note": "",
         }
-        self._update_cells(worksheet, header_map, row.row_number, updates)
+        self._update_cells("Setka", row.row_number, updates)
 
     def write_setka_error(self, row: SetkaRow, message: str) -> None:
         """Записывает ошибку для строки Setka."""
-        worksheet, header_map, _ = self._fetch_rows("Setka")
         updates = {
             "Publish Note": message,
         }
-        self._update_cells(worksheet, header_map, row.row_number, updates)
+        self._update_cells("Setka", row.row_number, updates)
+
+    def snapshot(self, tabs: Iterable[str]) -> None:
+        """Загружает несколько вкладок одним запросом и кэширует их на короткое время."""
+        with self._lock:
+            tab_names = list(dict.fromkeys(tabs))
+            if not tab_names:
+                return
+            if self._mirror is not None:
+                self._sync_mirror(tab_names)
+                return
+            values = self._batch_get([absolute_range_name(tab_name) for tab_name in tab_names])
+            self._remember_snapshots(dict(zip(tab_names, values)))
+
+    @retry_on_exceptions((APIError,), destination="sheets")
+    def _fetch_table(self, tab_name: str, status: Optional[str] = None) -> SheetTable:
+        """Читает вкладку в колоночном виде (из зеркала — только строки с нужным статусом)."""
+        with self._lock:
+            all_values = self._snapshot_values(tab_name)
+            if all_values is None and self._mirror is not None:
+                self._sync_mirror([tab_name])
+                all_values = self._snapshot_values(tab_name)
+                if all_values is None:
+                    headers, mirrored = self._mirror.rows(tab_name, status)
+                    self._remember_headers(tab_name, headers)
+                    return SheetTable(headers, [cells for _, cells in mirrored], [row_number for row_number, _ in mirrored])
+            if all_values is None:
+                worksheet = self._worksheet(tab_name)
+                with self._quota():
+                    all_values = worksheet.get_all_values()
+            table = SheetTable.from_values(all_values)
+            self._remember_headers(tab_name, table.headers)
+            return table
+
+    @contextmanager
+    def deferred_writes(self) -> Iterator[None]:
+        """Включает write-behind для текущего флоу, чтобы записи пачки ушли одним запросом при flush.
+
+        Режим хранится в контексте, а не в клиенте: параллельные флоу его не видят, а потоки
+        этапов и обработчиков очереди получают его вместе с копией контекста флоу.
+        """
+        token = _deferred.set(True)
+        try:
+            yield
+        finally:
+            _deferred.reset(token)
+
+    def flush(self) -> None:
+        """Отправляет накопленные изменения одним запросом values_batch_update."""
+        with self._lock:
+            if not self._pending_updates:
+                return
+            pending = dict(self._pending_updates)
+            self._batch_update(pending)
+            for cell, value in pending.items():
+                # Снимку и зеркалу доверяют следующие чтения, поэтому в них попадают только записанные значения
+                self._patch_snapshot(*self._pending_cells[cell], value)
+                if self._mirror is not None:
+                    self._mirror.patch_cell(*self._pending_cells[cell], value)
+                if self._pending_updates.get(cell) == value:
+                    del self._pending_updates[cell]
+                    del self._pending_cells[cell]
+
+    def _sync_mirror(self, tabs: List[str]) -> None:
+        """Перечитывает в зеркало только вкладки, изменившиеся с прошлой синхронизации."""
+        now = time.monotonic()
+        due = [tab for tab in tabs if now - self._mirror_checked.get(tab, float("-inf")) > self._snapshot_ttl]
+        if not due:
+            return
+        modified_time = self._modified_time()
+        stale = [tab for tab in due if self._mirror.modified_time(tab) != modified_time]
+        if stale:
+            values = dict(zip(stale, self._batch_get([absolute_range_name(tab) for tab in stale])))
+            for tab, tab_values in values.items():
+                self._mirror.apply(tab, tab_values, modified_time)
+            self._remember_snapshots(values)
+        for tab in due:
+            self._mirror_checked[tab] = now
+
+    @retry_on_exceptions((APIError,), destination="sheets")
+    def _modified_time(self) -> str:
+        """Возвращает время последнего изменения таблицы из метаданных Drive."""
+        with self._quota():
+            return self._spreadsheet.get_lastUpdateTime()
+
+    def _remember_snapshots(self, values: Dict[str, List[List[str]]]) -> None:
+        """Сохраняет значения вкладок как свежий снимок."""
+        loaded_at = time.monotonic()
+        for tab_name, tab_values in values.items():
+            self._snapshots[tab_name] = (loaded_at, tab_values)
 
-    @retry_on_exceptions((APIError,))
-    def _fetch_rows(self, tab_name: str) -> Tuple[gspread.Worksheet, Dict[str, int], List[Tuple[int, Dict[str, str]]]]:
-        """Читает все строки вкладки с номерами и заголовками."""
-        worksheet = self._spreadsheet.worksheet(tab_name)
-        all_values = worksheet.get_all_values()
-        if not all_values:
-            return worksheet, {}, []
+    def _snapshot_values(self, tab_name: str) -> Optional[List[List[str]]]:
+        """Возвращает значения вкладки из снимка, если он ещё не устарел."""
+        cached = self._snapshots.get(tab_name)
+        if cached is None:
+            return None
+        loaded_at, values = cached
+        if time.monotonic() - loaded_at > self._snapshot_ttl:
+            self._snapshots.pop(tab_name, None)
+            return None
+        return values
 
-        headers = [header.strip() for header in all_values[0]]
+    def _patch_snapshot(self, tab_name: str, row_number: int, column_index: int, value: str) -> None:
+        """Переносит записанное значение в снимок, чтобы следующие флоу видели актуальный статус."""
+        values = self._snapshot_values(tab_name)
+        if values is None or row_number > len(values):
+            return
+        row_values = values[row_number - 1]
+        if column_index >= len(row_values):
+            row_values.extend([""] * (column_index + 1 - len(row_values)))
+        row_values[column_index] = value
+
+    def _worksheet(self, tab_name: str) -> gspread.Worksheet:
+        """Возвращает закэшированный объект вкладки."""
+        worksheet = self._worksheets.get(tab_name)
+        if worksheet is None:
+            with self._quota():
+                worksheet = self._spreadsheet.worksheet(tab_name)
+            self._worksheets[tab_name] = worksheet
+        return worksheet
+
+    def _remember_headers(self, tab_name: str, headers: List[str]) -> Dict[str, int]:
+        """Обновляет кэш схемы заголовков вкладки."""
         header_map = {header: idx for idx, header in enumerate(headers)}
+        if self._header_maps.get(tab_name) != header_map:
+            self._absent_headers.pop(tab_name, None)
+        self._header_maps[tab_name] = header_map
+        return header_map
+
+    @retry_on_exceptions((APIError,), destination="sheets")
+    def _load_header_map(self, tab_name: str) -> Dict[str, int]:
+        """Читает только строку заголовков вкладки."""
+        worksheet = self._worksheet(tab_name)
+        with self._quota():
+            headers = [header.strip() for header in worksheet.row_values(1)]
+        return self._remember_headers(tab_name, headers)
+
+    @retry_on_exceptions((APIError,), destination="sheets")
+    def _batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        """Читает несколько диапазонов одним запросом values_batch_get."""
+        with self._quota():
+            response = self._spreadsheet.values_batch_get(ranges)
+        return [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+
+    def _header_map(self, tab_name: str, updates: Dict[str, str]) -> Dict[str, int]:
+        """Возвращает схему заголовков, перечитывая её при несовпадении с записью."""
+        header_map = self._header_maps.get(tab_name)
+        if header_map is not None:
+            missing = {header for header in updates if header not in header_map}
+            if not missing or missing <= self._absent_headers.get(tab_name, set()):
+                return header_map
+        header_map = self._load_header_map(tab_name)
+        # Колонки, которых нет и после перечитывания, не считаются расхождением схемы
+        self._absent_headers[tab_name] = {header for header in updates if header not in header_map}
+        return header_map
+
+    def _update_cells(self, tab_name: str, row_number: int, updates: Dict[str, str]) -> None:
+        """Ставит значения ячеек в очередь записи и отправляет её без write-behind."""
+        with self._lock:
+            header_map = self._header_map(tab_name, updates)
+            for header, value in updates.items():
+                if header not in header_map:
+                    continue
+                column_index = header_map[header]
+                cell = absolute_range_name(tab_name, rowcol_to_a1(row_number, column_index + 1))
+                self._pending_updates[cell] = value
+                self._pending_cells[cell] = (tab_name, row_number, column_index)
+            if not (self._write_behind or _deferred.get()):
+                self.flush()
+
+    @retry_on_exceptions((APIError,), destination="sheets")
+    def _batch_update(self, cells: Dict[str, str]) -> None:
+        """Записывает набор ячеек за один вызов API."""
+        body = {
+            "valueInputOption": "RAW",
+            "data": [{"range": cell, "values": [[value]]} for cell, value in cells.items()],
+        }
+        with self._quota():
+            self._spreadsheet.values_batch_update(body)
 
-        result: List[Tuple[int, Dict[str, str]]] = []
-        for offset, row_values in enumerate(all_values[1:], start=2):
-            row_dict: Dict[str, str] = {}
-            for idx, header in enumerate(headers):
-                value = row_values[idx] if idx < len(row_values) else ""
-                row_dict[header] = value.strip()
-            result.append((offset, row_dict))
-        return worksheet, header_map, result
-
-    @retry_on_exceptions((APIError,))
-    def _update_cells(
-        self,
-        worksheet: gspread.Worksheet,
-        header_map: Dict[str, int],
-        row_number: int,
-        updates: Dict[str, str],
-    ) -> None:
-        """Записывает значения в указанные ячейки."""
-        for header, value in updates.items():
-            if header not in header_map:
-                continue
-            column_index = header_map[header] + 1
-            cell = rowcol_to_a1(row_number, column_index)
-            worksheet.update(cell, [[value]])
+    @contextmanager
+    def _quota(self) -> Iterator[None]:
+        """Берёт токен квоты Sheets перед запросом; ответ 429 приостанавливает ведро по Retry-After."""
+        if self._limiter is not None:
+            self._limiter.acquire()
+        try:
+            yield
+        except APIError as exc:
+            if self._limiter is not None and exc.response.status_code == 429:
+                self._limiter.defer(retry_after_seconds(exc.response.headers) or self.QUOTA_BACKOFF)
+            raise
@@ -0,0 +1,71 @@
+"""Колоночное представление данных вкладки."""
+
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+class SheetTable:
+    """Вкладка в виде колонок, которые строятся один раз и разделяются всеми строками."""
+
+    __slots__ = ("headers", "header_map", "row_numbers", "_rows", "_columns")
+
+    def __init__(
+        self,
+        headers: List[str],
+        rows: Sequence[Sequence[str]],
+        row_numbers: Optional[Sequence[int]] = None,
+    ) -> None:
+        self.headers = headers
+        self.header_map: Dict[str, int] = {header: idx for idx, header in enumerate(headers)}
+        self.row_numbers: Sequence[int] = row_numbers if row_numbers is not None else range(2, len(rows) + 2)
+        self._rows = rows
+        self._columns: Dict[int, List[str]] = {}
+
+    @classmethod
+    def from_values(cls, values: List[List[str]]) -> "SheetTable":
+        """Строит таблицу из значений вкладки, где первая строка — заголовки."""
+        if not values:
+            return cls([], [])
+        return cls([header.strip() for header in values[0]], values[1:])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def column(self, header: str) -> Optional[List[str]]:
+        """Возвращает очищенные значения колонки, собирая её при первом обращении."""
+        index = self.header_map.get(header)
+        if index is None:
+            return None
+        column = self._columns.get(index)
+        if column is None:
+            column = [row[index].strip() if index < len(row) else "" for row in self._rows]
+            self._columns[index] = column
+        return column
+
+    def where(self, header: str, value: str) -> Iterator["RowView"]:
+        """Перебирает строки, у которых значение колонки совпадает без учёта регистра."""
+        column = self.column(header)
+        if column is None:
+            return
+        expected = value.lower()
+        for index, cell in enumerate(column):
+            if cell.lower() == expected:
+                yield RowView(self, index)
+
+
+class RowView:
+    """Лёгкое представление строки поверх колонок таблицы."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: SheetTable, index: int) -> None:
+        self._table = table
+        self._index = index
+
+    @property
+    def row_number(self) -> int:
+        return self._table.row_numbers[self._index]
+
+    def get(self, header: str) -> str:
+        """Возвращает значение ячейки или пустую строку, если колонки нет."""
+        column = self._table.column(header)
+        return column[self._index] if column is not None else ""
@@ -1,32 +1,387 @@
 """Точка входа для сервиса публикации."""
 
-from datetime import datetime, date
+import contextvars
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+import itertools
+import os
+from pathlib import Path
+import signal
+import threading
 import time
-from typing import Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import httpx
 import pytz
+import requests
 
-from publisher.config import load_config
-from publisher.core.logger import configure_logging, get_logger
+from publisher.config import AppConfig, RateLimitConfig, ScheduleConfig, load_config, load_tenants
+from publisher.core.dispatcher import FlowDispatcher
+from publisher.core.http import BlockingClient, EventLoopThread, create_async_http_client, create_session
+from publisher.core.image_cache import ImageCache
+from publisher.core.images import ImageNormalizer
+from publisher.core.logger import configure_logging, get_logger, log_context
+from publisher.core.rate_limit import RateLimiterRegistry
+from publisher.core.retry import configure_circuit_breakers, tenant_scope
+from publisher.core.scheduler import CronExpression, Job, ScheduleState, Scheduler
+from publisher.core.work_queue import WorkQueue
 from publisher.gs.sheets import SheetsClient
+from publisher.services.journal import PublishJournal
 from publisher.services.publisher import PublisherService
+from publisher.telegraph.async_client import AsyncTelegraphClient
 from publisher.telegraph.client import TelegraphClient
+from publisher.tg.async_client import AsyncTelegramClient
 from publisher.tg.client import TelegramClient
+from publisher.vk.async_client import AsyncVKClient
 from publisher.vk.client import VKClient
+from publisher.vk.scheduled_posts import ScheduledPosts
+from publisher.vk.short_links import ShortLinkCache
+
+
+# Вкладка таблицы, которую читает каждый флоу
+FLOW_TABS = {"rss": "RSS", "vk": "VK", "setka": "Setka"}
+
+# Сообщения о запуске служебных задач клиента, не связанных с окном одного флоу
+SERVICE_JOB_MESSAGES = {
+    "publish_at": "Сканирование времени публикации строк",
+    "vk_push": "Создание отложенных постов VK",
+    "vk_reconcile": "Сверка отложенных постов VK",
+}
+
+
+@dataclass
+class SharedResources:
+    """Общие для всех клиентов процесса лимиты частоты, пул соединений и кэши."""
+
+    rate_limits: RateLimiterRegistry
+    session: requests.Session
+    image_cache: Optional[ImageCache] = None
+    normalizer: Optional[ImageNormalizer] = None
+    short_link_cache: Optional[ShortLinkCache] = None
+    # Event loop и пул соединений асинхронных клиентов (ASYNC_HTTP)
+    event_loop: Optional[EventLoopThread] = None
+    http: Optional[httpx.AsyncClient] = None
+
+    def close(self) -> None:
+        """Останавливает пул процессов обработки изображений и закрывает пулы соединений."""
+        if self.normalizer is not None:
+            self.normalizer.close()
+        self.session.close()
+        if self.event_loop is not None:
+            if self.http is not None:
+                self.event_loop.run(self.http.aclose())
+            self.event_loop.close()
+
+
+class TenantRunner:
+    """Расписание публикаций одного клиента: таблица, сообщество VK и канал Telegram."""
+
+    def __init__(self, name: str, config: AppConfig, service: PublisherService, sheets: SheetsClient) -> None:
+        self.name = name
+        self._config = config
+        self._service = service
+        self._sheets = sheets
+        self._logger = get_logger("publisher.entry")
+        self._tz = pytz.timezone(config.schedule.timezone)
+        self._scheduler: Optional[Scheduler] = None
+        # Запланированные строки с колонкой Publish At: имя задачи -> время публикации
+        self._planned: Dict[str, datetime] = {}
+        self._scan_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запускает фоновое сканирование очереди и тестовый прогон, если они включены."""
+        config = self._config
+        if config.queue is not None:
+            _start_queue_scanner(self._service, config.queue.scan_interval, self._logger)
+        if config.run_on_start:
+            self._logger.info("Тестовый запуск по стартовой конфигурации")
+            _prefetch_snapshot(self._sheets, ["RSS", "VK", "Setka"], self._logger)
+            _process_all(self._service, self._logger)
+
+    def close(self) -> None:
+        """Освобождает потоки сервиса клиента после остановки расписания."""
+        self._service.close()
+
+    def jobs(self) -> List[Job]:
+        """Задачи планировщика: по одной на флоу и, если задано, подготовка за WARMUP_MINUTES до окна."""
+        schedule = self._config.schedule
+        tz = self._tz
+        lead = timedelta(minutes=schedule.warmup_minutes)
+        flows = (
+            ("rss", schedule.rss, self._service.process_rss_flow),
+            ("vk", schedule.vk, self._service.process_vk_flow),
+            ("setka", schedule.setka, self._service.process_setka_flow),
+        )
+        jobs = []
+        for flow, expression, func in flows:
+            if not expression:
+                continue
+            cron = CronExpression(expression)
+            jobs.append(Job(f"{self.name}:{flow}", cron, tz, func, group=self.name))
+            if lead > timedelta(0):
+                warm_up = partial(self._service.warm_up, flow)
+                jobs.append(
+                    Job(f"{self.name}:{flow}:warmup", cron, tz, warm_up, group=self.name, lead=lead, persistent=False)
+                )
+        if schedule.publish_at_scan:
+            jobs.append(
+                Job(
+                    f"{self.name}:publish_at",
+                    CronExpression(schedule.publish_at_scan),
+                    tz,
+                    self.scan_publish_at,
+                    group=self.name,
+                    persistent=False,
+                )
+            )
+        if self._config.vk.scheduled_posts_path is not None:
+            service_jobs = (
+                ("vk_push", schedule.vk_push, self.push_vk_posts),
+                ("vk_reconcile", schedule.vk_reconcile, self._service.reconcile_vk_posts),
+            )
+            for job_name, expression, func in service_jobs:
+                cron = CronExpression(expression)
+                jobs.append(Job(f"{self.name}:{job_name}", cron, tz, func, group=self.name, persistent=False))
+        return jobs
+
+    def push_vk_posts(self) -> None:
+        """Создаёт отложенные посты VK на окна флоу VK и RSS в пределах VK_SCHEDULED_HORIZON_HOURS."""
+        schedule = self._config.schedule
+        now = datetime.now(pytz.utc)
+        horizon = now + timedelta(hours=schedule.vk_push_horizon_hours)
+        windows: Dict[str, List[datetime]] = {}
+        for flow, expression in (("vk", schedule.vk), ("rss", schedule.rss)):
+            if not expression:
+                continue
+            cron = CronExpression(expression)
+            window = cron.next_after(now, self._tz)
+            while window <= horizon:
+                windows.setdefault(flow, []).append(window)
+                window = cron.next_after(window, self._tz)
+        self._service.push_vk_posts(windows)
+
+    def bind(self, scheduler: Scheduler) -> None:
+        """Подключает планировщик для строк с колонкой Publish At и сразу сканирует их."""
+        self._scheduler = scheduler
+        if self._config.schedule.publish_at_scan:
+            name = f"{self.name}:publish_at:start"
+            scheduler.schedule(
+                Job(name, None, self._tz, self.scan_publish_at, group=self.name, persistent=False),
+                datetime.now(pytz.utc),
+            )
+
+    def scan_publish_at(self) -> None:
+        """Сверяет планировщик со строками, у которых задано время публикации.
+
+        Новые и перенесённые строки планируются на своё время (просроченные не более чем на
+        SCHEDULE_CATCH_UP_HOURS — сразу), исчезнувшие из готовых снимаются с расписания.
+        Уже запланированная строка с тем же временем повторно не планируется, поэтому
+        неудачная публикация не повторяется до изменения времени или перезапуска.
+        """
+        with self._scan_lock:
+            self._sync_publish_at(self._service.timed_rows())
+
+    def _sync_publish_at(self, timed: Dict[str, List[Tuple[str, datetime]]]) -> None:
+        now = datetime.now(pytz.utc)
+        catch_up = timedelta(hours=self._config.schedule.catch_up_hours)
+        current = set()
+        for flow, entries in timed.items():
+            for key, due in entries:
+                name = f"{self.name}:{flow}:row:{key}"
+                current.add(name)
+                if self._planned.get(name) == due:
+                    continue
+                self._planned[name] = due
+                if now - due > catch_up:
+                    self._logger.warning(
+                        "Время публикации строки давно прошло, строка пропущена",
+                        extra={"flow": flow, "publish_at": due.isoformat()},
+                    )
+                    continue
+                publish = partial(self._service.publish_timed_row, flow, key)
+                job = Job(name, None, self._tz, publish, group=self.name, persistent=False)
+                self._scheduler.schedule(job, max(due, now))
+        for name in set(self._planned) - current:
+            del self._planned[name]
+            self._scheduler.cancel(name)
+        self._logger.info("Строки со временем публикации запланированы", extra={"rows": len(current)})
+
+    def run(self, due: List[Job], dispatcher: FlowDispatcher) -> None:
+        """Запускает наступившие флоу клиента в отдельных потоках; вкладки загружаются одним запросом."""
+        started = []
+        for job in due:
+            flow = self._job_flow(job)
+            if dispatcher.busy(job.name):
+                self._logger.warning(
+                    "Флоу ещё выполняется, окно пропущено", extra={"flow": flow, "window": job.fire_at.isoformat()}
+                )
+                continue
+            started.append((flow, job))
+        tabs = [tab for flow, _ in started for tab in ([FLOW_TABS[flow]] if flow in FLOW_TABS else FLOW_TABS.values())]
+        prefetch = _shared_prefetch(self._sheets, list(dict.fromkeys(tabs)), self._logger)
+        for flow, job in started:
+            if flow not in FLOW_TABS:
+                message = SERVICE_JOB_MESSAGES[flow]
+            elif job.cron is None:
+                message = "Публикация строки по времени"
+            elif job.lead:
+                message = "Подготовка окна публикации"
+            else:
+                message = "Запуск публикации"
+            self._logger.info(message, extra={"flow": flow, "window": job.fire_at.isoformat()})
+            # Окно считается выполненным только после завершения флоу: прерванное догонится после перезапуска
+            on_done = partial(self._scheduler.complete, job, job.fire_at)
+            dispatcher.submit(job.name, _after(prefetch, job.func), on_done=on_done)
+
+    def _job_flow(self, job: Job) -> str:
+        """Флоу или служебная задача из имени «<клиент>:<флоу>[:...]»; имя клиента может содержать «:»."""
+        return job.name[len(self.name) + 1 :].split(":", 1)[0]
 
 
 def main() -> None:
     """Запускает сервис и держит его запущенным для работы по расписанию."""
+    tenants_file = os.getenv("TENANTS_FILE", "").strip()
+    if tenants_file:
+        from publisher.supervisor import supervise
+
+        supervise(load_tenants(Path(tenants_file)), int(os.getenv("TENANT_PROCESSES", "2")))
+        return
+
     config = load_config()
     configure_logging(config.log_level)
     logger = get_logger("publisher.entry")
 
     logger.info("Сервис запускается и переходит в режим ожидания расписания")
 
-    sheets = SheetsClient(config.google)
-    telegraph = TelegraphClient(config.telegraph)
-    vk = VKClient(config.vk)
-    telegram = TelegramClient(config.telegram)
+    configure_circuit_breakers(config.retry.breaker_threshold, config.retry.breaker_reset_seconds)
+    shared = build_shared(config)
+    runner = build_runner("default", config, shared)
+    runner.start()
+    try:
+        run_forever([runner], config.schedule, shared)
+    except KeyboardInterrupt:
+        logger.info("Сервис остановлен пользователем")
+
+
+def run_forever(
+    runners: List[TenantRunner], schedule: ScheduleConfig, shared: Optional[SharedResources] = None
+) -> None:
+    """Выполняет флоу клиентов по расписанию до SIGTERM; одновременные окна клиентов обходятся по кругу.
+
+    Общие ресурсы процесса (``shared``) освобождаются после остановки всех клиентов.
+    """
+    logger = get_logger("publisher.entry")
+    order = itertools.cycle(range(len(runners)))
+    dispatcher = FlowDispatcher(schedule.flow_workers)
+    stop = threading.Event()
+
+    def dispatch(due: List[Job]) -> None:
+        start = next(order)
+        for runner in runners[start:] + runners[:start]:
+            jobs = [job for job in due if job.group == runner.name]
+            if jobs:
+                with log_context(tenant=runner.name), tenant_scope(runner.name):
+                    runner.run(jobs, dispatcher)
+
+    def request_stop(signum, frame) -> None:
+        stop.set()
+        scheduler.wake()
+
+    scheduler = Scheduler(
+        [job for runner in runners for job in runner.jobs()],
+        ScheduleState(schedule.state_path),
+        timedelta(hours=schedule.catch_up_hours),
+        dispatch,
+    )
+    for runner in runners:
+        runner.bind(scheduler)
+    signal.signal(signal.SIGTERM, request_stop)
+    try:
+        scheduler.run_forever(stop)
+    finally:
+        # Начатые публикации доводятся до записи в таблицу, новые окна не запускаются
+        logger.info("Остановка: новые флоу не запускаются")
+        dispatcher.drain(schedule.drain_seconds)
+        for runner in runners:
+            runner.close()
+        if shared is not None:
+            shared.close()
+
+
+def build_shared(config: AppConfig) -> SharedResources:
+    """Создаёт лимиты частоты, пул соединений и кэши, общие для всех клиентов процесса."""
+    shared = SharedResources(rate_limits=build_rate_limits(config.rate_limits), session=create_session())
+    if config.async_http:
+        shared.event_loop = EventLoopThread()
+        shared.http = create_async_http_client(config.async_http_connections)
+    if config.image_cache is not None:
+        shared.image_cache = ImageCache(
+            config.image_cache.directory,
+            config.image_cache.max_bytes,
+            config.image_cache.fresh_seconds,
+        )
+        if config.image_cache.normalize:
+            shared.normalizer = ImageNormalizer(shared.image_cache, config.image_cache.workers)
+    if config.vk.short_link_cache_path is not None:
+        shared.short_link_cache = ShortLinkCache(config.vk.short_link_cache_path, config.vk.short_link_ttl)
+    return shared
+
+
+def build_clients(config: AppConfig, shared: SharedResources) -> Tuple[Any, Any, Any]:
+    """Создаёт клиентов Telegra.ph, VK и Telegram на общем пуле соединений процесса.
+
+    При ASYNC_HTTP клиенты асинхронные: их запросы выполняются в общем event loop процесса,
+    а сервис вызывает их через BlockingClient так же, как синхронных.
+    """
+    rate_limits = shared.rate_limits
+    if shared.event_loop is None or shared.http is None:
+        telegraph = TelegraphClient(config.telegraph, rate_limits=rate_limits, session=shared.session)
+        vk = VKClient(
+            config.vk,
+            image_cache=shared.image_cache,
+            short_link_cache=shared.short_link_cache,
+            normalizer=shared.normalizer,
+            rate_limits=rate_limits,
+            session=shared.session,
+        )
+        telegram = TelegramClient(
+            config.telegram,
+            image_cache=shared.image_cache,
+            normalizer=shared.normalizer,
+            rate_limits=rate_limits,
+            session=shared.session,
+        )
+        return telegraph, vk, telegram
+    async_telegraph = AsyncTelegraphClient(config.telegraph, http=shared.http, rate_limits=rate_limits)
+    async_vk = AsyncVKClient(
+        config.vk,
+        http=shared.http,
+        image_cache=shared.image_cache,
+        short_link_cache=shared.short_link_cache,
+        normalizer=shared.normalizer,
+        rate_limits=rate_limits,
+    )
+    async_telegram = AsyncTelegramClient(
+        config.telegram,
+        http=shared.http,
+        image_cache=shared.image_cache,
+        normalizer=shared.normalizer,
+        rate_limits=rate_limits,
+    )
+    loop = shared.event_loop
+    return BlockingClient(async_telegraph, loop), BlockingClient(async_vk, loop), BlockingClient(async_telegram, loop)
+
+
+def build_runner(name: str, config: AppConfig, shared: SharedResources) -> TenantRunner:
+    """Создаёт клиентов площадок и сервис публикаций для одного клиента."""
+    rate_limits = shared.rate_limits
+    sheets = SheetsClient(config.google, rate_limits=rate_limits)
+    telegraph, vk, telegram = build_clients(config, shared)
+
+    queue = None
+    if config.queue is not None:
+        queue = WorkQueue(config.queue.path, config.queue.visibility_timeout, config.queue.max_attempts)
 
     service = PublisherService(
         sheets,
@@ -34,148 +389,83 @@ def main() -> None:
         vk,
         telegram,
         use_average_post=config.rss_use_average_post,
+        rss_batch_size=config.rss_batch_size,
+        rss_post_interval=config.rss_post_interval,
+        stage_workers=config.stage_workers,
+        retry_budget=config.retry.budget_per_flow,
+        journal=PublishJournal(config.journal_path) if config.journal_path is not None else None,
+        queue=queue,
+        queue_workers=config.queue.workers if config.queue is not None else 1,
+        publish_at_tz=pytz.timezone(config.schedule.timezone) if config.schedule.publish_at_scan else None,
+        scheduled_posts=ScheduledPosts(config.vk.scheduled_posts_path) if config.vk.scheduled_posts_path else None,
     )
+    return TenantRunner(name, config, service, sheets)
 
-    moscow_tz = pytz.timezone("Europe/Moscow")
-
-    if config.run_on_start:
-        logger.info("Тестовый запуск по стартовой конфигурации")
-        _process_all(service, logger)
 
-    last_runs_rss: Dict[int, date] = {}
-    last_run_vk: Tuple[date, int] | None = None
-    last_run_setka: Tuple[date, int] | None = None
+def build_rate_limits(config: RateLimitConfig) -> RateLimiterRegistry:
+    """Создаёт общие вёдра токенов: (запросов в секунду, допустимый всплеск) для каждой площадки."""
+    return RateLimiterRegistry(
+        {
+            "vk": (config.vk_per_second, config.vk_per_second),
+            "telegram": (config.telegram_per_minute / 60, 1),
+            "telegraph": (config.telegraph_per_minute / 60, 5),
+            "sheets": (config.sheets_per_minute / 60, 10),
+        }
+    )
 
-    last_skip_logged = {
-        "rss": None,
-        "vk": None,
-        "setka": None,
-    }
 
+def _prefetch_snapshot(sheets: SheetsClient, tabs: List[str], logger) -> None:
+    """Загружает вкладки одним запросом для всех флоу текущего запуска."""
+    if not tabs:
+        return
     try:
-        while True:
-            now_msk = datetime.now(moscow_tz)
-            minute = now_msk.minute
-            current_date = now_msk.date()
-            weekday = now_msk.weekday()
-
-            # RSS – два окна в сутки
-            if minute == 0 and now_msk.hour in config.rss_hours:
-                hour = now_msk.hour
-                if last_runs_rss.get(hour) != current_date:
-                    logger.info(
-                        "Запуск RSS-публикаций",
-                        extra={"hour": hour, "date": str(current_date)},
-                    )
-                    service.process_rss_flow()
-                    last_runs_rss[hour] = current_date
-                else:
-                    _log_skip_once(
-                        logger,
-                        last_skip_logged,
-                        "rss",
-                        now_msk,
-                        reason="RSS уже опубликован в этот час",
-                    )
-            elif minute == 0 and last_skip_logged["rss"] != (current_date, now_msk.hour):
-                _log_skip_once(
-                    logger,
-                    last_skip_logged,
-                    "rss",
-                    now_msk,
-                    reason="вне окна публикации",
-                    extra={"allowed_hours": config.rss_hours},
-                )
+        sheets.snapshot(tabs)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(
+            "Не удалось загрузить снимок таблицы, флоу прочитают вкладки самостоятельно",
+            extra={"tabs": tabs, "error": str(exc)},
+        )
 
-            # VK – один пост в разрешённые дни
-            if (
-                minute == 0
-                and now_msk.hour == config.vk_hour
-                and weekday in config.vk_schedule_days
-            ):
-                if last_run_vk != (current_date, config.vk_hour):
-                    logger.info(
-                        "Запуск публикации VK",
-                        extra={"hour": config.vk_hour, "weekday": weekday},
-                    )
-                    service.process_vk_flow()
-                    last_run_vk = (current_date, config.vk_hour)
-                else:
-                    _log_skip_once(
-                        logger,
-                        last_skip_logged,
-                        "vk",
-                        now_msk,
-                        reason="пост VK уже опубликован сегодня",
-                    )
-            elif minute == 0 and last_skip_logged["vk"] != (current_date, now_msk.hour):
-                reason = (
-                    "неразрешённый день" if weekday not in config.vk_schedule_days else "вне окна"
-                )
-                _log_skip_once(
-                    logger,
-                    last_skip_logged,
-                    "vk",
-                    now_msk,
-                    reason=reason,
-                    extra={"allowed_days": sorted(config.vk_schedule_days)},
-                )
 
-            # Setka – один пост в разрешённые дни
-            if (
-                minute == 0
-                and now_msk.hour == config.setka_hour
-                and weekday in config.setka_schedule_days
-            ):
-                if last_run_setka != (current_date, config.setka_hour):
-                    logger.info(
-                        "Запуск публикации Setka",
-                        extra={"hour": config.setka_hour, "weekday": weekday},
-                    )
-                    service.process_setka_flow()
-                    last_run_setka = (current_date, config.setka_hour)
-                else:
-                    _log_skip_once(
-                        logger,
-                        last_skip_logged,
-                        "setka",
-                        now_msk,
-                        reason="пост Setka уже опубликован сегодня",
-                    )
-            elif minute == 0 and last_skip_logged["setka"] != (current_date, now_msk.hour):
-                reason = (
-                    "неразрешённый день"
-                    if weekday not in config.setka_schedule_days
-                    else "вне окна"
-                )
-                _log_skip_once(
-                    logger,
-                    last_skip_logged,
-                    "setka",
-                    now_msk,
-                    reason=reason,
-                    extra={"allowed_days": sorted(config.setka_schedule_days)},
-                )
+def _shared_prefetch(sheets: SheetsClient, tabs: List[str], logger) -> Callable[[], None]:
+    """Загрузка снимка, общая для флоу одного запуска: выполняет её первый флоу, остальные ждут."""
+    lock = threading.Lock()
+    loaded = False
 
-            # Сон до начала следующей минуты
-            sleep_seconds = 60 - now_msk.second
-            if sleep_seconds <= 0:
-                sleep_seconds = 60
-            time.sleep(sleep_seconds)
-    except KeyboardInterrupt:
-        logger.info("Сервис остановлен пользователем")
+    def prefetch() -> None:
+        nonlocal loaded
+        with lock:
+            if not loaded:
+                _prefetch_snapshot(sheets, tabs, logger)
+                loaded = True
 
+    return prefetch
 
-def _log_skip_once(logger, cache, key, timestamp, reason, extra=None):
-    """Логирует события пропуска не чаще одного раза в час."""
-    signature = (timestamp.date(), timestamp.hour)
-    if cache[key] == signature:
-        return
-    payload = {"reason": reason, "hour": timestamp.hour, "weekday": timestamp.weekday()}
-    if extra:
-        payload.update(extra)
-    logger.info("Пропуск публикации", extra={"flow": key, **payload})
-    cache[key] = signature
+
+def _after(first: Callable[[], None], func: Callable[[], None]) -> Callable[[], None]:
+    """Выполняет func после first."""
+
+    def run() -> None:
+        first()
+        func()
+
+    return run
+
+
+def _start_queue_scanner(service: PublisherService, interval: float, logger) -> None:
+    """Запускает фоновое сканирование вкладок в очередь, независимое от окон публикации."""
+
+    def scan_forever() -> None:
+        while True:
+            try:
+                service.enqueue_ready_rows()
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Сканирование очереди завершилось ошибкой", extra={"error": str(exc)})
+            time.sleep(interval)
+
+    # Поток наследует контекст логирования (имя клиента) запускающего кода
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(scan_forever,), name="queue-scanner", daemon=True).start()
 
 
 def _process_all(service: PublisherService, logger) -> None:
@@ -0,0 +1,51 @@
+"""Асинхронная точка входа в сервис публикаций."""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+
+from publisher.services.publisher import PublisherService
+
+
+class AsyncPublisherService:
+    """Сценарии PublisherService для приложений на asyncio: сценарии разных флоу выполняются одновременно.
+
+    Логика публикации (журнал, очередь, Publish At, отложенные посты VK, кэш изображений) остаётся
+    в PublisherService и выполняется в потоках, не блокируя event loop; с асинхронными клиентами
+    (ASYNC_HTTP, см. run.build_clients) их запросы идут через общий пул соединений httpx.
+    """
+
+    def __init__(self, service: PublisherService) -> None:
+        self._service = service
+
+    async def run_all(self) -> None:
+        """Запускает все сценарии одновременно."""
+        await asyncio.gather(self.process_rss_flow(), self.process_vk_flow(), self.process_setka_flow())
+
+    async def process_rss_flow(self) -> None:
+        """Обрабатывает пачку RSS-строк с наибольшим Score."""
+        await asyncio.to_thread(self._service.process_rss_flow)
+
+    async def process_vk_flow(self) -> None:
+        """Обрабатывает точечный пост VK."""
+        await asyncio.to_thread(self._service.process_vk_flow)
+
+    async def process_setka_flow(self) -> None:
+        """Обрабатывает точечный пост Telegram."""
+        await asyncio.to_thread(self._service.process_setka_flow)
+
+    async def warm_up(self, flow: str) -> None:
+        """Готовит окно флоу заранее."""
+        await asyncio.to_thread(self._service.warm_up, flow)
+
+    async def publish_timed_row(self, flow: str, key: str) -> None:
+        """Публикует строку с наступившим временем Publish At."""
+        await asyncio.to_thread(self._service.publish_timed_row, flow, key)
+
+    async def push_vk_posts(self, windows: Dict[str, List[datetime]]) -> None:
+        """Создаёт отложенные посты VK на ближайшие окна."""
+        await asyncio.to_thread(self._service.push_vk_posts, windows)
+
+    async def reconcile_vk_posts(self) -> None:
+        """Сверяет будущие отложенные посты VK со строками таблицы."""
+        await asyncio.to_thread(self._service.reconcile_vk_posts)
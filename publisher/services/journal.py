@@ -0,0 +1,62 @@
+"""Журнал выполненных шагов публикации для возобновления после сбоя."""
+
+import hashlib
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    flow TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    step TEXT NOT NULL,
+    value TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (flow, row_key, step)
+);
+"""
+
+# Записи старше этого срока считаются брошенными (строку удалили или переписали)
+RETENTION_SECONDS = 30 * 24 * 3600.0
+
+
+def row_key(*parts: str) -> str:
+    """Ключ строки по её содержимому: номер строки может сместиться при правке таблицы."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class PublishJournal:
+    """Хранит результаты шагов публикации строки (ссылки на посты) до записи их в таблицу."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._connection:
+            # WAL и синхронная запись: шаг считается выполненным только после фиксации на диске
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=FULL")
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute("DELETE FROM steps WHERE recorded_at < ?", (time.time() - RETENTION_SECONDS,))
+
+    def steps(self, flow: str, key: str) -> Dict[str, str]:
+        """Возвращает уже выполненные шаги строки и их результаты."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT step, value FROM steps WHERE flow = ? AND row_key = ?", (flow, key)
+            ).fetchall()
+        return dict(rows)
+
+    def record(self, flow: str, key: str, step: str, value: str) -> None:
+        """Фиксирует результат шага."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?)", (flow, key, step, value, time.time())
+            )
+
+    def forget(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """Удаляет шаги строк, результаты которых уже записаны в таблицу."""
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM steps WHERE flow = ? AND row_key = ?", list(entries))
@@ -1,18 +1,58 @@
 """Бизнес-логика публикации контента."""
 
-import html
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, TypeVar, Union
+
+import pytz
+from pytz.tzinfo import BaseTzInfo
 
 from publisher.core.logger import get_logger
+from publisher.core.retry import retry_budget
+from publisher.core.scheduler import parse_publish_at
+from publisher.core.stages import StageGraph
+from publisher.core.work_queue import QueueItem, WorkQueue
 from publisher.gs.sheets import RSSRow, SetkaRow, SheetsClient, VKRow
+from publisher.services.journal import PublishJournal, row_key
+from publisher.services.texts import PostTextMixin
 from publisher.telegraph.client import TelegraphClient
 from publisher.tg.client import TelegramClient
-from publisher.vk.client import VKClient
+from publisher.vk.client import UploadedPhoto, VKClient
+from publisher.vk.scheduled_posts import ScheduledPost, ScheduledPosts
+
+Row = TypeVar("Row", RSSRow, VKRow, SetkaRow)
+
+
+def _rss_key(row: RSSRow) -> str:
+    return row_key(row.link, row.gpt_post_title, row.gpt_post)
+
+
+def _post_key(row: Union[VKRow, SetkaRow]) -> str:
+    return row_key(row.title, row.content, row.image_url)
+
 
+def _row_key(flow: str, row: Any) -> str:
+    return _rss_key(row) if flow == "rss" else _post_key(row)
 
-class PublisherService:
+
+def _vk_post_id(link: str) -> int:
+    """Идентификатор поста из ссылки вида https://vk.com/wall-1_23."""
+    return int(link.rsplit("_", 1)[1])
+
+
+class PublisherService(PostTextMixin):
     """Оркестратор публикаций."""
-    VK_RSS_FALLBACK_NOTE = "Не отправлено в VK"
+
+    # Ближе этого к времени выхода отложенные посты VK не создаются и не отменяются
+    SCHEDULE_MARGIN = timedelta(minutes=5)
+    # VK выпускает отложенные посты с задержкой: столько флоу ждёт выхода после окна
+    RELEASE_WAIT = timedelta(minutes=2)
+    # Пауза между проверками, вышли ли отложенные посты VK
+    RELEASE_POLL_INTERVAL = 10.0
 
     def __init__(
         self,
@@ -21,6 +61,15 @@ class PublisherService:
         vk: VKClient,
         telegram: TelegramClient,
         use_average_post: bool = False,
+        rss_batch_size: int = 1,
+        rss_post_interval: float = 0.0,
+        stage_workers: int = 4,
+        retry_budget: Optional[int] = None,
+        journal: Optional[PublishJournal] = None,
+        queue: Optional[WorkQueue] = None,
+        queue_workers: int = 1,
+        publish_at_tz: Optional[BaseTzInfo] = None,
+        scheduled_posts: Optional[ScheduledPosts] = None,
     ) -> None:
         self._sheets = sheets
         self._telegraph = telegraph
@@ -28,6 +77,34 @@ class PublisherService:
         self._telegram = telegram
         self._logger = get_logger("publisher")
         self._use_average_post = use_average_post
+        # Общий запас повторов на один запуск флоу
+        self._retry_budget = retry_budget
+        self._journal = journal
+        self._queue = queue
+        self._queue_workers = max(1, queue_workers)
+        # Часовой пояс колонки Publish At; None — колонка не используется
+        self._publish_at_tz = publish_at_tz
+        # Строки с ошибкой в Publish At, о которых уже написано в таблицу
+        self._reported_publish_at: Set[str] = set()
+        # Отложенные посты VK, созданные заранее; None — посты VK публикуются в момент окна
+        self._scheduled_posts = scheduled_posts
+        # Строки, чьи результаты поставлены в запись таблицы, но ещё не отправлены
+        self._unflushed: List[Tuple[str, str, Optional[QueueItem]]] = []
+        self._unflushed_lock = threading.Lock()
+        # Подготовка окна и сам флоу не выполняются одновременно
+        self._flow_locks = {flow: threading.Lock() for flow in ("rss", "vk", "setka")}
+        # Страницы Telegraph, созданные подготовкой окна: ключ строки -> ссылка
+        self._warm_pages: Dict[str, str] = {}
+        # Ссылки RSS, сокращённые подготовкой окна: исходная ссылка -> короткая
+        self._warm_short_links: Dict[str, str] = {}
+        self._rss_batch_size = max(1, rss_batch_size)
+        self._rss_post_interval = rss_post_interval
+        # Пул для параллельных этапов публикации одной строки
+        self._executor = ThreadPoolExecutor(max_workers=stage_workers, thread_name_prefix="publish-stage")
+
+    def close(self) -> None:
+        """Останавливает пул этапов публикации; зависшие этапы не ожидаются."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
     def run_all(self) -> None:
         """Запускает все сценарии."""
@@ -35,38 +112,437 @@ class PublisherService:
         self.process_vk_flow()
         self.process_setka_flow()
 
+    def enqueue_ready_rows(self) -> None:
+        """Сканирует вкладки и приводит очередь публикаций к списку готовых строк."""
+        if self._queue is None:
+            return
+        sources: Sequence[Tuple[str, Callable[[], List[Any]], Callable[[Any], str], Callable[[Any], float]]] = (
+            ("rss", self._sheets.fetch_rss_ready_rows, _rss_key, lambda row: row.score),
+            ("vk", self._sheets.fetch_vk_rows, _post_key, lambda row: -row.row_number),
+            ("setka", self._sheets.fetch_setka_rows, _post_key, lambda row: -row.row_number),
+        )
+        for flow, fetch, key, priority in sources:
+            try:
+                rows = [row for row in fetch() if self._for_window(flow, row)]
+                added = self._queue.sync(flow, [(key(row), priority(row), asdict(row)) for row in rows])
+            except Exception as exc:  # noqa: BLE001
+                self._logger.warning("Не удалось просканировать вкладку для очереди", extra={"flow": flow, "error": str(exc)})
+                continue
+            if added:
+                self._logger.info("Строки поставлены в очередь", extra={"flow": flow, "added": added})
+
     def process_rss_flow(self) -> None:
-        """Обрабатывает RSS-строки."""
-        rows = self._sheets.fetch_rss_ready_rows()
-        if not rows:
-            self._logger.info("Нет строк RSS для публикации")
+        """Обрабатывает пачку RSS-строк с наибольшим Score."""
+        with self._flow_locks["rss"], retry_budget(self._retry_budget):
+            if self._publish_scheduled("rss"):
+                return
+            claimed = self._take_rows(
+                "rss", self._rss_batch_size, self._sheets.fetch_rss_ready_rows, lambda row: row.score
+            )
+            if not claimed:
+                self._logger.info("Нет строк RSS для публикации")
+                return
+            short_links = self._prefetch_short_links([row for row, _ in claimed])
+            try:
+                with self._sheets.deferred_writes():
+                    self._publish_rss_batch(claimed, short_links)
+            finally:
+                self._flush_sheets()
+                self._log_short_link_stats()
+
+    def timed_rows(self) -> Dict[str, List[Tuple[str, datetime]]]:
+        """Строки к публикации с заполненной колонкой Publish At: флоу -> [(ключ строки, время публикации)].
+
+        Строка с неразборчивым временем не публикуется ни по нему, ни в общее окно; ошибка
+        записывается в её заметку один раз за время работы процесса.
+        """
+        result: Dict[str, List[Tuple[str, datetime]]] = {}
+        if self._publish_at_tz is None:
+            return result
+        for flow, (fetch, write_error) in self._row_sources().items():
+            entries = []
+            for row in fetch():
+                if not self._is_timed(row):
+                    continue
+                key = _row_key(flow, row)
+                try:
+                    entries.append((key, parse_publish_at(row.publish_at, self._publish_at_tz)))
+                except ValueError as exc:
+                    self._logger.warning("Неверное время публикации", extra={"flow": flow, "row": row.row_number})
+                    if key not in self._reported_publish_at:
+                        self._reported_publish_at.add(key)
+                        write_error(row, str(exc))
+            result[flow] = entries
+        self._flush_sheets()
+        return result
+
+    def publish_timed_row(self, flow: str, key: str) -> None:
+        """Публикует строку со временем публикации, если она всё ещё ждёт публикации и не изменилась."""
+        fetch, _ = self._row_sources()[flow]
+        with self._flow_locks[flow], retry_budget(self._retry_budget):
+            row = next((row for row in fetch() if _row_key(flow, row) == key), None)
+            if row is None:
+                self._logger.info("Строка изменилась или уже опубликована", extra={"flow": flow})
+                return
+            if flow == "vk":
+                self._publish_vk_row(row)
+            elif flow == "setka":
+                self._publish_setka_row(row)
+            else:
+                try:
+                    self._publish_rss_row(row)
+                finally:
+                    self._flush_sheets()
+
+    def _row_sources(self) -> Dict[str, Tuple[Callable[[], List[Any]], Callable[[Any, str], None]]]:
+        """Чтение готовых строк и запись ошибки для каждого флоу."""
+        return {
+            "rss": (self._sheets.fetch_rss_ready_rows, self._sheets.write_rss_error),
+            "vk": (self._sheets.fetch_vk_rows, self._sheets.write_vk_error),
+            "setka": (self._sheets.fetch_setka_rows, self._sheets.write_setka_error),
+        }
+
+    def _is_timed(self, row: Any) -> bool:
+        """Строка публикуется по своей колонке Publish At, а не в общее окно флоу."""
+        return self._publish_at_tz is not None and bool(row.publish_at.strip())
+
+    def _for_window(self, flow: str, row: Any) -> bool:
+        """Строка ждёт общего окна флоу: у неё нет своего времени публикации и отложенного поста VK."""
+        if self._is_timed(row):
+            return False
+        return self._scheduled_posts is None or self._scheduled_posts.get(flow, _row_key(flow, row)) is None
+
+    def push_vk_posts(self, windows: Dict[str, List[datetime]]) -> None:
+        """Заранее создаёт отложенные посты VK для ближайших окон флоу VK и RSS.
+
+        Строки распределяются по окнам так же, как их выбрал бы флоу: VK — по одной сверху вниз,
+        RSS — пачкой по Score (для RSS заранее создаётся страница Telegraph). Окна, до которых
+        меньше SCHEDULE_MARGIN, и окна, у которых уже есть отложенные посты, пропускаются.
+        """
+        if self._scheduled_posts is None:
             return
-        row = rows[0]
-        self._logger.info("Начало обработки RSS", extra={"row": row.row_number})
+        self.reconcile_vk_posts()
+        earliest = datetime.now(pytz.utc) + self.SCHEDULE_MARGIN
+        sources = (
+            ("vk", 1, self._sheets.fetch_vk_rows, lambda row: -row.row_number),
+            ("rss", self._rss_batch_size, self._sheets.fetch_rss_ready_rows, lambda row: row.score),
+        )
+        for flow, per_window, fetch, priority in sources:
+            with self._flow_locks[flow], retry_budget(self._retry_budget):
+                taken = {post.publish_at for post in self._scheduled_posts.all(flow)}
+                rows = sorted([row for row in fetch() if self._for_window(flow, row)], key=priority, reverse=True)
+                for window in windows.get(flow, []):
+                    if window <= earliest or window in taken:
+                        continue
+                    batch, rows = rows[:per_window], rows[per_window:]
+                    for row in batch:
+                        self._schedule_vk_post(flow, row, window)
+                self._flush_sheets()
+
+    def reconcile_vk_posts(self) -> None:
+        """Сверяет будущие отложенные посты VK с таблицей: посты изменённых строк удаляются.
+
+        Пост, удалённый в VK вручную, забывается, и строка снова ждёт окна. Посты, до выхода
+        которых меньше SCHEDULE_MARGIN, не трогаются: VK может опубликовать их во время сверки.
+        Вышедшие посты, которые VK опубликовал позже окна флоу, дописываются в таблицу.
+        """
+        if self._scheduled_posts is None:
+            return
+        for flow in ("vk", "rss"):
+            with self._flow_locks[flow], retry_budget(self._retry_budget):
+                self._publish_scheduled(flow)
+        horizon = datetime.now(pytz.utc) + self.SCHEDULE_MARGIN
+        posts: Dict[str, List[ScheduledPost]] = {}
+        for flow in ("vk", "rss"):
+            posts[flow] = [post for post in self._scheduled_posts.all(flow) if post.publish_at > horizon]
+        if not any(posts.values()):
+            return
+        postponed = self._vk.postponed_post_ids()
+        for flow, flow_posts in posts.items():
+            if not flow_posts:
+                continue
+            fetch, _ = self._row_sources()[flow]
+            keys = {_row_key(flow, row) for row in fetch()}
+            for post in flow_posts:
+                extra = {"flow": flow, "post_id": post.post_id, "publish_at": post.publish_at.isoformat()}
+                if post.post_id not in postponed:
+                    self._logger.warning("Отложенный пост VK удалён вне сервиса, строка вернётся в окно", extra=extra)
+                elif post.key not in keys:
+                    self._vk.delete_post(post.post_id)
+                    self._logger.info("Строка изменена или снята, отложенный пост VK отменён", extra=extra)
+                else:
+                    continue
+                self._scheduled_posts.remove(flow, post.key)
+
+    def _schedule_vk_post(self, flow: str, row: Any, window: datetime) -> None:
+        """Создаёт отложенный пост VK для строки; при ошибке строка остаётся обычному окну."""
+        key = _row_key(flow, row)
         try:
-            telegraph_link = row.telegraph_link
-            if not telegraph_link:
-                title = self._derive_title(row.gpt_post_title, row.gpt_post)
-                telegraph_link = self._telegraph.create_page(title=title, gpt_post=row.gpt_post, image_url=row.image_url or None)
-            if self._use_average_post and row.average_post.strip():
-                sanitized_text = self._prepare_average_post(row.average_post, row.gpt_post_title)
-                link_label = "Источник >"
-                raw_link = row.link.strip()
+            if flow == "vk":
+                message = self._compose_vk_message(row.title, row.content)
             else:
-                sanitized_text = self._prepare_short_post(row.short_post, row.gpt_post_title)
-                link_label = "Читать подробнее >"
-                raw_link = telegraph_link or ""
-            vk_link_target = self._resolve_vk_link_target(raw_link)
-            vk_message = self._compose_vk_post_with_link(sanitized_text, vk_link_target, link_label)
-            vk_link = self._publish_vk_for_rss(vk_message, row)
-            telegram_link = self._telegram.send_post(
-                sanitized_text,
-                row.image_url,
-                raw_link or None,
-                add_spacing=True,
-                link_label=link_label,
+                row = self._warm_up_rss_row(row)
+                if not row.telegraph_link:
+                    return
+                use_average, text, link_label = self._prepare_rss_text(row, self._use_average_post)
+                raw_link = row.link.strip() if use_average else row.telegraph_link
+                message = self._compose_vk_post_with_link(text, self._resolve_vk_link_target(raw_link), link_label)
+            link = self._vk.publish_post(message, row.image_url, publish_date=window)
+        except Exception as exc:  # noqa: BLE001
+            self._logger.warning(
+                "Не удалось создать отложенный пост VK, строка будет опубликована в окно",
+                extra={"flow": flow, "row": row.row_number, "error": str(exc)},
+            )
+            return
+        self._scheduled_posts.add(flow, key, _vk_post_id(link), link, window)
+        self._logger.info(
+            "Отложенный пост VK создан",
+            extra={"flow": flow, "row": row.row_number, "vk_link": link, "publish_at": window.isoformat()},
+        )
+
+    def _scheduled_link(self, flow: str, key: str) -> Optional[str]:
+        """Ссылка на отложенный пост VK строки: такой пост уже создан и повторно не публикуется."""
+        if self._scheduled_posts is None:
+            return None
+        post = self._scheduled_posts.get(flow, key)
+        return post.link if post is not None else None
+
+    def _publish_scheduled(self, flow: str) -> bool:
+        """Дописывает строки, чьи отложенные посты VK вышли; False — таких строк нет, окно идёт обычным порядком.
+
+        Пост VK строки повторно не публикуется: для RSS остаются Telegram и запись в таблицу,
+        для VK — только запись ссылки. Вызывается под блокировкой флоу.
+        """
+        due = self._due_scheduled_rows(flow)
+        if not due:
+            return False
+        for row in due:
+            if flow == "vk":
+                self._publish_vk_row(row)
+                continue
+            try:
+                self._publish_rss_row(row)
+            finally:
+                self._flush_sheets()
+        return True
+
+    def _due_scheduled_rows(self, flow: str) -> List[Any]:
+        """Строки, отложенные посты VK которых уже вышли.
+
+        Если VK ещё не выпустил пост, флоу опрашивает стену до RELEASE_WAIT после окна; пост,
+        вышедший позже, дописывается сверкой reconcile_vk_posts.
+        """
+        if self._scheduled_posts is None:
+            return []
+        due = [post for post in self._scheduled_posts.all(flow) if post.publish_at <= datetime.now(pytz.utc)]
+        if not due:
+            return []
+        postponed = self._vk.postponed_post_ids()
+        wait_until = max(post.publish_at for post in due) + self.RELEASE_WAIT
+        while any(post.post_id in postponed for post in due) and datetime.now(pytz.utc) < wait_until:
+            time.sleep(self.RELEASE_POLL_INTERVAL)
+            postponed = self._vk.postponed_post_ids()
+        released = {post.post_id for post in due if post.post_id not in postponed}
+        # Вышедший пост получает в VK новый идентификатор: в таблицу пишется ссылка на него
+        live = self._vk.published_posts(released) if released else {}
+        fetch, _ = self._row_sources()[flow]
+        rows = {_row_key(flow, row): row for row in fetch()}
+        ready = []
+        for post in due:
+            extra = {"flow": flow, "post_id": post.post_id}
+            link = live.get(post.post_id)
+            if post.post_id in postponed:
+                self._logger.warning("VK ещё не опубликовал отложенный пост", extra=extra)
+                continue
+            if link is None:
+                self._logger.warning("Вышедший пост VK не найден на стене, строка вернётся в окно", extra=extra)
+            elif post.key not in rows:
+                self._logger.warning("Отложенный пост VK вышел, но строка с тех пор изменилась", extra=extra)
+            else:
+                self._scheduled_posts.add(flow, post.key, _vk_post_id(link), link, post.publish_at)
+                ready.append(rows[post.key])
+                continue
+            self._scheduled_posts.remove(flow, post.key)
+        return ready
+
+    def warm_up(self, flow: str) -> None:
+        """Готовит ближайшее окно флоу: к его началу остаются только вызовы публикации.
+
+        Строки-кандидаты читаются и проверяются заранее, для RSS создаются страницы Telegraph
+        (ссылка записывается в Telegraph Link) и сокращаются ссылки, изображения скачиваются в кэш,
+        адрес загрузки фото VK запрашивается и соединения с площадками открываются. Ошибки подготовки
+        только пишутся в лог: флоу в своё окно выполнит недостающие шаги сам.
+        """
+        with self._flow_locks[flow], retry_budget(self._retry_budget):
+            if flow == "rss":
+                rows = self._peek_rows(
+                    "rss", self._rss_batch_size, self._sheets.fetch_rss_ready_rows, lambda row: row.score
+                )
+                prepared = [self._warm_up_rss_row(row) for row in rows]
+                self._flush_sheets()
+                self._warm_short_links = self._shorten_links(self._batch_links(prepared))
+            elif flow == "vk":
+                prepared = self._peek_rows("vk", 1, self._sheets.fetch_vk_rows, lambda row: -row.row_number)
+                for row in prepared:
+                    self._check_text("vk", row.row_number, self._compose_vk_message(row.title, row.content))
+            else:
+                prepared = self._peek_rows("setka", 1, self._sheets.fetch_setka_rows, lambda row: -row.row_number)
+                for row in prepared:
+                    self._check_text("setka", row.row_number, self._prepare_setka_post(row)[0])
+            if not prepared:
+                self._logger.info("Нет строк для подготовки окна", extra={"flow": flow})
+                return
+            if flow != "setka":
+                self._warm(flow, "vk_upload_server", self._vk.prepare_upload)
+            if flow != "vk":
+                self._warm(flow, "telegram", self._telegram.warm_up)
+            for row in prepared:
+                if not row.image_url:
+                    continue
+                if flow != "setka":
+                    self._warm(flow, "vk_image", self._vk.prefetch_image, row.image_url)
+                if flow != "vk":
+                    self._warm(flow, "telegram_image", self._telegram.prefetch_image, row.image_url)
+            self._logger.info("Окно подготовлено", extra={"flow": flow, "rows": [row.row_number for row in prepared]})
+
+    def _warm_up_rss_row(self, row: RSSRow) -> RSSRow:
+        """Проверяет текст строки RSS и заранее создаёт её страницу Telegraph."""
+        _, text, _ = self._prepare_rss_text(row, self._use_average_post)
+        self._check_text("rss", row.row_number, text)
+        key = _rss_key(row)
+        page = row.telegraph_link or self._journal_steps("rss", key).get("telegraph") or self._warm_pages.get(key)
+        if page:
+            return replace(row, telegraph_link=page)
+        title = self._derive_title(row.gpt_post_title, row.gpt_post)
+        page = self._warm("rss", "telegraph", self._telegraph.create_page, title, row.gpt_post, row.image_url or None)
+        if not page:
+            return row
+        self._record_step("rss", key, "telegraph", page)
+        self._warm_pages[key] = page
+        self._sheets.write_rss_telegraph_link(row, page)
+        return replace(row, telegraph_link=page)
+
+    def _check_text(self, flow: str, row_number: int, text: str) -> None:
+        """Предупреждает заранее, что у строки-кандидата пустой текст поста."""
+        if not text.strip():
+            self._logger.warning("У строки к публикации пустой текст", extra={"flow": flow, "row": row_number})
+
+    def _warm(self, flow: str, step: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет шаг подготовки окна; ошибка пишется в лог и не прерывает подготовку."""
+        try:
+            return func(*args)
+        except Exception as exc:  # noqa: BLE001
+            self._logger.warning(
+                "Шаг подготовки окна не выполнен", extra={"flow": flow, "step": step, "error": str(exc)}
             )
+            return None
+
+    def _peek_rows(
+        self,
+        flow: str,
+        limit: int,
+        fetch: Callable[[], List[Row]],
+        priority: Callable[[Row], float],
+    ) -> List[Row]:
+        """Строки, которые флоу возьмёт в ближайшее окно, без их захвата в очереди."""
+        if self._queue is not None:
+            return [row for row, _ in self._current_rows(flow, self._queue.peek(flow, limit), fetch)]
+        return sorted([row for row in fetch() if self._for_window(flow, row)], key=priority, reverse=True)[:limit]
+
+    def _take_rows(
+        self,
+        flow: str,
+        limit: int,
+        fetch: Callable[[], List[Row]],
+        priority: Callable[[Row], float],
+    ) -> List[Tuple[Row, Optional[QueueItem]]]:
+        """Берёт строки флоу из очереди, а без неё — напрямую из таблицы."""
+        if self._queue is not None:
+            return list(self._current_rows(flow, self._queue.claim(flow, limit), fetch))
+        rows = sorted([row for row in fetch() if self._for_window(flow, row)], key=priority, reverse=True)[:limit]
+        return [(row, None) for row in rows]
+
+    def _current_rows(
+        self, flow: str, items: List[QueueItem], fetch: Callable[[], List[Row]]
+    ) -> List[Tuple[Row, QueueItem]]:
+        """Находит задачи очереди в текущей таблице по ключу содержимого.
+
+        Номер строки из сканирования мог сместиться, если редактор вставил или удалил строки выше,
+        поэтому результат пишется в строку, прочитанную сейчас. Изменённая или уже опубликованная
+        строка пропускается; её задача уйдёт из очереди при следующем сканировании.
+        """
+        if not items:
+            return []
+        current = {_row_key(flow, row): row for row in fetch()}
+        resolved = []
+        for item in items:
+            row = current.get(item.key)
+            if row is None:
+                self._logger.info("Строка из очереди изменилась или уже опубликована", extra={"flow": flow})
+            elif self._for_window(flow, row):
+                resolved.append((row, item))
+        return resolved
+
+    def _publish_rss_batch(self, claimed: List[Tuple[RSSRow, Optional[QueueItem]]], short_links: Dict[str, str]) -> None:
+        """Публикует пачку: по очереди с паузой или параллельно пулом обработчиков очереди."""
+        if self._queue is None or self._queue_workers == 1:
+            for index, (row, item) in enumerate(claimed):
+                if index and self._rss_post_interval > 0:
+                    time.sleep(self._rss_post_interval)
+                self._publish_rss_row(row, short_links, item)
+            return
+        with ThreadPoolExecutor(max_workers=self._queue_workers, thread_name_prefix="publish-worker") as workers:
+            futures = [
+                workers.submit(contextvars.copy_context().run, self._publish_rss_row, row, short_links, item)
+                for row, item in claimed
+            ]
+            for future in futures:
+                future.result()
+
+    def _prefetch_short_links(self, batch: List[RSSRow]) -> Dict[str, str]:
+        """Короткие ссылки пачки: сокращённые подготовкой окна и остальные известные одним запросом VK execute.
+
+        Единственная несокращённая ссылка остаётся этапу short_link, который идёт параллельно с загрузкой фото.
+        """
+        short_links = dict(self._warm_short_links)
+        missing = [link for link in self._batch_links(batch) if link not in short_links]
+        if len(missing) > 1:
+            short_links.update(self._shorten_links(missing))
+        return short_links
+
+    def _batch_links(self, batch: List[RSSRow]) -> List[str]:
+        """Ссылки постов VK пачки, известные до публикации (исходная или страница Telegraph)."""
+        links = []
+        for row in batch:
+            use_average, _, _ = self._prepare_rss_text(row, self._use_average_post)
+            link = row.link.strip() if use_average else row.telegraph_link or self._warm_pages.get(_rss_key(row))
+            if link:
+                links.append(link)
+        return links
+
+    def _shorten_links(self, links: List[str]) -> Dict[str, str]:
+        """Сокращает ссылки одним запросом VK execute; при ошибке возвращает пустой словарь."""
+        if not links:
+            return {}
+        try:
+            return self._vk.get_short_links(links)
+        except Exception as exc:  # noqa: BLE001
+            self._logger.warning("Не удалось сократить ссылки пачки RSS", extra={"error": str(exc)})
+            return {}
+
+    def _publish_rss_row(
+        self, row: RSSRow, short_links: Optional[Dict[str, str]] = None, item: Optional[QueueItem] = None
+    ) -> None:
+        """Публикует одну RSS-строку; ошибка записывается только в эту строку."""
+        self._logger.info("Начало обработки RSS", extra={"row": row.row_number})
+        key = _rss_key(row)
+        try:
+            results = self._build_rss_stages(row, short_links or {}, key).run(self._executor)
+            telegraph_link = results["telegraph"]
+            vk_link = results["vk"]
+            telegram_link = results["telegram"]
             self._sheets.update_rss_row(row, telegraph_link, vk_link, telegram_link)
+            self._settle("rss", key, item)
             self._logger.info(
                 "RSS опубликован",
                 extra={
@@ -81,112 +557,179 @@ class PublisherService:
             self._logger.error("Ошибка RSS", extra={"row": row.row_number, "error": message})
             self._sheets.write_rss_error(row, message)
 
+    def _build_rss_stages(self, row: RSSRow, short_links: Dict[str, str], key: str = "") -> StageGraph:
+        """Строит граф публикации RSS: общая зависимость — только ссылка Telegraph.
+
+        Шаги, выполненные в прошлом запуске и сохранённые в журнале, не повторяются.
+        """
+        use_average, text, link_label = self._prepare_rss_text(row, self._use_average_post)
+        done = self._journal_steps("rss", key)
+        scheduled_link = self._scheduled_link("rss", key)
+        if scheduled_link is not None:
+            done = {**done, "vk": scheduled_link}
+
+        def telegraph() -> str:
+            existing = row.telegraph_link or done.get("telegraph") or self._warm_pages.get(key)
+            if existing:
+                return existing
+            title = self._derive_title(row.gpt_post_title, row.gpt_post)
+            page = self._telegraph.create_page(title=title, gpt_post=row.gpt_post, image_url=row.image_url or None)
+            return self._record_step("rss", key, "telegraph", page)
+
+        def raw_link(telegraph: str) -> str:
+            return row.link.strip() if use_average else telegraph or ""
+
+        def short_link(raw_link: str) -> str:
+            return short_links.get(raw_link) or self._resolve_vk_link_target(raw_link)
+
+        def vk_photo() -> Optional[UploadedPhoto]:
+            if "vk" in done:
+                return None
+            return self._upload_vk_photo_for_rss(row)
+
+        def vk(short_link: str, vk_photo: Optional[UploadedPhoto]) -> str:
+            if "vk" in done:
+                return done["vk"]
+            if vk_photo is None:
+                return self.VK_RSS_FALLBACK_NOTE
+            vk_message = self._compose_vk_post_with_link(text, short_link, link_label)
+            link = self._publish_vk_for_rss(vk_message, row, vk_photo)
+            if link == self.VK_RSS_FALLBACK_NOTE:
+                return link
+            return self._record_step("rss", key, "vk", link)
+
+        def telegram(raw_link: str) -> str:
+            if "telegram" in done:
+                return done["telegram"]
+            link = self._telegram.send_post(
+                text,
+                row.image_url,
+                raw_link or None,
+                add_spacing=True,
+                link_label=link_label,
+            )
+            return self._record_step("rss", key, "telegram", link)
+
+        graph = StageGraph()
+        graph.add("telegraph", telegraph)
+        graph.add("raw_link", raw_link, after=["telegraph"])
+        graph.add("short_link", short_link, after=["raw_link"])
+        graph.add("vk_photo", vk_photo)
+        graph.add("vk", vk, after=["short_link", "vk_photo"])
+        graph.add("telegram", telegram, after=["raw_link"])
+        return graph
+
     def process_vk_flow(self) -> None:
         """Обрабатывает точечные посты VK."""
-        rows = self._sheets.fetch_vk_rows()
-        if not rows:
-            self._logger.info("Нет строк VK для публикации")
-            return
-        row = rows[0]
+        with self._flow_locks["vk"], retry_budget(self._retry_budget):
+            if self._publish_scheduled("vk"):
+                return
+            claimed = self._take_rows("vk", 1, self._sheets.fetch_vk_rows, lambda row: -row.row_number)
+            if not claimed:
+                self._logger.info("Нет строк VK для публикации")
+                return
+            self._publish_vk_row(*claimed[0])
+
+    def _publish_vk_row(self, row: VKRow, item: Optional[QueueItem] = None) -> None:
+        """Публикует одну строку VK и сразу записывает результат в таблицу."""
         self._logger.info("Начало обработки VK", extra={"row": row.row_number})
+        key = _post_key(row)
         try:
-            message = self._compose_vk_message(row.title, row.content)
-            link = self._vk.publish_post(message, row.image_url)
+            link = self._journal_steps("vk", key).get("vk") or self._scheduled_link("vk", key)
+            if link is None:
+                message = self._compose_vk_message(row.title, row.content)
+                link = self._record_step("vk", key, "vk", self._vk.publish_post(message, row.image_url))
             self._sheets.mark_vk_published(row, link)
+            self._settle("vk", key, item)
             self._logger.info("VK опубликован", extra={"row": row.row_number, "vk_link": link})
         except Exception as exc:  # noqa: BLE001
             message = str(exc)
             self._logger.error("Ошибка VK", extra={"row": row.row_number, "error": message})
             self._sheets.write_vk_error(row, message)
+        finally:
+            self._flush_sheets()
 
     def process_setka_flow(self) -> None:
         """Обрабатывает точечные посты Telegram."""
-        rows = self._sheets.fetch_setka_rows()
-        if not rows:
-            self._logger.info("Нет строк Setka для публикации")
-            return
-        row = rows[0]
+        with self._flow_locks["setka"], retry_budget(self._retry_budget):
+            claimed = self._take_rows("setka", 1, self._sheets.fetch_setka_rows, lambda row: -row.row_number)
+            if not claimed:
+                self._logger.info("Нет строк Setka для публикации")
+                return
+            self._publish_setka_row(*claimed[0])
+
+    def _publish_setka_row(self, row: SetkaRow, item: Optional[QueueItem] = None) -> None:
+        """Публикует одну строку Setka и сразу записывает результат в таблицу."""
         self._logger.info("Начало обработки Setka", extra={"row": row.row_number})
+        key = _post_key(row)
         try:
-            image_url = row.image_url.strip()
-            message = row.content.strip() or row.title.strip()
-            escaped = html.escape(message)
-            can_use_photo = bool(image_url) and len(escaped) <= TelegramClient.CAPTION_LIMIT
-            if can_use_photo:
-                link = self._telegram.send_post(message, image_url, add_spacing=True)
-            else:
-                link = self._telegram.send_post(message, None, add_spacing=False)
+            link = self._journal_steps("setka", key).get("telegram")
+            if link is None:
+                message, image_url = self._prepare_setka_post(row)
+                if image_url:
+                    link = self._telegram.send_post(message, image_url, add_spacing=True)
+                else:
+                    link = self._telegram.send_post(message, None, add_spacing=False)
+                self._record_step("setka", key, "telegram", link)
             self._sheets.mark_setka_published(row, link)
+            self._settle("setka", key, item)
             self._logger.info("Setka опубликован", extra={"row": row.row_number, "telegram_link": link})
         except Exception as exc:  # noqa: BLE001
             message = str(exc)
             self._logger.error("Ошибка Setka", extra={"row": row.row_number, "error": message})
             self._sheets.write_setka_error(row, message)
+        finally:
+            self._flush_sheets()
+
+    def _flush_sheets(self) -> None:
+        """Отправляет отложенные изменения таблицы одним запросом."""
+        # Строки, отмеченные до flush, уже поставили свои ячейки в очередь записи таблицы;
+        # отмеченные параллельным флоу после этого момента дождутся его собственного flush
+        with self._unflushed_lock:
+            settled, self._unflushed = self._unflushed, []
+        try:
+            self._sheets.flush()
+        except Exception as exc:  # noqa: BLE001
+            self._logger.error("Не удалось записать изменения в таблицу", extra={"error": str(exc)})
+            with self._unflushed_lock:
+                self._unflushed[:0] = settled
+            return
+        if self._journal is not None and settled:
+            self._journal.forget([(flow, key) for flow, key, _ in settled])
+        for flow, key, _ in settled:
+            self._warm_pages.pop(key, None)
+            if self._scheduled_posts is not None:
+                self._scheduled_posts.remove(flow, key)
+        if self._queue is not None:
+            for _, _, item in settled:
+                if item is not None:
+                    self._queue.ack(item)
+
+    def _journal_steps(self, flow: str, key: str) -> Dict[str, str]:
+        """Возвращает шаги строки, выполненные в прошлых запусках."""
+        if self._journal is None:
+            return {}
+        steps = self._journal.steps(flow, key)
+        if steps:
+            self._logger.info("Возобновление публикации по журналу", extra={"flow": flow, "steps": sorted(steps)})
+        return steps
+
+    def _record_step(self, flow: str, key: str, step: str, value: str) -> str:
+        """Сохраняет результат шага в журнал и возвращает его."""
+        if self._journal is not None and value:
+            self._journal.record(flow, key, step, value)
+        return value
 
-    def _derive_title(self, explicit_title: str, gpt_post: str) -> str:
-        """Формирует заголовок для Telegraph."""
-        if explicit_title.strip():
-            return explicit_title.strip()[:100]
-        text = gpt_post.strip()
-        if not text:
-            return "Без названия"
-        return text[:100]
-
-    def _prepare_short_post(self, short_post: str, title: str) -> str:
-        """Удаляет старую подпись и добавляет хэштег с заголовком."""
-        lines = [line.rstrip() for line in short_post.strip().splitlines()]
-        while lines and not lines[-1]:
-            lines.pop()
-        if not lines:
-            body = ""
-        else:
-            last = lines[-1]
-            lowered = last.lower()
-            if "читать подробнее" in lowered:
-                lines.pop()
-                while lines and not lines[-1]:
-                    lines.pop()
-            body = "\n".join(lines)
-        return self._merge_with_header(body, title)
-
-    def _compose_vk_message(self, title: str, content: str) -> str:
-        """Собирает текст для VK или Telegram."""
-        parts = [title.strip(), content.strip()]
-        filtered = [part for part in parts if part]
-        return "\n\n".join(filtered)
-
-    def _prepare_average_post(self, average_post: str, title: str) -> str:
-        """Готовит текст среднего поста и убирает хвост источника."""
-        lines = [line.rstrip() for line in average_post.strip().splitlines()]
-        while lines and not lines[-1]:
-            lines.pop()
-        if lines:
-            last = lines[-1].strip()
-            normalized = last.lower()
-            if normalized.startswith("источник >"):
-                lines.pop()
-                while lines and not lines[-1]:
-                    lines.pop()
-        body = "\n".join(lines)
-        return self._merge_with_header(body, title)
-
-    def _merge_with_header(self, body: str, title: str) -> str:
-        """Добавляет стандартный хэштег в нижнюю часть публикации."""
-        parts = []
-        normalized_title = title.strip()
-        if normalized_title:
-            parts.append(normalized_title)
-        if body:
-            parts.append(body)
-        parts.append("#Обзор_Новостей")
-        return "\n\n".join(parts)
-
-    def _compose_vk_post_with_link(self, base_text: str, link: Optional[str], label: str) -> str:
-        """Собирает сообщение VK с дополнительной ссылкой."""
-        parts = [base_text.strip()]
-        if link:
-            parts.append(f"{label} {link}")
-        return "\n\n".join(part for part in parts if part)
+    def _settle(self, flow: str, key: str, item: Optional[QueueItem] = None) -> None:
+        """Помечает строку для очистки журнала и подтверждения задачи после успешной записи в таблицу."""
+        with self._unflushed_lock:
+            self._unflushed.append((flow, key, item))
+
+    def _log_short_link_stats(self) -> None:
+        """Пишет в лог счётчики кэша коротких ссылок VK."""
+        stats = self._vk.short_link_stats()
+        if stats:
+            self._logger.info("Кэш коротких ссылок VK", extra=stats)
 
     def _resolve_vk_link_target(self, raw_link: str) -> str:
         """Пытается сократить ссылку для VK, при ошибке использует исходную."""
@@ -201,10 +744,26 @@ class PublisherService:
             )
             return raw_link
 
-    def _publish_vk_for_rss(self, message: str, row: RSSRow) -> str:
+    def _upload_vk_photo_for_rss(self, row: RSSRow) -> Optional[UploadedPhoto]:
+        """Загружает фото RSS-поста в VK параллельно с остальными этапами; при ошибке возвращает None."""
+        try:
+            return self._vk.upload_photo(row.image_url)
+        except Exception as exc:  # noqa: BLE001
+            self._logger.warning(
+                "Публикация RSS в VK не удалась, продолжаем без VK",
+                extra={"row": row.row_number, "error": str(exc)},
+            )
+            return None
+
+    def _publish_vk_for_rss(
+        self,
+        message: str,
+        row: RSSRow,
+        attachment: Union[str, UploadedPhoto, None] = None,
+    ) -> str:
         """Публикует RSS-пост в VK, при ошибке возвращает служебную метку."""
         try:
-            return self._vk.publish_post(message, row.image_url)
+            return self._vk.publish_post(message, row.image_url, attachment=attachment)
         except Exception as exc:  # noqa: BLE001
             self._logger.warning(
                 "Публикация RSS в VK не удалась, продолжаем без VK",
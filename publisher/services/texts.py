@@ -0,0 +1,91 @@
+"""Подготовка текстов публикаций."""
+
+import html
+from typing import Optional, Tuple
+
+from publisher.gs.sheets import RSSRow, SetkaRow
+from publisher.tg.client import CAPTION_LIMIT
+
+
+class PostTextMixin:
+    """Правила оформления текстов постов для площадок."""
+
+    VK_RSS_FALLBACK_NOTE = "Не отправлено в VK"
+
+    def _prepare_rss_text(self, row: RSSRow, use_average_post: bool) -> Tuple[bool, str, str]:
+        """Возвращает признак режима Average Post, текст поста и подпись ссылки."""
+        if use_average_post and row.average_post.strip():
+            return True, self._prepare_average_post(row.average_post, row.gpt_post_title), "Источник >"
+        return False, self._prepare_short_post(row.short_post, row.gpt_post_title), "Читать подробнее >"
+
+    def _prepare_setka_post(self, row: SetkaRow) -> Tuple[str, Optional[str]]:
+        """Возвращает текст поста Setka и фото, если подпись помещается в лимит Telegram."""
+        image_url = row.image_url.strip()
+        message = row.content.strip() or row.title.strip()
+        can_use_photo = bool(image_url) and len(html.escape(message)) <= CAPTION_LIMIT
+        return message, image_url if can_use_photo else None
+
+    def _derive_title(self, explicit_title: str, gpt_post: str) -> str:
+        """Формирует заголовок для Telegraph."""
+        if explicit_title.strip():
+            return explicit_title.strip()[:100]
+        text = gpt_post.strip()
+        if not text:
+            return "Без названия"
+        return text[:100]
+
+    def _prepare_short_post(self, short_post: str, title: str) -> str:
+        """Удаляет старую подпись и добавляет хэштег с заголовком."""
+        lines = [line.rstrip() for line in short_post.strip().splitlines()]
+        while lines and not lines[-1]:
+            lines.pop()
+        if not lines:
+            body = ""
+        else:
+            last = lines[-1]
+            lowered = last.lower()
+            if "читать подробнее" in lowered:
+                lines.pop()
+                while lines and not lines[-1]:
+                    lines.pop()
+            body = "\n".join(lines)
+        return self._merge_with_header(body, title)
+
+    def _compose_vk_message(self, title: str, content: str) -> str:
+        """Собирает текст для VK или Telegram."""
+        parts = [title.strip(), content.strip()]
+        filtered = [part for part in parts if part]
+        return "\n\n".join(filtered)
+
+    def _prepare_average_post(self, average_post: str, title: str) -> str:
+        """Готовит текст среднего поста и убирает хвост источника."""
+        lines = [line.rstrip() for line in average_post.strip().splitlines()]
+        while lines and not lines[-1]:
+            lines.pop()
+        if lines:
+            last = lines[-1].strip()
+            normalized = last.lower()
+            if normalized.startswith("источник >"):
+                lines.pop()
+                while lines and not lines[-1]:
+                    lines.pop()
+        body = "\n".join(lines)
+        return self._merge_with_header(body, title)
+
+    def _merge_with_header(self, body: str, title: str) -> str:
+        """Добавляет стандартный хэштег в нижнюю часть публикации."""
+        parts = []
+        normalized_title = title.strip()
+        if normalized_title:
+            parts.append(normalized_title)
+        if body:
+            parts.append(body)
+        parts.append("#Обзор_Новостей")
+        return "\n\n".join(parts)
+
+    def _compose_vk_post_with_link(self, base_text: str, link: Optional[str], label: str) -> str:
+        """Собирает сообщение VK с дополнительной ссылкой."""
+        parts = [base_text.strip()]
+        if link:
+            parts.append(f"{label} {link}")
+        return "\n\n".join(part for part in parts if part)
@@ -0,0 +1,127 @@
+"""Супервизор многоклиентского режима: клиенты распределяются по пулу процессов."""
+
+import multiprocessing
+from multiprocessing.process import BaseProcess
+import signal
+import time
+from typing import Dict, List, Sequence, Set
+
+from publisher.config import AppConfig, TenantSpec, check_tenant_state_paths, load_config
+from publisher.core.logger import configure_logging, get_logger, log_context
+from publisher.core.retry import configure_circuit_breakers, tenant_scope
+from publisher.run import build_runner, build_shared, run_forever
+
+# Пауза перед перезапуском упавшего процесса, чтобы не перезапускать его в цикле
+RESTART_DELAY = 30.0
+
+
+def credential_keys(config: AppConfig) -> Set[str]:
+    """Ключи доступа клиента, на которые площадки считают лимиты."""
+    return {
+        f"vk:{config.vk.user_access_token}",
+        f"telegram:{config.telegram.bot_token}",
+        f"sheets:{config.google.service_account_json}",
+    }
+
+
+def group_tenants(configs: Dict[str, AppConfig]) -> List[List[str]]:
+    """Объединяет клиентов с общими ключами доступа: их лимиты частоты должны считаться в одном процессе."""
+    groups: List[List[str]] = []
+    group_keys: List[Set[str]] = []
+    for name, config in configs.items():
+        keys = credential_keys(config)
+        merged = [index for index, existing in enumerate(group_keys) if existing & keys]
+        members = [name]
+        for index in reversed(merged):
+            members = groups.pop(index) + members
+            keys |= group_keys.pop(index)
+        groups.append(members)
+        group_keys.append(keys)
+    return groups
+
+
+def assign_groups(groups: Sequence[List[str]], processes: int) -> List[List[str]]:
+    """Раскладывает группы по процессам, начиная с крупных, в наименее загруженный процесс."""
+    slots: List[List[str]] = [[] for _ in range(max(1, min(processes, len(groups))))]
+    for group in sorted(groups, key=len, reverse=True):
+        min(slots, key=len).extend(group)
+    return [slot for slot in slots if slot]
+
+
+def run_tenant_group(specs: List[TenantSpec]) -> None:
+    """Точка входа процесса: общие лимиты и кэши, отдельный сервис и расписание на клиента."""
+    configs = {spec.name: load_config(spec.env, tenant=spec.name) for spec in specs}
+    first = next(iter(configs.values()))
+    configure_logging(first.log_level)
+    logger = get_logger("publisher.supervisor")
+    shared = build_shared(first)
+    runners = []
+    for name, config in configs.items():
+        configure_circuit_breakers(config.retry.breaker_threshold, config.retry.breaker_reset_seconds, tenant=name)
+        with log_context(tenant=name), tenant_scope(name):
+            try:
+                runner = build_runner(name, config, shared)
+                runner.start()
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Не удалось запустить клиента", extra={"error": str(exc)})
+                continue
+        runners.append(runner)
+    if runners:
+        run_forever(runners, first.schedule, shared)
+    else:
+        shared.close()
+
+
+def supervise(specs: List[TenantSpec], processes: int) -> None:
+    """Запускает клиентов в пуле процессов и перезапускает упавшие процессы."""
+    configs = {spec.name: load_config(spec.env, tenant=spec.name) for spec in specs}
+    check_tenant_state_paths(configs)
+    configure_logging(next(iter(configs.values())).log_level)
+    logger = get_logger("publisher.supervisor")
+    by_name = {spec.name: spec for spec in specs}
+    slots = assign_groups(group_tenants(configs), processes)
+    context = multiprocessing.get_context("spawn")
+
+    def start(slot: List[str]) -> BaseProcess:
+        process = context.Process(
+            target=run_tenant_group, args=([by_name[name] for name in slot],), name=f"tenants-{slot[0]}"
+        )
+        process.start()
+        logger.info("Процесс клиентов запущен", extra={"tenants": slot, "pid": process.pid})
+        return process
+
+    running = [start(slot) for slot in slots]
+    # Номер слота упавшего процесса -> время перезапуска (time.monotonic)
+    restart_at: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while not stopping:
+            now = time.monotonic()
+            for index, process in enumerate(running):
+                if process.is_alive():
+                    continue
+                if index not in restart_at:
+                    logger.error(
+                        "Процесс клиентов завершился, перезапуск",
+                        extra={"tenants": slots[index], "exitcode": process.exitcode, "delay": RESTART_DELAY},
+                    )
+                    # Пауза не блокирует цикл: остальные процессы и SIGTERM обрабатываются как обычно
+                    restart_at[index] = now + RESTART_DELAY
+                elif now >= restart_at[index]:
+                    del restart_at[index]
+                    running[index] = start(slots[index])
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in running:
+            process.terminate()
+        for process in running:
+            process.join()
+        logger.info("Супервизор остановлен")
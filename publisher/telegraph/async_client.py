@@ -0,0 +1,73 @@
+"""Асинхронный клиент Telegra.ph API."""
+
+import asyncio
+from typing import Optional
+
+import httpx
+
+from publisher.config import TelegraphConfig
+from publisher.core.http import create_async_http_client
+from publisher.core.rate_limit import RateLimitedError, RateLimiterRegistry, json_payload, raise_for_rate_limit
+from publisher.core.retry import retry_on_exceptions
+from publisher.telegraph.client import (
+    TelegraphClient,
+    TelegraphError,
+    build_account_payload,
+    build_page_payload,
+    parse_account_token,
+    parse_page_url,
+)
+
+
+class AsyncTelegraphClient:
+    """Создание страниц в Telegra.ph через общий пул соединений."""
+
+    API_BASE = TelegraphClient.API_BASE
+
+    def __init__(
+        self,
+        config: TelegraphConfig,
+        http: Optional[httpx.AsyncClient] = None,
+        rate_limits: Optional[RateLimiterRegistry] = None,
+    ) -> None:
+        self._token = config.access_token
+        self._author_name = config.author_name
+        self._author_url = config.author_url
+        self._http = http or create_async_http_client()
+        self._limiter = rate_limits.bucket("telegraph", config.author_name) if rate_limits is not None else None
+        self._token_lock: Optional[asyncio.Lock] = None
+
+    async def ensure_token(self) -> None:
+        """Гарантирует наличие access_token; параллельные вызовы создают один аккаунт."""
+        if self._token_lock is None:
+            # Блокировка создаётся в event loop, где выполняются запросы клиента
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if self._token:
+                return
+            payload = build_account_payload(self._author_name, self._author_url)
+            response = await self._post("/createAccount", data=payload)
+            self._token = parse_account_token(response.json())
+
+    async def create_page(self, title: str, gpt_post: str, image_url: Optional[str] = None) -> str:
+        """Создаёт страницу и возвращает ссылку."""
+        await self.ensure_token()
+        if not self._token:
+            raise TelegraphError("access_token не установлен")
+        payload = build_page_payload(self._token, self._author_name, self._author_url, title, gpt_post, image_url)
+        response = await self._post("/createPage", data=payload)
+        return parse_page_url(response.json())
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений."""
+        await self._http.aclose()
+
+    @retry_on_exceptions((httpx.HTTPError, RateLimitedError), destination="telegraph")
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        """Выполняет POST-запрос с повторами."""
+        if self._limiter is not None:
+            await self._limiter.acquire_async()
+        response = await self._http.post(f"{self.API_BASE}{path}", timeout=10, **kwargs)
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers, json_payload(response.content))
+        response.raise_for_status()
+        return response
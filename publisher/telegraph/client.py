@@ -7,6 +7,7 @@ import requests
 from requests import Response
 
 from publisher.config import TelegraphConfig
+from publisher.core.rate_limit import RateLimitedError, RateLimiterRegistry, json_payload, raise_for_rate_limit
 from publisher.core.retry import retry_on_exceptions
 
 
@@ -14,32 +15,110 @@ class TelegraphError(RuntimeError):
     """Ошибка при работе с Telegra.ph."""
 
 
+def build_content(gpt_post: str, image_url: Optional[str]) -> List[Dict[str, object]]:
+    """Формирует структуру контента для Telegraph."""
+    parsed: Optional[List[Dict[str, object]]] = None
+    try:
+        data = json.loads(gpt_post)
+        if isinstance(data, dict):
+            parsed = [data]
+        elif isinstance(data, list):
+            parsed = data  # type: ignore[assignment]
+    except (json.JSONDecodeError, TypeError):
+        parsed = None
+
+    if parsed is not None:
+        nodes = parsed.copy()
+    else:
+        nodes = []
+        text = gpt_post.replace("\r\n", "\n")
+        for paragraph in text.split("\n\n"):
+            cleaned = paragraph.strip()
+            if not cleaned:
+                continue
+            nodes.append({"tag": "p", "children": [cleaned]})
+
+    if image_url:
+        figure_node: Dict[str, object] = {
+            "tag": "figure",
+            "children": [
+                {
+                    "tag": "img",
+                    "attrs": {"src": image_url},
+                }
+            ],
+        }
+        nodes = [figure_node] + nodes
+    return nodes
+
+
+def build_account_payload(author_name: str, author_url: str) -> Dict[str, str]:
+    """Собирает параметры запроса createAccount."""
+    return {
+        "short_name": "Mark",
+        "author_name": author_name,
+        "author_url": author_url,
+    }
+
+
+def build_page_payload(
+    token: str,
+    author_name: str,
+    author_url: str,
+    title: str,
+    gpt_post: str,
+    image_url: Optional[str],
+) -> Dict[str, object]:
+    """Собирает параметры запроса createPage."""
+    content = build_content(gpt_post, image_url)
+    return {
+        "access_token": token,
+        "title": title[:100],
+        "author_name": author_name,
+        "author_url": author_url,
+        "content": json.dumps(content, ensure_ascii=False),
+        "return_content": False,
+    }
+
+
+def parse_account_token(data: Dict[str, object]) -> str:
+    """Извлекает access_token из ответа createAccount."""
+    if not data.get("ok"):
+        raise TelegraphError(f"Не удалось создать аккаунт: {data}")
+    return data["result"]["access_token"]  # type: ignore[index]
+
+
+def parse_page_url(data: Dict[str, object]) -> str:
+    """Извлекает ссылку на страницу из ответа createPage."""
+    if not data.get("ok"):
+        raise TelegraphError(f"Не удалось создать страницу: {data}")
+    return data["result"]["url"]  # type: ignore[index]
+
+
 class TelegraphClient:
     """Создание страниц в Telegra.ph."""
 
     API_BASE = "https://api.telegra.ph"
 
-    def __init__(self, config: TelegraphConfig) -> None:
+    def __init__(
+        self,
+        config: TelegraphConfig,
+        rate_limits: Optional[RateLimiterRegistry] = None,
+        session: Optional[requests.Session] = None,
+    ) -> None:
         self._token = config.access_token
         self._author_name = config.author_name
         self._author_url = config.author_url
-        self._session = requests.Session()
+        self._session = session or requests.Session()
+        self._limiter = rate_limits.bucket("telegraph", config.author_name) if rate_limits is not None else None
 
     def ensure_token(self) -> None:
         """Гарантирует наличие access_token."""
         if self._token:
             return
-        payload = {
-            "short_name": "Mark",
-            "author_name": self._author_name,
-            "author_url": self._author_url,
-        }
+        payload = build_account_payload(self._author_name, self._author_url)
         response = self._post("/createAccount", data=payload)
-        data = response.json()
-        if not data.get("ok"):
-            raise TelegraphError(f"Не удалось создать аккаунт: {data}")
-        result = data["result"]
-        self._token = result["access_token"]
+        self._token = parse_account_token(response.json())
 
     def create_page(self, title: str, gpt_post: str, image_url: Optional[str] = None) -> str:
         """Создаёт страницу и возвращает ссылку."""
@@ -47,61 +126,17 @@ class TelegraphClient:
         if not self._token:
             raise TelegraphError("access_token не установлен")
 
-        content = self._build_content(gpt_post, image_url)
-        payload = {
-            "access_token": self._token,
-            "title": title[:100],
-            "author_name": self._author_name,
-            "author_url": self._author_url,
-            "content": json.dumps(content, ensure_ascii=False),
-            "return_content": False,
-        }
+        payload = build_page_payload(self._token, self._author_name, self._author_url, title, gpt_post, image_url)
         response = self._post("/createPage", data=payload)
-        data = response.json()
-        if not data.get("ok"):
-            raise TelegraphError(f"Не удалось создать страницу: {data}")
-        return data["result"]["url"]
-
-    def _build_content(self, gpt_post: str, image_url: Optional[str]) -> List[Dict[str, object]]:
-        """Формирует структуру контента для Telegraph."""
-        parsed: Optional[List[Dict[str, object]]] = None
-        try:
-            data = json.loads(gpt_post)
-            if isinstance(data, dict):
-                parsed = [data]
-            elif isinstance(data, list):
-                parsed = data  # type: ignore[assignment]
-        except (json.JSONDecodeError, TypeError):
-            parsed = None
-
-        if parsed is not None:
-            nodes = parsed.copy()
-        else:
-            nodes = []
-            text = gpt_post.replace("\r\n", "\n")
-            for paragraph in text.split("\n\n"):
-                cleaned = paragraph.strip()
-                if not cleaned:
-                    continue
-                nodes.append({"tag": "p", "children": [cleaned]})
-
-        if image_url:
-            figure_node: Dict[str, object] = {
-                "tag": "figure",
-                "children": [
-                    {
-                        "tag": "img",
-                        "attrs": {"src": image_url},
-                    }
-                ],
-            }
-            nodes = [figure_node] + nodes
-        return nodes
-
-    @retry_on_exceptions((requests.RequestException,))
+        return parse_page_url(response.json())
+
+    @retry_on_exceptions((requests.RequestException, RateLimitedError), destination="telegraph")
     def _post(self, path: str, **kwargs) -> Response:
         """Выполняет POST-запрос с повторами."""
         url = f"{self.API_BASE}{path}"
+        if self._limiter is not None:
+            self._limiter.acquire()
         response = self._session.post(url, **kwargs, timeout=10)
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers, json_payload(response.content))
         response.raise_for_status()
         return response
@@ -0,0 +1,119 @@
+"""Асинхронный клиент Telegram Bot API."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from publisher.config import TelegramConfig
+from publisher.core.http import create_async_http_client
+from publisher.core.image_cache import CachedImage, ImageCache
+from publisher.core.images import TELEGRAM_PHOTO_PROFILE, ImageNormalizer
+from publisher.core.logger import get_logger
+from publisher.core.rate_limit import RateLimitedError, RateLimiterRegistry, json_payload, raise_for_rate_limit
+from publisher.core.retry import retry_on_exceptions
+from publisher.tg.client import TelegramClient, build_post_request, channel_handle, parse_post_link
+
+
+class AsyncTelegramClient:
+    """Публикация постов в Telegram канал через общий пул соединений."""
+
+    API_BASE = TelegramClient.API_BASE
+    CAPTION_LIMIT = TelegramClient.CAPTION_LIMIT
+
+    def __init__(
+        self,
+        config: TelegramConfig,
+        http: Optional[httpx.AsyncClient] = None,
+        image_cache: Optional[ImageCache] = None,
+        normalizer: Optional[ImageNormalizer] = None,
+        rate_limits: Optional[RateLimiterRegistry] = None,
+    ) -> None:
+        self._token = config.bot_token
+        self._channel = channel_handle(config.channel_username)
+        self._http = http or create_async_http_client()
+        self._limiter = rate_limits.bucket("telegram", self._channel) if rate_limits is not None else None
+        self._image_cache = image_cache
+        self._normalizer = normalizer
+        self._logger = get_logger("publisher.telegram")
+
+    async def send_post(
+        self,
+        text: str,
+        image_url: Optional[str],
+        link_url: Optional[str] = None,
+        add_spacing: bool = False,
+        link_label: str = "Читать подробнее >",
+    ) -> str:
+        """Отправляет пост (с фото или без) и возвращает ссылку."""
+        path, payload = build_post_request(self._channel, text, image_url, link_url, add_spacing, link_label)
+        async with self._prepared_photo(image_url if path == "/sendPhoto" else None) as photo:
+            if photo is None:
+                response = await self._post(path, data=payload)
+            else:
+                payload.pop("photo")
+                response = await self._post_photo(path, payload, photo)
+        return parse_post_link(self._channel, response.json())
+
+    async def warm_up(self) -> None:
+        """Открывает соединение с Bot API лёгким запросом getMe."""
+        await self._post("/getMe")
+
+    async def prefetch_image(self, image_url: str) -> None:
+        """Скачивает и уменьшает фото в кэш заранее (при настроенном кэше и обработчике)."""
+        async with self._prepared_photo(image_url):
+            pass
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений."""
+        await self._http.aclose()
+
+    @asynccontextmanager
+    async def _prepared_photo(self, image_url: Optional[str]) -> AsyncIterator[Optional[CachedImage]]:
+        """Скачивает и уменьшает фото для загрузки файлом; без обработчика Telegram получает URL.
+
+        Пока контекст открыт, фото закреплено в кэше и не вытесняется.
+        """
+        if not image_url or self._image_cache is None or self._normalizer is None:
+            yield None
+            return
+        try:
+            cached = await self._image_cache.fetch_async(image_url, self._http, pin=True)
+        except httpx.HTTPError as exc:
+            self._logger.warning(
+                "Не удалось скачать фото для Telegram, передаётся ссылка",
+                extra={"image_url": image_url, "error": str(exc)},
+            )
+            cached = None
+        if cached is None:
+            yield None
+            return
+        try:
+            yield await asyncio.to_thread(self._normalizer.normalize, cached, TELEGRAM_PHOTO_PROFILE)
+        finally:
+            self._image_cache.release(cached)
+
+    @retry_on_exceptions((httpx.HTTPError, RateLimitedError), destination="telegram")
+    async def _post_photo(self, path: str, payload: Dict[str, str], photo: CachedImage) -> httpx.Response:
+        """Отправляет фото файлом; файл открывается заново на каждой попытке."""
+        if self._limiter is not None:
+            await self._limiter.acquire_async()
+        with photo.path.open("rb") as image:
+            files = {"photo": ("photo.jpg", image, photo.content_type or "image/jpeg")}
+            response = await self._http.post(
+                f"{self.API_BASE}/bot{self._token}{path}", data=payload, files=files, timeout=30
+            )
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers, json_payload(response.content))
+        response.raise_for_status()
+        return response
+
+    @retry_on_exceptions((httpx.HTTPError, RateLimitedError), destination="telegram")
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        """POST-запрос к Telegram Bot API."""
+        if self._limiter is not None:
+            await self._limiter.acquire_async()
+        response = await self._http.post(f"{self.API_BASE}/bot{self._token}{path}", timeout=10, **kwargs)
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers, json_payload(response.content))
+        response.raise_for_status()
+        return response
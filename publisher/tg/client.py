@@ -1,12 +1,17 @@
 """Клиент Telegram Bot API."""
 
+from contextlib import contextmanager
 import html
-from typing import Optional
+from typing import Dict, Iterator, Optional, Tuple
 
 import requests
 from requests import Response
 
 from publisher.config import TelegramConfig
+from publisher.core.image_cache import CachedImage, ImageCache
+from publisher.core.images import TELEGRAM_PHOTO_PROFILE, ImageNormalizer
+from publisher.core.logger import get_logger
+from publisher.core.rate_limit import RateLimitedError, RateLimiterRegistry, json_payload, raise_for_rate_limit
 from publisher.core.retry import retry_on_exceptions
 
 
@@ -14,16 +19,88 @@ class TelegramError(RuntimeError):
     """Ошибка Telegram API."""
 
 
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+
+def format_post_body(text: str, link_url: Optional[str], add_spacing: bool, link_label: str) -> str:
+    """Экранирует текст поста и добавляет ссылку в HTML-разметке."""
+    safe_text = html.escape(text.strip())
+    if not link_url:
+        return safe_text
+    link = html.escape(link_url, quote=True)
+    label = html.escape(link_label)
+    spacer = "\n\n" if add_spacing and safe_text else ""
+    if safe_text:
+        return f"{safe_text}{spacer}<a href=\"{link}\">{label}</a>"
+    return f"<a href=\"{link}\">{label}</a>"
+
+
+def truncate_text(text: str, limit: int) -> str:
+    """Обрезает текст до допустимого размера."""
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def build_post_request(
+    channel: str,
+    text: str,
+    image_url: Optional[str],
+    link_url: Optional[str] = None,
+    add_spacing: bool = False,
+    link_label: str = "Читать подробнее >",
+) -> Tuple[str, Dict[str, str]]:
+    """Возвращает метод Bot API и параметры для отправки поста."""
+    body = format_post_body(text, link_url, add_spacing, link_label)
+    if image_url:
+        return "/sendPhoto", {
+            "chat_id": channel,
+            "photo": image_url,
+            "caption": truncate_text(body, CAPTION_LIMIT),
+            "parse_mode": "HTML",
+        }
+    return "/sendMessage", {
+        "chat_id": channel,
+        "text": truncate_text(body, MESSAGE_LIMIT),
+        "parse_mode": "HTML",
+    }
+
+
+def parse_post_link(channel: str, data: Dict[str, object]) -> str:
+    """Строит ссылку на опубликованное сообщение по ответу Bot API."""
+    if not data.get("ok"):
+        raise TelegramError(f"Ошибка отправки сообщения: {data}")
+    message_id = data["result"]["message_id"]  # type: ignore[index]
+    return f"https://t.me/{channel.lstrip('@')}/{message_id}"
+
+
+def channel_handle(channel_username: str) -> str:
+    """Приводит имя канала к виду @username."""
+    return channel_username if channel_username.startswith("@") else f"@{channel_username}"
+
+
 class TelegramClient:
     """Публикация постов в Telegram канал."""
 
     API_BASE = "https://api.telegram.org"
-    CAPTION_LIMIT = 1024
+    CAPTION_LIMIT = CAPTION_LIMIT
 
-    def __init__(self, config: TelegramConfig) -> None:
+    def __init__(
+        self,
+        config: TelegramConfig,
+        image_cache: Optional[ImageCache] = None,
+        normalizer: Optional[ImageNormalizer] = None,
+        rate_limits: Optional[RateLimiterRegistry] = None,
+        session: Optional[requests.Session] = None,
+    ) -> None:
         self._token = config.bot_token
-        self._channel = config.channel_username if config.channel_username.startswith("@") else f"@{config.channel_username}"
-        self._session = requests.Session()
+        self._channel = channel_handle(config.channel_username)
+        self._session = session or requests.Session()
+        self._limiter = rate_limits.bucket("telegram", self._channel) if rate_limits is not None else None
+        self._image_cache = image_cache
+        self._normalizer = normalizer
+        self._logger = get_logger("publisher.telegram")
 
     def send_post(
         self,
@@ -34,57 +111,69 @@ class TelegramClient:
         link_label: str = "Читать подробнее >",
     ) -> str:
         """Отправляет пост (с фото или без) и возвращает ссылку."""
-        safe_text = html.escape(text.strip())
-        body = safe_text
-        if link_url:
-            link = html.escape(link_url, quote=True)
-            label = html.escape(link_label)
-            spacer = "\n\n" if add_spacing and safe_text else ""
-            if safe_text:
-                body = f"{safe_text}{spacer}<a href=\"{link}\">{label}</a>"
+        path, payload = build_post_request(self._channel, text, image_url, link_url, add_spacing, link_label)
+        with self._prepared_photo(image_url if path == "/sendPhoto" else None) as photo:
+            if photo is None:
+                response = self._post(path, data=payload)
             else:
-                body = f"<a href=\"{link}\">{label}</a>"
-
-        if image_url:
-            caption = self._truncate_caption(body)
-            payload = {
-                "chat_id": self._channel,
-                "photo": image_url,
-                "caption": caption,
-                "parse_mode": "HTML",
-            }
-            response = self._post("/sendPhoto", data=payload)
-        else:
-            payload = {
-                "chat_id": self._channel,
-                "text": self._truncate_message(body),
-                "parse_mode": "HTML",
-            }
-            response = self._post("/sendMessage", data=payload)
-
-        data = response.json()
-        if not data.get("ok"):
-            raise TelegramError(f"Ошибка отправки сообщения: {data}")
-        result = data["result"]
-        message_id = result["message_id"]
-        channel = self._channel.lstrip("@")
-        return f"https://t.me/{channel}/{message_id}"
-
-    def _truncate_caption(self, caption: str) -> str:
-        """Обрезает подпись до допустимого размера."""
-        if len(caption) <= self.CAPTION_LIMIT:
-            return caption
-        return caption[: self.CAPTION_LIMIT - 1] + "…"
-
-    @retry_on_exceptions((requests.RequestException,))
+                payload.pop("photo")
+                response = self._post_photo(path, payload, photo)
+        return parse_post_link(self._channel, response.json())
+
+    def warm_up(self) -> None:
+        """Открывает соединение с Bot API лёгким запросом getMe."""
+        self._post("/getMe")
+
+    def prefetch_image(self, image_url: str) -> None:
+        """Скачивает и уменьшает фото в кэш заранее (при настроенном кэше и обработчике)."""
+        with self._prepared_photo(image_url):
+            pass
+
+    @contextmanager
+    def _prepared_photo(self, image_url: Optional[str]) -> Iterator[Optional[CachedImage]]:
+        """Скачивает и уменьшает фото для загрузки файлом; без обработчика Telegram получает URL.
+
+        Пока контекст открыт, фото закреплено в кэше и не вытесняется.
+        """
+        if not image_url or self._image_cache is None or self._normalizer is None:
+            yield None
+            return
+        try:
+            cached = self._image_cache.fetch(image_url, self._session, pin=True)
+        except requests.RequestException as exc:
+            self._logger.warning(
+                "Не удалось скачать фото для Telegram, передаётся ссылка",
+                extra={"image_url": image_url, "error": str(exc)},
+            )
+            cached = None
+        if cached is None:
+            yield None
+            return
+        try:
+            yield self._normalizer.normalize(cached, TELEGRAM_PHOTO_PROFILE)
+        finally:
+            self._image_cache.release(cached)
+
+    @retry_on_exceptions((requests.RequestException, RateLimitedError), destination="telegram")
+    def _post_photo(self, path: str, payload: Dict[str, str], photo: CachedImage) -> Response:
+        """Отправляет фото файлом; файл открывается заново на каждой попытке."""
+        url = f"{self.API_BASE}/bot{self._token}{path}"
+        if self._limiter is not None:
+            self._limiter.acquire()
+        with photo.path.open("rb") as image:
+            files = {"photo": ("photo.jpg", image, photo.content_type or "image/jpeg")}
+            response = self._session.post(url, data=payload, files=files, timeout=30)
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers, json_payload(response.content))
+        response.raise_for_status()
+        return response
+
+    @retry_on_exceptions((requests.RequestException, RateLimitedError), destination="telegram")
     def _post(self, path: str, **kwargs) -> Response:
         """POST-запрос к Telegram Bot API."""
         url = f"{self.API_BASE}/bot{self._token}{path}"
+        if self._limiter is not None:
+            self._limiter.acquire()
         response = self._session.post(url, timeout=10, **kwargs)
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers, json_payload(response.content))
         response.raise_for_status()
         return response
-
-    def _truncate_message(self, text: str) -> str:
-        if len(text) <= 4096:
-            return text
-        return text[: 4096 - 1] + "…"
@@ -0,0 +1,315 @@
+"""Асинхронный клиент VK API."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import httpx
+
+from publisher.config import VKConfig
+from publisher.core.http import create_async_http_client
+from publisher.core.image_cache import CachedImage, ImageCache
+from publisher.core.images import VK_PHOTO_PROFILE, ImageNormalizer
+from publisher.core.multipart import MultipartFile
+from publisher.core.rate_limit import RateLimitedError, RateLimiterRegistry, raise_for_rate_limit
+from publisher.core.retry import retry_on_exceptions
+from publisher.vk.client import (
+    EmptyUploadError,
+    UploadedPhoto,
+    UploadRejectedError,
+    UploadServerCache,
+    VKClient,
+    VKError,
+    VKRateLimitError,
+    VKServerError,
+    build_execute_code,
+    derive_filename,
+    parse_api_response,
+    parse_execute_response,
+    parse_upload_response,
+    script_call,
+    unwrap_result,
+)
+from publisher.vk.short_links import ShortLinkCache
+
+
+class AsyncVKClient:
+    """Публикация постов во VK через общий пул соединений; методы и поведение те же, что у VKClient."""
+
+    API_BASE = VKClient.API_BASE
+    API_VERSION = VKClient.API_VERSION
+    EXECUTE_LIMIT = VKClient.EXECUTE_LIMIT
+    WALL_PAGE_SIZE = VKClient.WALL_PAGE_SIZE
+    PUBLISHED_SCAN_PAGES = VKClient.PUBLISHED_SCAN_PAGES
+    SPOOL_MAX_SIZE = VKClient.SPOOL_MAX_SIZE
+
+    def __init__(
+        self,
+        config: VKConfig,
+        http: Optional[httpx.AsyncClient] = None,
+        image_cache: Optional[ImageCache] = None,
+        short_link_cache: Optional[ShortLinkCache] = None,
+        normalizer: Optional[ImageNormalizer] = None,
+        rate_limits: Optional[RateLimiterRegistry] = None,
+    ) -> None:
+        self._access_token = config.user_access_token
+        self._group_id = config.group_id
+        self._http = http or create_async_http_client()
+        self._image_cache = image_cache
+        self._normalizer = normalizer
+        self._short_links = short_link_cache
+        self._limiter = rate_limits.bucket("vk", config.user_access_token) if rate_limits is not None else None
+        self._upload_servers = UploadServerCache(config.upload_url_ttl)
+
+    async def publish_post(
+        self,
+        message: str,
+        image_url: str,
+        attachment: Union[str, UploadedPhoto, None] = None,
+        publish_date: Optional[datetime] = None,
+    ) -> str:
+        """Публикует пост и возвращает ссылку; заранее загруженное фото передаётся в attachment.
+
+        С publish_date пост создаётся отложенным и выходит на стороне VK в указанное время.
+        """
+        if attachment is None:
+            attachment = await self.upload_photo(image_url)
+        params: Dict[str, Any] = {"owner_id": -self._group_id, "from_group": 1, "message": message}
+        if publish_date is not None:
+            params["publish_date"] = int(publish_date.timestamp())
+        if isinstance(attachment, UploadedPhoto):
+            post_id = await self._save_and_post(params, attachment)
+        else:
+            post_id = (await self._api_call("wall.post", attachments=attachment, **params))["post_id"]
+        return self._post_link(post_id)
+
+    async def postponed_post_ids(self) -> Set[int]:
+        """Идентификаторы отложенных постов сообщества, ещё не вышедших."""
+        post_ids: Set[int] = set()
+        offset = 0
+        while True:
+            response = await self._api_call(
+                "wall.get", owner_id=-self._group_id, filter="postponed", count=self.WALL_PAGE_SIZE, offset=offset
+            )
+            items = response.get("items", [])
+            post_ids.update(int(item["id"]) for item in items)
+            offset += len(items)
+            if not items or offset >= int(response.get("count", 0)):
+                return post_ids
+
+    async def published_posts(self, postponed_ids: Set[int]) -> Dict[int, str]:
+        """Ссылки на вышедшие отложенные посты: идентификатор отложенного поста -> ссылка."""
+        found: Dict[int, str] = {}
+        offset = 0
+        for _ in range(self.PUBLISHED_SCAN_PAGES):
+            response = await self._api_call(
+                "wall.get", owner_id=-self._group_id, filter="owner", count=self.WALL_PAGE_SIZE, offset=offset
+            )
+            items = response.get("items", [])
+            for item in items:
+                if item.get("postponed_id") in postponed_ids:
+                    found[int(item["postponed_id"])] = self._post_link(item["id"])
+            offset += len(items)
+            if not items or len(found) == len(postponed_ids) or offset >= int(response.get("count", 0)):
+                break
+        return found
+
+    async def delete_post(self, post_id: int) -> None:
+        """Удаляет пост (в том числе отложенный) со стены сообщества."""
+        await self._api_call("wall.delete", owner_id=-self._group_id, post_id=post_id)
+
+    async def upload_photo(self, image_url: str) -> UploadedPhoto:
+        """Загружает фото на сервер VK; сохранение выполняется вместе с публикацией поста."""
+        async with self._open_image(image_url) as (image, mime, filename):
+            body = MultipartFile("photo", filename, image, mime or "image/jpeg")
+            upload_url = self._upload_servers.get()
+            if upload_url is None:
+                return await self._upload_photo(await self._get_upload_url(), body)
+            try:
+                return await self._upload_photo(upload_url, body)
+            except UploadRejectedError:
+                self._upload_servers.invalidate(upload_url)
+                return await self._upload_photo(await self._get_upload_url(), body)
+
+    async def prepare_upload(self) -> None:
+        """Заранее получает адрес сервера загрузки фото (и открывает соединение с API)."""
+        if self._upload_servers.get() is None:
+            await self._get_upload_url()
+
+    async def prefetch_image(self, image_url: str) -> None:
+        """Скачивает и подготавливает изображение в кэш; без кэша изображений ничего не делает."""
+        if self._image_cache is None:
+            return
+        async with self._open_image(image_url):
+            pass
+
+    async def get_short_link(self, url: str) -> str:
+        """Возвращает сокращённую ссылку через utils.getShortLink (с учётом кэша)."""
+        if not url:
+            return url
+        cached = self._cached_short_link(url)
+        if cached:
+            return cached
+        response = await self._api_call("utils.getShortLink", url=url)
+        short = response.get("short_url")
+        self._remember_short_link(url, short)
+        return short or url
+
+    async def get_short_links(self, urls: Sequence[str]) -> Dict[str, str]:
+        """Сокращает пачку ссылок через execute; ссылки с ошибкой в результат не попадают."""
+        short_links: Dict[str, str] = {}
+        missing = []
+        for url in dict.fromkeys(url for url in urls if url):
+            cached = self._cached_short_link(url)
+            if cached:
+                short_links[url] = cached
+            else:
+                missing.append(url)
+        results = await self.execute([("utils.getShortLink", {"url": url}) for url in missing])
+        for url, result in zip(missing, results):
+            if not isinstance(result, VKError):
+                self._remember_short_link(url, result.get("short_url"))
+                short_links[url] = result.get("short_url") or url
+        return short_links
+
+    def short_link_stats(self) -> Optional[Dict[str, float]]:
+        """Возвращает статистику кэша коротких ссылок, если он настроен."""
+        return self._short_links.stats() if self._short_links is not None else None
+
+    async def execute(self, calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Выполняет вызовы API пачками через execute; пачки отправляются одновременно."""
+        chunks = [calls[start : start + self.EXECUTE_LIMIT] for start in range(0, len(calls), self.EXECUTE_LIMIT)]
+        results = await asyncio.gather(
+            *(self._execute(build_execute_code(chunk), [method for method, _ in chunk]) for chunk in chunks)
+        )
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def aclose(self) -> None:
+        """Закрывает пул соединений."""
+        await self._http.aclose()
+
+    def _cached_short_link(self, url: str) -> Optional[str]:
+        """Ищет короткую ссылку в кэше."""
+        return self._short_links.get(url) if self._short_links is not None else None
+
+    def _remember_short_link(self, url: str, short_url: Optional[str]) -> None:
+        """Сохраняет полученную короткую ссылку в кэш."""
+        if self._short_links is not None and short_url:
+            self._short_links.put(url, short_url)
+
+    def _post_link(self, post_id: int) -> str:
+        return f"https://vk.com/wall-{self._group_id}_{post_id}"
+
+    async def _get_upload_url(self) -> str:
+        """Запрашивает новый URL загрузки фото."""
+        response = await self._api_call("photos.getWallUploadServer", group_id=self._group_id)
+        upload_url = response["upload_url"]
+        self._upload_servers.put(upload_url)
+        return upload_url
+
+    @retry_on_exceptions((httpx.TransportError, EmptyUploadError), destination="vk")
+    async def _upload_photo(self, upload_url: str, body: MultipartFile) -> UploadedPhoto:
+        """Отправляет фото на сервер загрузки; тело перематывается перед каждой попыткой."""
+        body.rewind()
+        try:
+            response = await self._http.post(upload_url, content=body.aiter_chunks(), headers=body.headers, timeout=20)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            raise UploadRejectedError(f"Сервер загрузки VK вернул ошибку: {exc}") from exc
+        data = response.json()
+        uploaded = parse_upload_response(data)
+        if uploaded is None:
+            raise EmptyUploadError(f"Сервер загрузки VK вернул пустой результат: {data}")
+        return UploadedPhoto(*uploaded)
+
+    async def _save_and_post(self, params: Dict[str, Any], photo: UploadedPhoto) -> int:
+        """Сохраняет фото и создаёт запись на стене одним запросом execute."""
+        save = script_call(
+            "photos.saveWallPhoto",
+            {"group_id": self._group_id, "photo": photo.photo, "server": photo.server, "hash": photo.hash},
+        )
+        post = script_call(
+            "wall.post",
+            params,
+            {"attachments": '"photo" + saved[0].owner_id + "_" + saved[0].id'},
+        )
+        code = f"var saved = {save}; if (!saved) {{ return [false, false]; }} return [saved, {post}];"
+        saved, response = await self._execute(code, ["photos.saveWallPhoto", "wall.post"])
+        unwrap_result(saved)
+        return unwrap_result(response)["post_id"]
+
+    @asynccontextmanager
+    async def _open_image(self, image_url: str) -> AsyncIterator[Tuple[BinaryIO, Optional[str], str]]:
+        """Открывает изображение как файл: из кэша или скачивая потоком во временный файл."""
+        if self._image_cache is not None:
+            original = await self._fetch_cached_image(image_url)
+            try:
+                cached = original
+                if self._normalizer is not None:
+                    cached = await asyncio.to_thread(self._normalizer.normalize, original, VK_PHOTO_PROFILE)
+                with cached.path.open("rb") as image:
+                    yield image, cached.content_type, derive_filename(image_url, cached.content_type)
+            finally:
+                self._image_cache.release(original)
+            return
+        with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE) as image:
+            content_type = await self._download_to(image_url, image)
+            yield image, content_type, derive_filename(image_url, content_type)
+
+    @retry_on_exceptions((httpx.HTTPError,))
+    async def _download_to(self, image_url: str, target: BinaryIO) -> Optional[str]:
+        """Скачивает изображение кусками в target и возвращает Content-Type."""
+        target.seek(0)
+        target.truncate()
+        async with self._http.stream("GET", image_url, timeout=20) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(MultipartFile.CHUNK_SIZE):
+                target.write(chunk)
+            return response.headers.get("Content-Type")
+
+    @retry_on_exceptions((httpx.HTTPError,))
+    async def _fetch_cached_image(self, image_url: str) -> CachedImage:
+        """Берёт изображение из кэша с повторной проверкой по ETag/Last-Modified и закрепляет его."""
+        return await self._image_cache.fetch_async(image_url, self._http, pin=True)
+
+    async def _api_call(self, method: str, **params) -> Dict[str, Any]:
+        """Вызывает метод VK API и возвращает результат."""
+        payload = {"access_token": self._access_token, "v": self.API_VERSION, **params}
+        return (await self._send_for([method])(f"{self.API_BASE}/{method}", payload))["response"]
+
+    async def _execute(self, code: str, methods: Sequence[str]) -> List[Any]:
+        """Выполняет код VKScript через метод execute."""
+        payload = {"access_token": self._access_token, "v": self.API_VERSION, "code": code}
+        return parse_execute_response(await self._send_for(methods)(f"{self.API_BASE}/execute", payload), methods)
+
+    def _send_for(self, methods: Sequence[str]) -> Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+        """Выбирает отправку с повторами; правила для wall.post те же, что у VKClient._sender."""
+        return self._send_post if "wall.post" in methods else self._send
+
+    @retry_on_exceptions((httpx.HTTPError, RateLimitedError, VKServerError), destination="vk")
+    async def _send(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Отправляет идемпотентный запрос с повторами."""
+        return await self._send_api_request(url, payload)
+
+    @retry_on_exceptions((httpx.ConnectError, httpx.ConnectTimeout, RateLimitedError), destination="vk")
+    async def _send_post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Отправляет запрос, создающий запись; повторяются только неустановленное соединение и лимит частоты."""
+        return await self._send_api_request(url, payload)
+
+    async def _send_api_request(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Отправляет запрос к API с учётом лимита частоты для токена; ошибки VK поднимаются как VKError."""
+        if self._limiter is not None:
+            await self._limiter.acquire_async()
+        response = await self._http.post(url, data=payload, timeout=10)
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers)
+        response.raise_for_status()
+        data = response.json()
+        try:
+            parse_api_response(data)
+        except VKRateLimitError as exc:
+            if self._limiter is not None:
+                self._limiter.defer(exc.retry_after)
+            raise
+        return data
@@ -1,44 +1,343 @@
 """Клиент VK API."""
 
-from typing import Dict, Optional, Tuple
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import mimetypes
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from urllib.parse import urlparse
 
 import requests
-from requests import Response
 
 from publisher.config import VKConfig
+from publisher.core.image_cache import CachedImage, ImageCache
+from publisher.core.images import VK_PHOTO_PROFILE, ImageNormalizer
+from publisher.core.multipart import MultipartFile
+from publisher.core.rate_limit import RateLimitedError, RateLimiterRegistry, raise_for_rate_limit
 from publisher.core.retry import retry_on_exceptions
+from publisher.vk.short_links import ShortLinkCache
 
 
 class VKError(RuntimeError):
     """Ошибка работы с VK API."""
 
 
+class UploadRejectedError(VKError):
+    """Сервер загрузки отклонил запрос (например, URL загрузки устарел)."""
+
+
+class VKRateLimitError(RateLimitedError, VKError):
+    """VK ограничил частоту запросов (коды 6 и 9)."""
+
+
+class VKServerError(VKError):
+    """Временный сбой на стороне VK (коды 1 и 10); запрос стоит повторить."""
+
+
+# Коды ошибок VK «слишком много запросов в секунду» и «flood control»
+RATE_LIMIT_ERROR_CODES = (6, 9)
+# Пауза после ошибки частоты, если VK не подсказал своё значение
+RATE_LIMIT_BACKOFF = 1.0
+# Коды ошибок VK «неизвестная ошибка» и «внутренняя ошибка сервера»
+SERVER_ERROR_CODES = (1, 10)
+
+
+class EmptyUploadError(VKError):
+    """Сервер загрузки вернул пустой результат; загрузку стоит повторить."""
+
+
+@dataclass(frozen=True)
+class UploadedPhoto:
+    """Фото на сервере загрузки VK, ещё не сохранённое через photos.saveWallPhoto."""
+
+    photo: str
+    server: Any
+    hash: str
+
+
+class UploadServerCache:
+    """Хранит URL сервера загрузки фото, пока не истёк срок его использования."""
+
+    def __init__(self, ttl: float) -> None:
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._url: Optional[str] = None
+        self._expires_at = 0.0
+
+    def get(self) -> Optional[str]:
+        """Возвращает сохранённый URL, если он ещё действителен."""
+        with self._lock:
+            if self._url is not None and time.monotonic() < self._expires_at:
+                return self._url
+            return None
+
+    def put(self, url: str) -> None:
+        """Запоминает новый URL загрузки."""
+        if self._ttl <= 0:
+            return
+        with self._lock:
+            self._url = url
+            self._expires_at = time.monotonic() + self._ttl
+
+    def invalidate(self, url: str) -> None:
+        """Сбрасывает URL, если он не был обновлён другим потоком."""
+        with self._lock:
+            if self._url == url:
+                self._url = None
+
+
+def parse_api_response(data: Dict[str, Any]) -> Any:
+    """Возвращает поле response ответа VK API или поднимает VKError."""
+    if "error" in data:
+        error = data["error"]
+        if isinstance(error, dict) and error.get("error_code") in RATE_LIMIT_ERROR_CODES:
+            raise VKRateLimitError(f"Ошибка VK API: {error}", RATE_LIMIT_BACKOFF)
+        if isinstance(error, dict) and error.get("error_code") in SERVER_ERROR_CODES:
+            raise VKServerError(f"Ошибка VK API: {error}")
+        raise VKError(f"Ошибка VK API: {error}")
+    return data["response"]
+
+
+def parse_upload_response(data: Dict[str, Any]) -> Optional[Tuple[str, Any, str]]:
+    """Разбирает ответ сервера загрузки; None означает пустой результат и повод повторить загрузку."""
+    if "error" in data:
+        raise UploadRejectedError(f"Сервер загрузки VK отклонил запрос: {data['error']}")
+    photo_payload = data.get("photo")
+    if not photo_payload or photo_payload in ("[]", []):
+        return None
+    server = data.get("server")
+    upload_hash = data.get("hash")
+    if server is None or upload_hash is None:
+        raise VKError(f"В ответе VK отсутствуют обязательные поля: {data}")
+    return photo_payload, server, upload_hash
+
+
+def script_call(method: str, params: Dict[str, Any], expressions: Optional[Dict[str, str]] = None) -> str:
+    """Формирует вызов метода на VKScript; expressions подставляются как выражения, а не литералы."""
+    items = [f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}" for key, value in params.items()]
+    items.extend(f"{json.dumps(key)}: {expression}" for key, expression in (expressions or {}).items())
+    return f"API.{method}({{{', '.join(items)}}})"
+
+
+def build_execute_code(calls: Sequence[Tuple[str, Dict[str, Any]]]) -> str:
+    """Собирает код для execute, возвращающий результаты вызовов массивом."""
+    return f"return [{', '.join(script_call(method, params) for method, params in calls)}];"
+
+
+def parse_execute_response(data: Dict[str, Any], methods: Sequence[str]) -> List[Any]:
+    """Разбирает ответ execute: неудачные вызовы заменяются на VKError в порядке следования."""
+    results = parse_api_response(data)
+    errors = iter(data.get("execute_errors") or [])
+    unpacked: List[Any] = []
+    for method, value in zip(methods, results):
+        if value is False:
+            error = next(errors, None)
+            unpacked.append(VKError(f"Ошибка VK API: {error}" if error else f"VK не вернул результат {method}"))
+        else:
+            unpacked.append(value)
+    return unpacked
+
+
+def unwrap_result(value: Any) -> Any:
+    """Возвращает результат вызова из execute или поднимает его ошибку."""
+    if isinstance(value, VKError):
+        raise value
+    return value
+
+
+def attachment_from_saved(saved: List[Dict[str, Any]]) -> str:
+    """Формирует идентификатор вложения из ответа photos.saveWallPhoto."""
+    if not saved:
+        raise VKError("VK не вернул сохранённое фото")
+    photo = saved[0]
+    return f"photo{photo['owner_id']}_{photo['id']}"
+
+
+def derive_filename(image_url: str, content_type: Optional[str]) -> str:
+    """Определяет имя файла для загрузки в VK."""
+    path = urlparse(image_url).path
+    name = path.rsplit("/", 1)[-1] if "/" in path else ""
+    if not name:
+        extension = mimetypes.guess_extension(content_type or "") or ".jpg"
+        return f"image{extension}"
+    if "." not in name:
+        extension = mimetypes.guess_extension(content_type or "") or ".jpg"
+        return f"{name}{extension}"
+    return name
+
+
 class VKClient:
     """Публикация постов во VK."""
 
     API_BASE = "https://api.vk.com/method"
     API_VERSION = "5.131"
+    # Максимум вызовов API в одном execute
+    EXECUTE_LIMIT = 25
+    # Максимум записей в одном ответе wall.get
+    WALL_PAGE_SIZE = 100
+    # Сколько страниц последних записей просматривать в поисках вышедших отложенных постов
+    PUBLISHED_SCAN_PAGES = 3
+    # Изображения крупнее этого размера скачиваются во временный файл на диске
+    SPOOL_MAX_SIZE = 1024 * 1024
 
-    def __init__(self, config: VKConfig) -> None:
+    def __init__(
+        self,
+        config: VKConfig,
+        image_cache: Optional[ImageCache] = None,
+        short_link_cache: Optional[ShortLinkCache] = None,
+        normalizer: Optional[ImageNormalizer] = None,
+        rate_limits: Optional[RateLimiterRegistry] = None,
+        session: Optional[requests.Session] = None,
+    ) -> None:
         self._access_token = config.user_access_token
         self._group_id = config.group_id
-        self._session = requests.Session()
+        self._session = session or requests.Session()
+        self._image_cache = image_cache
+        self._normalizer = normalizer
+        self._short_links = short_link_cache
+        self._limiter = rate_limits.bucket("vk", config.user_access_token) if rate_limits is not None else None
+        self._upload_servers = UploadServerCache(config.upload_url_ttl)
 
-    def publish_post(self, message: str, image_url: str) -> str:
-        """Публикует пост и возвращает ссылку."""
-        upload_url = self._get_upload_url()
-        attachment = self._upload_photo(upload_url, image_url)
-        post_id = self._create_post(message, attachment)
-        return f"https://vk.com/wall-{self._group_id}_{post_id}"
+    def publish_post(
+        self,
+        message: str,
+        image_url: str,
+        attachment: Union[str, UploadedPhoto, None] = None,
+        publish_date: Optional[datetime] = None,
+    ) -> str:
+        """Публикует пост и возвращает ссылку; заранее загруженное фото передаётся в attachment.
+
+        С publish_date пост создаётся отложенным и выходит на стороне VK в указанное время.
+        """
+        if attachment is None:
+            attachment = self.upload_photo(image_url)
+        params: Dict[str, Any] = {"owner_id": -self._group_id, "from_group": 1, "message": message}
+        if publish_date is not None:
+            params["publish_date"] = int(publish_date.timestamp())
+        if isinstance(attachment, UploadedPhoto):
+            post_id = self._save_and_post(params, attachment)
+        else:
+            post_id = self._create_post(params, attachment)
+        return self._post_link(post_id)
+
+    def postponed_post_ids(self) -> Set[int]:
+        """Идентификаторы отложенных постов сообщества, ещё не вышедших."""
+        post_ids: Set[int] = set()
+        offset = 0
+        while True:
+            response = self._api_call(
+                "wall.get", owner_id=-self._group_id, filter="postponed", count=self.WALL_PAGE_SIZE, offset=offset
+            )
+            items = response.get("items", [])
+            post_ids.update(int(item["id"]) for item in items)
+            offset += len(items)
+            if not items or offset >= int(response.get("count", 0)):
+                return post_ids
+
+    def published_posts(self, postponed_ids: Set[int]) -> Dict[int, str]:
+        """Ссылки на вышедшие отложенные посты: идентификатор отложенного поста -> ссылка.
+
+        При публикации VK выдаёт посту новый идентификатор, а прежний пишет в поле postponed_id,
+        поэтому посты ищутся среди последних записей стены.
+        """
+        found: Dict[int, str] = {}
+        offset = 0
+        for _ in range(self.PUBLISHED_SCAN_PAGES):
+            response = self._api_call(
+                "wall.get", owner_id=-self._group_id, filter="owner", count=self.WALL_PAGE_SIZE, offset=offset
+            )
+            items = response.get("items", [])
+            for item in items:
+                if item.get("postponed_id") in postponed_ids:
+                    found[int(item["postponed_id"])] = self._post_link(item["id"])
+            offset += len(items)
+            if not items or len(found) == len(postponed_ids) or offset >= int(response.get("count", 0)):
+                break
+        return found
+
+    def delete_post(self, post_id: int) -> None:
+        """Удаляет пост (в том числе отложенный) со стены сообщества."""
+        self._api_call("wall.delete", owner_id=-self._group_id, post_id=post_id)
+
+    def upload_photo(self, image_url: str) -> UploadedPhoto:
+        """Загружает фото на сервер VK; сохранение выполняется вместе с публикацией поста."""
+        with self._open_image(image_url) as (image, mime, filename):
+            body = MultipartFile("photo", filename, image, mime or "image/jpeg")
+            upload_url = self._upload_servers.get()
+            if upload_url is None:
+                return self._upload_photo(self._get_upload_url(), body)
+            try:
+                return self._upload_photo(upload_url, body)
+            except UploadRejectedError:
+                self._upload_servers.invalidate(upload_url)
+                return self._upload_photo(self._get_upload_url(), body)
+
+    def prepare_upload(self) -> None:
+        """Заранее получает адрес сервера загрузки фото (и открывает соединение с API)."""
+        if self._upload_servers.get() is None:
+            self._get_upload_url()
+
+    def prefetch_image(self, image_url: str) -> None:
+        """Скачивает и подготавливает изображение в кэш; без кэша изображений ничего не делает."""
+        if self._image_cache is None:
+            return
+        with self._open_image(image_url):
+            pass
 
     def get_short_link(self, url: str) -> str:
-        """Возвращает сокращённую ссылку через utils.getShortLink."""
+        """Возвращает сокращённую ссылку через utils.getShortLink (с учётом кэша)."""
         if not url:
             return url
+        cached = self._cached_short_link(url)
+        if cached:
+            return cached
         response = self._api_call("utils.getShortLink", url=url)
         short = response.get("short_url")
+        self._remember_short_link(url, short)
         return short or url
 
+    def get_short_links(self, urls: Sequence[str]) -> Dict[str, str]:
+        """Сокращает пачку ссылок через execute; ссылки с ошибкой в результат не попадают."""
+        short_links: Dict[str, str] = {}
+        missing = []
+        for url in dict.fromkeys(url for url in urls if url):
+            cached = self._cached_short_link(url)
+            if cached:
+                short_links[url] = cached
+            else:
+                missing.append(url)
+        results = self.execute([("utils.getShortLink", {"url": url}) for url in missing])
+        for url, result in zip(missing, results):
+            if not isinstance(result, VKError):
+                self._remember_short_link(url, result.get("short_url"))
+                short_links[url] = result.get("short_url") or url
+        return short_links
+
+    def short_link_stats(self) -> Optional[Dict[str, float]]:
+        """Возвращает статистику кэша коротких ссылок, если он настроен."""
+        return self._short_links.stats() if self._short_links is not None else None
+
+    def execute(self, calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Выполняет вызовы API пачками через execute; ошибка отдельного вызова возвращается как VKError."""
+        results: List[Any] = []
+        for start in range(0, len(calls), self.EXECUTE_LIMIT):
+            chunk = calls[start : start + self.EXECUTE_LIMIT]
+            results.extend(self._execute(build_execute_code(chunk), [method for method, _ in chunk]))
+        return results
+
+    def _cached_short_link(self, url: str) -> Optional[str]:
+        """Ищет короткую ссылку в кэше."""
+        return self._short_links.get(url) if self._short_links is not None else None
+
+    def _remember_short_link(self, url: str, short_url: Optional[str]) -> None:
+        """Сохраняет полученную короткую ссылку в кэш."""
+        if self._short_links is not None and short_url:
+            self._short_links.put(url, short_url)
+
     def _get_upload_url(self) -> str:
         """Возвращает URL загрузки фото."""
         response = self._api_call(
@@ -46,59 +345,83 @@ class VKClient:
             group_id=self._group_id,
         )
         upload_url = response["upload_url"]
+        self._upload_servers.put(upload_url)
         return upload_url
 
-    def _upload_photo(self, upload_url: str, image_url: str) -> str:
-        """Загружает фото и возвращает идентификатор вложения."""
-        image_bytes, mime, filename = self._download_image(image_url)
-        from io import BytesIO
-        files = {"photo": (filename, BytesIO(image_bytes), mime or "image/jpeg")}
-        data = None
-        photo_payload = None
-        for attempt in range(3):
-            upload_response = self._post(upload_url, files=files)
-            data = upload_response.json()
-            photo_payload = data.get("photo")
-            if photo_payload and photo_payload not in ("[]", []):
-                break
-        else:
-            raise VKError(f"Сервер загрузки VK вернул пустой результат: {data}")
-        server = data.get("server")
-        upload_hash = data.get("hash")
-        if server is None or upload_hash is None:
-            raise VKError(f"В ответе VK отсутствуют обязательные поля: {data}")
-        saved = self._api_call(
+    @retry_on_exceptions((requests.ConnectionError, requests.Timeout, EmptyUploadError), destination="vk")
+    def _upload_photo(self, upload_url: str, body: MultipartFile) -> UploadedPhoto:
+        """Отправляет фото на сервер загрузки; тело перематывается перед каждой попыткой."""
+        body.rewind()
+        try:
+            response = self._session.post(upload_url, data=body, headers=body.headers, timeout=20)
+            response.raise_for_status()
+        except requests.HTTPError as exc:
+            raise UploadRejectedError(f"Сервер загрузки VK вернул ошибку: {exc}") from exc
+        data = response.json()
+        uploaded = parse_upload_response(data)
+        if uploaded is None:
+            raise EmptyUploadError(f"Сервер загрузки VK вернул пустой результат: {data}")
+        return UploadedPhoto(*uploaded)
+
+    def _save_and_post(self, params: Dict[str, Any], photo: UploadedPhoto) -> int:
+        """Сохраняет фото и создаёт запись на стене одним запросом execute."""
+        save = script_call(
             "photos.saveWallPhoto",
-            group_id=self._group_id,
-            photo=photo_payload,
-            server=server,
-            hash=upload_hash,
+            {"group_id": self._group_id, "photo": photo.photo, "server": photo.server, "hash": photo.hash},
         )
-        if not saved:
-            raise VKError("VK не вернул сохранённое фото")
-        photo = saved[0]
-        return f"photo{photo['owner_id']}_{photo['id']}"
-
-    def _create_post(self, message: str, attachment: str) -> int:
-        """Создаёт запись на стене и возвращает идентификатор поста."""
-        response = self._api_call(
+        post = script_call(
             "wall.post",
-            owner_id=-self._group_id,
-            from_group=1,
-            message=message,
-            attachments=attachment,
+            params,
+            {"attachments": '"photo" + saved[0].owner_id + "_" + saved[0].id'},
         )
+        code = f"var saved = {save}; if (!saved) {{ return [false, false]; }} return [saved, {post}];"
+        saved, response = self._execute(code, ["photos.saveWallPhoto", "wall.post"])
+        unwrap_result(saved)
+        return unwrap_result(response)["post_id"]
+
+    def _post_link(self, post_id: int) -> str:
+        return f"https://vk.com/wall-{self._group_id}_{post_id}"
+
+    def _create_post(self, params: Dict[str, Any], attachment: str) -> int:
+        """Создаёт запись на стене и возвращает идентификатор поста."""
+        response = self._api_call("wall.post", attachments=attachment, **params)
         post_id = response["post_id"]
         return post_id
 
-    def _download_image(self, image_url: str) -> Tuple[bytes, Optional[str], str]:
-        """Загружает изображение по URL."""
-        response = self._get(image_url, stream=True)
-        content_type = response.headers.get("Content-Type")
-        filename = self._derive_filename(image_url, content_type)
-        return response.content, content_type, filename
+    @contextmanager
+    def _open_image(self, image_url: str) -> Iterator[Tuple[BinaryIO, Optional[str], str]]:
+        """Открывает изображение как файл: из кэша или скачивая потоком во временный файл."""
+        if self._image_cache is not None:
+            original = self._fetch_cached_image(image_url)
+            try:
+                cached = original
+                if self._normalizer is not None:
+                    cached = self._normalizer.normalize(original, VK_PHOTO_PROFILE)
+                with cached.path.open("rb") as image:
+                    yield image, cached.content_type, derive_filename(image_url, cached.content_type)
+            finally:
+                self._image_cache.release(original)
+            return
+        with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE) as image:
+            content_type = self._download_to(image_url, image)
+            yield image, content_type, derive_filename(image_url, content_type)
+
+    @retry_on_exceptions((requests.RequestException,))
+    def _download_to(self, image_url: str, target: BinaryIO) -> Optional[str]:
+        """Скачивает изображение кусками в target и возвращает Content-Type."""
+        target.seek(0)
+        target.truncate()
+        with self._session.get(image_url, stream=True, timeout=20) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=MultipartFile.CHUNK_SIZE):
+                target.write(chunk)
+            return response.headers.get("Content-Type")
 
     @retry_on_exceptions((requests.RequestException,))
+    def _fetch_cached_image(self, image_url: str) -> CachedImage:
+        """Берёт изображение из кэша с повторной проверкой по ETag/Last-Modified и закрепляет его."""
+        return self._image_cache.fetch(image_url, self._session, pin=True)
+
     def _api_call(self, method: str, **params) -> Dict[str, object]:
         """Вызывает метод VK API и возвращает результат."""
         url = f"{self.API_BASE}/{method}"
@@ -107,37 +430,44 @@ class VKClient:
             "v": self.API_VERSION,
             **params,
         }
-        response = self._session.post(url, data=payload, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        if "error" in data:
-            raise VKError(f"Ошибка VK API: {data['error']}")
-        return data["response"]
+        return self._sender([method])(url, payload)["response"]
 
-    @retry_on_exceptions((requests.RequestException,))
-    def _post(self, url: str, **kwargs) -> Response:
-        """POST-запрос с повторами."""
-        response = self._session.post(url, timeout=20, **kwargs)
-        response.raise_for_status()
-        return response
+    def _execute(self, code: str, methods: Sequence[str]) -> List[Any]:
+        """Выполняет код VKScript через метод execute."""
+        url = f"{self.API_BASE}/execute"
+        payload = {"access_token": self._access_token, "v": self.API_VERSION, "code": code}
+        return parse_execute_response(self._sender(methods)(url, payload), methods)
 
-    @retry_on_exceptions((requests.RequestException,))
-    def _get(self, url: str, **kwargs) -> Response:
-        """GET-запрос с повторами."""
-        response = self._session.get(url, timeout=20, **kwargs)
+    def _sender(self, methods: Sequence[str]) -> Callable[[str, Dict[str, Any]], Dict[str, Any]]:
+        """Выбирает отправку с повторами: запросы с wall.post не повторяются при ошибках сервера VK и таймаутах.
+
+        Коды 1 и 10, 5xx и таймаут ответа VK может вернуть уже после создания записи, и повтор
+        опубликовал бы её дважды; такой сбой остаётся журналу публикаций.
+        """
+        return self._send_post if "wall.post" in methods else self._send
+
+    @retry_on_exceptions((requests.RequestException, RateLimitedError, VKServerError), destination="vk")
+    def _send(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Отправляет идемпотентный запрос с повторами."""
+        return self._send_api_request(url, payload)
+
+    @retry_on_exceptions((requests.ConnectTimeout, RateLimitedError), destination="vk")
+    def _send_post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Отправляет запрос, создающий запись; повторяются только неустановленное соединение и лимит частоты."""
+        return self._send_api_request(url, payload)
+
+    def _send_api_request(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Отправляет запрос к API с учётом лимита частоты для токена; ошибки VK поднимаются как VKError."""
+        if self._limiter is not None:
+            self._limiter.acquire()
+        response = self._session.post(url, data=payload, timeout=10)
+        raise_for_rate_limit(self._limiter, response.status_code, response.headers)
         response.raise_for_status()
-        return response
-
-    def _derive_filename(self, image_url: str, content_type: Optional[str]) -> str:
-        """Определяет имя файла для загрузки в VK."""
-        from urllib.parse import urlparse
-        import mimetypes
-        path = urlparse(image_url).path
-        name = path.rsplit("/", 1)[-1] if "/" in path else ""
-        if not name:
-            extension = mimetypes.guess_extension(content_type or "") or ".jpg"
-            return f"image{extension}"
-        if "." not in name:
-            extension = mimetypes.guess_extension(content_type or "") or ".jpg"
-            return f"{name}{extension}"
-        return name
+        data = response.json()
+        try:
+            parse_api_response(data)
+        except VKRateLimitError as exc:
+            if self._limiter is not None:
+                self._limiter.defer(exc.retry_after)
+            raise
+        return data
@@ -0,0 +1,73 @@
+"""Учёт отложенных постов VK, созданных заранее с publish_date."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+import threading
+from typing import List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scheduled_posts (
+    flow TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    link TEXT NOT NULL,
+    publish_at TEXT NOT NULL,
+    PRIMARY KEY (flow, row_key)
+);
+"""
+
+
+@dataclass(frozen=True)
+class ScheduledPost:
+    flow: str
+    key: str
+    post_id: int
+    link: str
+    publish_at: datetime
+
+
+class ScheduledPosts:
+    """Хранит отложенные посты VK по строкам таблицы, чтобы сверять и отменять их при правках."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def add(self, flow: str, key: str, post_id: int, link: str, publish_at: datetime) -> None:
+        """Запоминает отложенный пост строки."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO scheduled_posts VALUES (?, ?, ?, ?, ?)",
+                (flow, key, post_id, link, publish_at.isoformat()),
+            )
+
+    def get(self, flow: str, key: str) -> Optional[ScheduledPost]:
+        """Возвращает отложенный пост строки, если он есть."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT flow, row_key, post_id, link, publish_at FROM scheduled_posts WHERE flow = ? AND row_key = ?",
+                (flow, key),
+            ).fetchone()
+        return _post(row) if row else None
+
+    def all(self, flow: str) -> List[ScheduledPost]:
+        """Отложенные посты флоу в порядке времени публикации."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT flow, row_key, post_id, link, publish_at FROM scheduled_posts WHERE flow = ?", (flow,)
+            ).fetchall()
+        return sorted((_post(row) for row in rows), key=lambda post: post.publish_at)
+
+    def remove(self, flow: str, key: str) -> None:
+        """Забывает пост строки: он опубликован и записан в таблицу либо отменён."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM scheduled_posts WHERE flow = ? AND row_key = ?", (flow, key))
+
+
+def _post(row: tuple) -> ScheduledPost:
+    return ScheduledPost(row[0], row[1], int(row[2]), row[3], datetime.fromisoformat(row[4]))
@@ -0,0 +1,81 @@
+"""Постоянный кэш сокращённых ссылок vk.cc."""
+
+from collections import OrderedDict
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS short_links (
+    url TEXT PRIMARY KEY,
+    short_url TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class ShortLinkCache:
+    """Хранит сокращённые ссылки в SQLite с ограниченным LRU в памяти перед ним."""
+
+    def __init__(self, path: Path, ttl: float, memory_size: int = 1024) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl = ttl
+        self._memory_size = memory_size
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    def get(self, url: str) -> Optional[str]:
+        """Возвращает сохранённую короткую ссылку, если срок её хранения не истёк."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(url)
+                self._memory_hits += 1
+                return entry[0]
+            row = self._connection.execute(
+                "SELECT short_url, expires_at FROM short_links WHERE url = ? AND expires_at > ?", (url, now)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._remember(url, row[0], row[1])
+            return row[0]
+
+    def put(self, url: str, short_url: str) -> None:
+        """Сохраняет короткую ссылку на время TTL."""
+        expires_at = time.time() + self._ttl
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO short_links VALUES (?, ?, ?)", (url, short_url, expires_at)
+            )
+            self._connection.execute("DELETE FROM short_links WHERE expires_at <= ?", (time.time(),))
+            self._remember(url, short_url, expires_at)
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает счётчики попаданий и долю запросов, обслуженных кэшем."""
+        with self._lock:
+            total = self._memory_hits + self._disk_hits + self._misses
+            hits = self._memory_hits + self._disk_hits
+            return {
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+            }
+
+    def _remember(self, url: str, short_url: str, expires_at: float) -> None:
+        """Кладёт запись в LRU и вытесняет самые старые."""
+        self._memory[url] = (short_url, expires_at)
+        self._memory.move_to_end(url)
+        while len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
@@ -0,0 +1,182 @@
+"""Тесты асинхронных клиентов площадок и их подключения к сервису публикаций."""
+
+import asyncio
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from publisher.config import TelegramConfig, TelegraphConfig, VKConfig
+from publisher.core.http import BlockingClient, EventLoopThread
+from publisher.core.image_cache import ImageCache
+from publisher.core.retry import circuit_breaker, retry_budget, tenant_scope
+from publisher.gs.sheets import RSSRow
+from publisher.run import build_clients, build_shared
+from publisher.services.async_publisher import AsyncPublisherService
+from publisher.services.journal import PublishJournal
+from publisher.services.publisher import PublisherService
+from publisher.telegraph.async_client import AsyncTelegraphClient
+from publisher.tg.async_client import AsyncTelegramClient
+from publisher.vk.async_client import AsyncVKClient
+
+VK_CONFIG = VKConfig(user_access_token="token", group_id=1)
+
+
+def _platforms(requests_log):
+    """Отвечает за Telegra.ph, VK, Telegram и источник изображения."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_log.append(request)
+        host, path = request.url.host, request.url.path
+        if host == "img.example":
+            return httpx.Response(200, content=b"img", headers={"Content-Type": "image/jpeg", "ETag": '"v1"'})
+        if host == "api.telegra.ph":
+            return httpx.Response(200, json={"ok": True, "result": {"url": "https://telegra.ph/page"}})
+        if host == "api.telegram.org":
+            return httpx.Response(200, json={"ok": True, "result": {"message_id": 7}})
+        if host == "upload.vk":
+            return httpx.Response(200, json={"photo": "p", "server": 1, "hash": "h"})
+        if path == "/method/photos.getWallUploadServer":
+            return httpx.Response(200, json={"response": {"upload_url": "https://upload.vk/1"}})
+        if path == "/method/utils.getShortLink":
+            return httpx.Response(200, json={"response": {"short_url": "vk.cc/short"}})
+        if path == "/method/execute":
+            return httpx.Response(200, json={"response": [[{"owner_id": -1, "id": 2}], {"post_id": 5}]})
+        raise AssertionError(request.url)
+
+    return handler
+
+
+async def _no_sleep(seconds):
+    return None
+
+
+def _rss_row() -> RSSRow:
+    return RSSRow(
+        row_number=2,
+        gpt_post_title="Заголовок",
+        gpt_post="Заголовок\n\nТекст",
+        short_post="Коротко",
+        average_post="",
+        link="",
+        image_url="https://img.example/1.jpg",
+        telegraph_link="",
+        vk_post_link="",
+        telegram_post_link="",
+        status="Revised",
+    )
+
+
+def test_service_publishes_rss_through_async_clients(tmp_path):
+    log = []
+    http = httpx.AsyncClient(transport=httpx.MockTransport(_platforms(log)))
+    cache = ImageCache(tmp_path / "images", max_bytes=1024 * 1024)
+    loop = EventLoopThread()
+    try:
+        telegraph = BlockingClient(AsyncTelegraphClient(TelegraphConfig("t", "Автор", "https://a"), http=http), loop)
+        vk = BlockingClient(AsyncVKClient(VK_CONFIG, http=http, image_cache=cache), loop)
+        telegram = BlockingClient(AsyncTelegramClient(TelegramConfig("bot", "channel"), http=http), loop)
+        sheets = MagicMock()
+        sheets.fetch_rss_ready_rows.return_value = [_rss_row()]
+        journal = PublishJournal(tmp_path / "journal.sqlite3")
+        service = PublisherService(sheets, telegraph, vk, telegram, journal=journal)
+
+        asyncio.run(AsyncPublisherService(service).process_rss_flow())
+        service.close()
+    finally:
+        loop.run(http.aclose())
+        loop.close()
+
+    sheets.update_rss_row.assert_called_once()
+    assert sheets.update_rss_row.call_args.args[1:] == (
+        "https://telegra.ph/page",
+        "https://vk.com/wall-1_5",
+        "https://t.me/channel/7",
+    )
+    # Фото сохраняется и пост создаётся одним execute, изображение попадает в кэш
+    execute = next(request for request in log if request.url.path == "/method/execute")
+    code = parse_qs(execute.content.decode())["code"][0]
+    assert "API.photos.saveWallPhoto" in code and "API.wall.post" in code
+    assert "Читать подробнее > vk.cc/short" in code
+    assert cache.fresh("https://img.example/1.jpg") is not None
+
+
+def test_wall_post_is_not_retried_after_read_timeout(monkeypatch):
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        if "wall.post" in request.url.path:
+            raise httpx.ReadTimeout("read timed out", request=request)
+        return httpx.Response(200, json={"response": {"items": [], "count": 0}})
+
+    monkeypatch.setattr(AsyncVKClient._send_post.retry, "sleep", _no_sleep)
+    monkeypatch.setattr(AsyncVKClient._send.retry, "sleep", _no_sleep)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            client = AsyncVKClient(VK_CONFIG, http=http)
+            with pytest.raises(httpx.ReadTimeout):
+                await client.publish_post("text", "", attachment="photo1_2")
+            assert len(attempts) == 2
+            # Чтение стены повторяется при любом сетевом сбое
+            assert await client.postponed_post_ids() == set()
+
+    asyncio.run(scenario())
+
+
+def test_blocking_client_carries_caller_context_into_event_loop():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(502)
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    loop = EventLoopThread()
+    try:
+        vk = BlockingClient(AsyncVKClient(VK_CONFIG, http=http), loop)
+        # Запас повторов флоу исчерпан: ошибка 5xx не повторяется и в event loop
+        with tenant_scope("async-alpha"), retry_budget(0):
+            with pytest.raises(httpx.HTTPStatusError):
+                vk.delete_post(5)
+        assert len(calls) == 1
+        # Сбой учтён предохранителем клиента, вызвавшего метод
+        assert circuit_breaker("vk", "async-alpha")._failures == 1
+        assert circuit_breaker("vk", "async-beta")._failures == 0
+        assert vk.short_link_stats() is None
+    finally:
+        loop.run(http.aclose())
+        loop.close()
+
+
+def test_async_http_flag_builds_blocking_clients_on_shared_loop():
+    config = MagicMock(image_cache=None, async_http=True, async_http_connections=10)
+    config.vk = VK_CONFIG
+    config.telegram = TelegramConfig("bot", "channel")
+    config.telegraph = TelegraphConfig("t", "Автор", "https://a")
+    config.rate_limits = MagicMock(
+        vk_per_second=3, telegram_per_minute=20, telegraph_per_minute=60, sheets_per_minute=60
+    )
+    shared = build_shared(config)
+    try:
+        clients = build_clients(config, shared)
+        assert all(isinstance(client, BlockingClient) for client in clients)
+        assert isinstance(clients[1]._client, AsyncVKClient)
+        assert clients[1]._client._http is shared.http
+    finally:
+        shared.close()
+    assert shared.http.is_closed
+
+
+def test_async_service_runs_flows_concurrently():
+    service = MagicMock()
+
+    asyncio.run(AsyncPublisherService(service).run_all())
+
+    service.process_rss_flow.assert_called_once_with()
+    service.process_vk_flow.assert_called_once_with()
+    service.process_setka_flow.assert_called_once_with()
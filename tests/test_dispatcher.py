@@ -0,0 +1,84 @@
+"""Тесты запуска флоу в фоновых потоках."""
+
+import threading
+import time
+
+from publisher.core.dispatcher import FlowDispatcher
+
+
+def _wait_idle(dispatcher, *keys):
+    deadline = time.monotonic() + 5
+    while any(dispatcher.busy(key) for key in keys) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_same_flow_is_not_started_twice_while_others_run():
+    release = threading.Event()
+    finished = []
+    dispatcher = FlowDispatcher(max_workers=2)
+
+    assert dispatcher.submit("rss", lambda: release.wait(5))
+    assert not dispatcher.submit("rss", lambda: finished.append("rss-again"))
+    assert dispatcher.submit("setka", lambda: finished.append("setka"))
+    _wait_idle(dispatcher, "setka")
+    assert dispatcher.drain(0.5) is False
+    assert finished == ["setka"]
+    assert dispatcher.busy("rss")
+
+    release.set()
+    assert dispatcher.drain(5)
+    assert not dispatcher.busy("rss")
+    assert finished == ["setka"]
+
+
+def test_workers_are_bounded_and_drain_stops_new_flows():
+    running = []
+    peak = []
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def flow():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.pop()
+
+    dispatcher = FlowDispatcher(max_workers=2)
+    for name in ("rss", "vk", "setka"):
+        assert dispatcher.submit(name, flow)
+    release.set()
+    _wait_idle(dispatcher, "rss", "vk", "setka")
+
+    assert dispatcher.drain(5)
+    assert max(peak) <= 2 and len(peak) == 3
+    assert not dispatcher.submit("rss", flow)
+
+
+def test_waiting_flow_is_not_started_after_drain():
+    release = threading.Event()
+    started = []
+    done = []
+    dispatcher = FlowDispatcher(max_workers=1)
+
+    assert dispatcher.submit("rss", lambda: release.wait(5), on_done=lambda: done.append("rss"))
+    assert dispatcher.submit("vk", lambda: started.append("vk"), on_done=lambda: done.append("vk"))
+    threading.Timer(0.2, release.set).start()
+
+    assert dispatcher.drain(5)
+    time.sleep(0.1)
+    assert started == []
+    assert done == ["rss"]
+    assert not dispatcher.busy("vk")
+
+
+def test_failed_flow_releases_its_slot():
+    dispatcher = FlowDispatcher(max_workers=1)
+
+    def broken():
+        raise RuntimeError("Sheets недоступен")
+
+    assert dispatcher.submit("vk", broken)
+    assert dispatcher.drain(5)
+    assert not dispatcher.busy("vk")
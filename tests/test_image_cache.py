@@ -0,0 +1,82 @@
+"""Тесты дискового кэша изображений."""
+
+from unittest.mock import MagicMock
+
+from publisher.core.image_cache import ImageCache
+
+
+def _response(status_code=200, content=b"", headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = [content]
+    return response
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=1024)
+
+    first = cache.store("https://a/1.jpg", [b"img", b"data"], "image/jpeg")
+    second = cache.store("https://b/2.jpg", [b"imgdata"], "image/jpeg")
+
+    assert first.path == second.path
+    assert first.path.read_bytes() == b"imgdata"
+    assert len(list((tmp_path / "blobs").iterdir())) == 1
+
+
+def test_fetch_revalidates_with_etag(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=1024, fresh_seconds=-1)
+    session = MagicMock()
+    session.get.side_effect = [
+        _response(content=b"img", headers={"Content-Type": "image/png", "ETag": '"v1"'}),
+        _response(status_code=304),
+    ]
+
+    stored = cache.fetch("https://a/1.png", session)
+    revalidated = cache.fetch("https://a/1.png", session)
+
+    assert revalidated.path == stored.path
+    assert revalidated.content_type == "image/png"
+    assert session.get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_fresh_entry_skips_network(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=1024)
+    cache.store("https://a/1.jpg", [b"img"], "image/jpeg")
+    session = MagicMock()
+
+    cached = cache.fetch("https://a/1.jpg", session)
+
+    assert cached.path.read_bytes() == b"img"
+    session.get.assert_not_called()
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=10)
+    old = cache.store("https://a/old.jpg", [b"aaaa"], "image/jpeg")
+    cache.store("https://a/used.jpg", [b"bbbb"], "image/jpeg")
+    cache.fresh("https://a/used.jpg")
+
+    cache.store("https://a/new.jpg", [b"cccc"], "image/jpeg")
+
+    assert not old.path.exists()
+    assert cache.fresh("https://a/old.jpg") is None
+    assert cache.fresh("https://a/used.jpg") is not None
+    assert cache.fresh("https://a/new.jpg") is not None
+
+
+def test_pinned_image_is_not_evicted_until_released(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=10)
+    cache.store("https://a/old.jpg", [b"aaaa"], "image/jpeg")
+    pinned = cache.fresh("https://a/old.jpg", pin=True)
+    cache.store("https://a/used.jpg", [b"bbbb"], "image/jpeg")
+
+    cache.store("https://a/new.jpg", [b"cccc"], "image/jpeg")
+
+    assert pinned.path.exists()
+    assert cache.fresh("https://a/used.jpg") is None
+
+    cache.release(pinned)
+    cache.store("https://a/next.jpg", [b"dddd"], "image/jpeg")
+
+    assert not pinned.path.exists()
@@ -0,0 +1,75 @@
+"""Тесты подготовки изображений."""
+
+from io import BytesIO
+
+from PIL import Image
+import pytest
+
+from publisher.core.image_cache import ImageCache
+from publisher.core.images import ImageNormalizer, ImageProfile, normalize_file
+
+PROFILE = ImageProfile("test", max_side=100, quality=80, max_bytes=1024 * 1024)
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def test_large_png_is_downsized_to_jpeg(tmp_path):
+    source = tmp_path / "source.png"
+    source.write_bytes(_encode(Image.new("RGBA", (400, 200), (255, 0, 0, 128)), "PNG"))
+    target = tmp_path / "target.jpg"
+
+    assert normalize_file(str(source), str(target), PROFILE.max_side, PROFILE.quality, PROFILE.max_bytes)
+
+    with Image.open(target) as result:
+        assert result.format == "JPEG"
+        assert result.size == (100, 50)
+
+
+def test_small_jpeg_is_kept_as_is(tmp_path):
+    source = tmp_path / "source.jpg"
+    source.write_bytes(_encode(Image.new("RGB", (50, 50)), "JPEG"))
+    target = tmp_path / "target.jpg"
+
+    assert not normalize_file(str(source), str(target), PROFILE.max_side, PROFILE.quality, PROFILE.max_bytes)
+    assert not target.exists()
+
+
+def test_normalizer_caches_variant_per_profile(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=10 * 1024 * 1024)
+    original = cache.store("https://a/1.webp", [_encode(Image.new("RGB", (300, 300)), "WEBP")], "image/webp")
+    normalizer = ImageNormalizer(cache, workers=1)
+    try:
+        first = normalizer.normalize(original, PROFILE)
+        second = normalizer.normalize(original, PROFILE)
+    finally:
+        normalizer.close()
+
+    assert first.path == second.path == cache.variant_path(original.sha256, "test")
+    assert first.content_type == "image/jpeg"
+
+
+def test_broken_image_falls_back_to_original(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=1024)
+    original = cache.store("https://a/broken.jpg", [b"not an image"], "image/jpeg")
+    normalizer = ImageNormalizer(cache, workers=1)
+    try:
+        assert normalizer.normalize(original, PROFILE) == original
+    finally:
+        normalizer.close()
+
+
+def test_avif_is_converted_to_jpeg(tmp_path):
+    pytest.importorskip("pillow_avif")
+    source = tmp_path / "source.avif"
+    source.write_bytes(_encode(Image.new("RGB", (200, 200), (0, 128, 0)), "AVIF"))
+    target = tmp_path / "target.jpg"
+
+    assert normalize_file(str(source), str(target), PROFILE.max_side, PROFILE.quality, PROFILE.max_bytes)
+
+    with Image.open(target) as result:
+        assert result.format == "JPEG"
+        assert result.size == (100, 100)
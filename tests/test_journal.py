@@ -0,0 +1,23 @@
+"""Тесты журнала шагов публикации."""
+
+from publisher.services.journal import PublishJournal, row_key
+
+
+def test_journal_survives_reopen_and_forgets_settled_rows(tmp_path):
+    path = tmp_path / "journal.sqlite3"
+    key = row_key("https://source.example", "Заголовок")
+    journal = PublishJournal(path)
+    journal.record("rss", key, "telegraph", "https://telegra.ph/page")
+    journal.record("rss", key, "vk", "https://vk.com/wall-1_1")
+
+    reopened = PublishJournal(path)
+    assert reopened.steps("rss", key) == {"telegraph": "https://telegra.ph/page", "vk": "https://vk.com/wall-1_1"}
+    assert reopened.steps("vk", key) == {}
+
+    reopened.forget([("rss", key)])
+    assert reopened.steps("rss", key) == {}
+
+
+def test_row_key_depends_on_content_only():
+    assert row_key("a", "b") == row_key("a", "b")
+    assert row_key("a", "b") != row_key("ab", "")
@@ -1,12 +1,17 @@
 """Тесты сервиса публикаций."""
 
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock
 
 import pytest
+import pytz
 
+from publisher.core.work_queue import WorkQueue
 from publisher.gs.sheets import RSSRow, SetkaRow, VKRow
+from publisher.services.journal import PublishJournal, row_key
 from publisher.services.publisher import PublisherService
 from publisher.tg.client import TelegramClient
+from publisher.vk.scheduled_posts import ScheduledPosts
 
 
 @pytest.fixture()
@@ -320,3 +325,334 @@ def test_process_setka_flow_long_message_without_photo(clients):
 
     telegram.send_post.assert_called_once_with(long_content, None, add_spacing=False)
     sheets.mark_setka_published.assert_called_once_with(row, "https://t.me/channel/8")
+
+
+def test_process_rss_flow_batch_ordered_by_score(clients):
+    sheets, telegraph, vk, telegram, _ = clients
+    service = PublisherService(sheets, telegraph, vk, telegram, rss_batch_size=2)
+    rows = [
+        RSSRow(
+            row_number=number,
+            gpt_post_title="",
+            gpt_post=f"Пост {number}",
+            short_post=f"Пост {number} коротко",
+            average_post="",
+            link="",
+            image_url="https://example.com/img.jpg",
+            telegraph_link=f"https://telegra.ph/post{number}",
+            vk_post_link="",
+            telegram_post_link="",
+            status="Revised",
+            score=score,
+        )
+        for number, score in ((20, 1.0), (21, 5.0), (22, 3.0))
+    ]
+    sheets.fetch_rss_ready_rows.return_value = rows
+    vk.publish_post.return_value = "https://vk.com/wall-1_20"
+    telegram.send_post.side_effect = [RuntimeError("Ошибка Telegram"), "https://t.me/channel/22"]
+
+    service.process_rss_flow()
+
+    sheets.fetch_rss_ready_rows.assert_called_once()
+    sheets.write_rss_error.assert_called_once_with(rows[1], "Ошибка Telegram")
+    sheets.update_rss_row.assert_called_once_with(
+        rows[2], "https://telegra.ph/post22", "https://vk.com/wall-1_20", "https://t.me/channel/22"
+    )
+    sheets.flush.assert_called_once()
+
+
+def test_process_rss_flow_vk_photo_upload_error_uses_fallback(clients):
+    sheets, telegraph, vk, telegram, service = clients
+    row = RSSRow(
+        row_number=13,
+        gpt_post_title="",
+        gpt_post="Текст",
+        short_post="Коротко",
+        average_post="",
+        link="",
+        image_url="https://example.com/image.jpg",
+        telegraph_link="https://telegra.ph/page-13",
+        vk_post_link="",
+        telegram_post_link="",
+        status="Revised",
+    )
+    sheets.fetch_rss_ready_rows.return_value = [row]
+    vk.upload_photo.side_effect = RuntimeError("Ошибка загрузки")
+    telegram.send_post.return_value = "https://t.me/channel/13"
+
+    service.process_rss_flow()
+
+    vk.publish_post.assert_not_called()
+    sheets.update_rss_row.assert_called_once_with(
+        row, "https://telegra.ph/page-13", "Не отправлено в VK", "https://t.me/channel/13"
+    )
+
+
+def test_process_rss_flow_prefetches_short_links_for_batch(clients):
+    sheets, telegraph, vk, telegram, _ = clients
+    service = PublisherService(sheets, telegraph, vk, telegram, rss_batch_size=2)
+    rows = [
+        RSSRow(
+            row_number=number,
+            gpt_post_title="",
+            gpt_post=f"Пост {number}",
+            short_post=f"Пост {number} коротко",
+            average_post="",
+            link="",
+            image_url="https://example.com/img.jpg",
+            telegraph_link=f"https://telegra.ph/post{number}",
+            vk_post_link="",
+            telegram_post_link="",
+            status="Revised",
+        )
+        for number in (30, 31)
+    ]
+    sheets.fetch_rss_ready_rows.return_value = rows
+    vk.get_short_links.return_value = {"https://telegra.ph/post30": "vk.cc/30"}
+    vk.get_short_link.return_value = "vk.cc/31"
+    vk.publish_post.return_value = "https://vk.com/wall-1_30"
+    telegram.send_post.return_value = "https://t.me/channel/30"
+
+    service.process_rss_flow()
+
+    vk.get_short_links.assert_called_once_with(["https://telegra.ph/post30", "https://telegra.ph/post31"])
+    vk.get_short_link.assert_called_once_with("https://telegra.ph/post31")
+    messages = [call.args[0] for call in vk.publish_post.call_args_list]
+    assert "Читать подробнее > vk.cc/30" in messages[0]
+    assert "Читать подробнее > vk.cc/31" in messages[1]
+
+
+def test_process_rss_flow_resumes_from_journal_after_failed_write(tmp_path):
+    sheets, telegraph, vk, telegram = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    journal = PublishJournal(tmp_path / "journal.sqlite3")
+    row = RSSRow(
+        row_number=2,
+        gpt_post_title="Заголовок",
+        gpt_post="Текст",
+        short_post="Коротко",
+        average_post="",
+        link="https://source.example",
+        image_url="https://example.com/image.jpg",
+        telegraph_link="",
+        vk_post_link="",
+        telegram_post_link="",
+        status="Revised",
+    )
+    sheets.fetch_rss_ready_rows.return_value = [row]
+    telegraph.create_page.return_value = "https://telegra.ph/page"
+    vk.get_short_link.return_value = "vk.cc/short"
+    vk.publish_post.return_value = "https://vk.com/wall-1_1"
+    telegram.send_post.return_value = "https://t.me/channel/1"
+    sheets.update_rss_row.side_effect = [RuntimeError("quota"), None]
+
+    PublisherService(sheets, telegraph, vk, telegram, journal=journal).process_rss_flow()
+    PublisherService(sheets, telegraph, vk, telegram, journal=journal).process_rss_flow()
+
+    telegraph.create_page.assert_called_once()
+    vk.upload_photo.assert_called_once()
+    vk.publish_post.assert_called_once()
+    telegram.send_post.assert_called_once()
+    assert sheets.update_rss_row.call_count == 2
+    sheets.update_rss_row.assert_called_with(row, "https://telegra.ph/page", "https://vk.com/wall-1_1", "https://t.me/channel/1")
+    assert journal.steps("rss", row_key(row.link, row.gpt_post_title, row.gpt_post)) == {}
+
+
+def test_queue_mode_publishes_claimed_rows_and_acks_after_flush(tmp_path):
+    sheets, telegraph, vk, telegram = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+    service = PublisherService(sheets, telegraph, vk, telegram, queue=queue)
+    sheets.fetch_rss_ready_rows.return_value = []
+    sheets.fetch_vk_rows.return_value = [
+        VKRow(row_number=2, title="Первый", content="Текст", image_url="", post_link="", status="Revised"),
+        VKRow(row_number=3, title="Второй", content="Текст", image_url="", post_link="", status="Revised"),
+    ]
+    sheets.fetch_setka_rows.return_value = []
+    vk.publish_post.return_value = "https://vk.com/wall-1_5"
+
+    service.enqueue_ready_rows()
+    service.process_vk_flow()
+
+    published_row = sheets.mark_vk_published.call_args[0][0]
+    assert published_row.row_number == 2
+    assert queue.size("vk") == 1
+
+
+def test_queue_mode_writes_to_current_row_number_after_rows_shift(tmp_path):
+    sheets, telegraph, vk, telegram = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+    service = PublisherService(sheets, telegraph, vk, telegram, queue=queue)
+    sheets.fetch_rss_ready_rows.return_value = []
+    sheets.fetch_setka_rows.return_value = []
+    sheets.fetch_vk_rows.return_value = [VKRow(2, "Первый", "Текст", "", "", "Revised")]
+    vk.publish_post.return_value = "https://vk.com/wall-1_5"
+    service.enqueue_ready_rows()
+
+    # Редактор вставил строку выше: та же публикация теперь в строке 3
+    shifted = VKRow(3, "Первый", "Текст", "", "", "Revised")
+    sheets.fetch_vk_rows.return_value = [shifted]
+    service.process_vk_flow()
+    sheets.mark_vk_published.assert_called_once_with(shifted, "https://vk.com/wall-1_5")
+
+    sheets.fetch_vk_rows.return_value = [VKRow(2, "Второй", "Текст", "", "", "Revised")]
+    service.enqueue_ready_rows()
+    sheets.fetch_vk_rows.return_value = [VKRow(2, "Второй", "Исправленный текст", "", "", "Revised")]
+    sheets.mark_vk_published.reset_mock()
+    service.process_vk_flow()
+    sheets.mark_vk_published.assert_not_called()
+
+
+def test_warm_up_prepares_rss_window_and_flow_reuses_telegraph_page(tmp_path):
+    sheets, telegraph, vk, telegram = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+    service = PublisherService(sheets, telegraph, vk, telegram, queue=queue)
+    row = RSSRow(
+        row_number=4,
+        gpt_post_title="Заголовок",
+        gpt_post="Текст статьи",
+        short_post="Коротко",
+        average_post="",
+        link="https://source.example",
+        image_url="https://example.com/image.jpg",
+        telegraph_link="",
+        vk_post_link="",
+        telegram_post_link="",
+        status="Revised",
+    )
+    sheets.fetch_rss_ready_rows.return_value = [row]
+    sheets.fetch_vk_rows.return_value = []
+    sheets.fetch_setka_rows.return_value = []
+    telegraph.create_page.return_value = "https://telegra.ph/warm"
+    vk.get_short_links.return_value = {"https://telegra.ph/warm": "vk.cc/warm"}
+    vk.publish_post.return_value = "https://vk.com/wall-1_9"
+    telegram.send_post.return_value = "https://t.me/channel/9"
+    service.enqueue_ready_rows()
+
+    service.warm_up("rss")
+
+    telegraph.create_page.assert_called_once()
+    sheets.write_rss_telegraph_link.assert_called_once_with(row, "https://telegra.ph/warm")
+    vk.prepare_upload.assert_called_once()
+    vk.prefetch_image.assert_called_once_with(row.image_url)
+    vk.get_short_links.assert_called_once_with(["https://telegra.ph/warm"])
+    telegram.warm_up.assert_called_once()
+    telegram.prefetch_image.assert_called_once_with(row.image_url)
+    assert queue.size("rss") == 1
+
+    service.process_rss_flow()
+
+    telegraph.create_page.assert_called_once()
+    vk.get_short_links.assert_called_once()
+    vk.get_short_link.assert_not_called()
+    assert "vk.cc/warm" in vk.publish_post.call_args.args[0]
+    sheets.update_rss_row.assert_called_once_with(
+        row, "https://telegra.ph/warm", "https://vk.com/wall-1_9", "https://t.me/channel/9"
+    )
+    assert queue.size("rss") == 0
+
+
+def test_rows_with_publish_at_leave_fixed_window_and_publish_by_key():
+    sheets, telegraph, vk, telegram = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    service = PublisherService(sheets, telegraph, vk, telegram, publish_at_tz=pytz.timezone("Europe/Moscow"))
+    timed = VKRow(2, "Вечерний", "Текст", "", "", "Revised", publish_at="2024-05-06 21:00")
+    broken = VKRow(3, "Сломанный", "Текст", "", "", "Revised", publish_at="вечером")
+    regular = VKRow(4, "Обычный", "Текст", "", "", "Revised")
+    sheets.fetch_rss_ready_rows.return_value = []
+    sheets.fetch_setka_rows.return_value = []
+    sheets.fetch_vk_rows.return_value = [timed, broken, regular]
+    vk.publish_post.return_value = "https://vk.com/wall-1_3"
+
+    service.process_vk_flow()
+    sheets.mark_vk_published.assert_called_once_with(regular, "https://vk.com/wall-1_3")
+
+    rows = service.timed_rows()
+    service.timed_rows()
+    ((key, due),) = rows["vk"]
+    assert due.isoformat() == "2024-05-06T21:00:00+03:00"
+    sheets.write_vk_error.assert_called_once()
+    assert sheets.write_vk_error.call_args[0][0] is broken
+
+    sheets.mark_vk_published.reset_mock()
+    service.publish_timed_row("vk", key)
+    sheets.mark_vk_published.assert_called_once_with(timed, "https://vk.com/wall-1_3")
+
+    sheets.mark_vk_published.reset_mock()
+    sheets.fetch_vk_rows.return_value = [VKRow(2, "Вечерний", "Изменённый текст", "", "", "Revised", publish_at="2024-05-06 21:00")]
+    service.publish_timed_row("vk", key)
+    sheets.mark_vk_published.assert_not_called()
+
+
+def test_vk_posts_are_scheduled_in_advance_cancelled_on_edit_and_settled_after_release(tmp_path):
+    sheets, telegraph, vk, telegram = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    store = ScheduledPosts(tmp_path / "vk_scheduled.sqlite3")
+    service = PublisherService(sheets, telegraph, vk, telegram, scheduled_posts=store)
+    first = VKRow(2, "Первый", "Текст", "", "", "Revised")
+    second = VKRow(3, "Второй", "Текст", "", "", "Revised")
+    sheets.fetch_rss_ready_rows.return_value = []
+    sheets.fetch_vk_rows.return_value = [first, second]
+    vk.publish_post.side_effect = ["https://vk.com/wall-1_21", "https://vk.com/wall-1_22"]
+    now = datetime.now(pytz.utc)
+    windows = [now + timedelta(minutes=1), now + timedelta(hours=1), now + timedelta(hours=25)]
+
+    service.push_vk_posts({"vk": windows})
+
+    assert [call.kwargs["publish_date"] for call in vk.publish_post.call_args_list] == windows[1:]
+    assert [post.post_id for post in store.all("vk")] == [21, 22]
+    service.process_vk_flow()
+    sheets.mark_vk_published.assert_not_called()
+
+    sheets.fetch_vk_rows.return_value = [first, VKRow(3, "Второй", "Исправленный текст", "", "", "Revised")]
+    vk.postponed_post_ids.return_value = {21, 22}
+    service.reconcile_vk_posts()
+    vk.delete_post.assert_called_once_with(22)
+    (post,) = store.all("vk")
+
+    store.add("vk", post.key, post.post_id, post.link, now - timedelta(minutes=1))
+    vk.postponed_post_ids.return_value = set()
+    vk.published_posts.return_value = {21: "https://vk.com/wall-1_30"}
+    service.process_vk_flow()
+
+    vk.published_posts.assert_called_once_with({21})
+    sheets.mark_vk_published.assert_called_once_with(first, "https://vk.com/wall-1_30")
+    assert vk.publish_post.call_count == 2
+    assert store.all("vk") == []
+
+
+def test_scheduled_vk_post_released_after_window_is_awaited_or_left_to_regular_flow(tmp_path):
+    sheets, telegraph, vk, telegram = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    store = ScheduledPosts(tmp_path / "vk_scheduled.sqlite3")
+    service = PublisherService(sheets, telegraph, vk, telegram, scheduled_posts=store)
+    service.RELEASE_POLL_INTERVAL = 0
+    scheduled = VKRow(2, "Отложенный", "Текст", "", "", "Revised")
+    regular = VKRow(3, "Обычный", "Текст", "", "", "Revised")
+    sheets.fetch_vk_rows.return_value = [scheduled, regular]
+    key = row_key(scheduled.title, scheduled.content, scheduled.image_url)
+    now = datetime.now(pytz.utc)
+    store.add("vk", key, 21, "https://vk.com/wall-1_21", now - timedelta(seconds=30))
+    vk.postponed_post_ids.side_effect = [{21}, {21}, set()]
+    vk.published_posts.return_value = {21: "https://vk.com/wall-1_30"}
+
+    service.process_vk_flow()
+
+    assert vk.postponed_post_ids.call_count == 3
+    sheets.mark_vk_published.assert_called_once_with(scheduled, "https://vk.com/wall-1_30")
+    vk.publish_post.assert_not_called()
+
+    sheets.mark_vk_published.reset_mock()
+    store.add("vk", key, 21, "https://vk.com/wall-1_21", now - timedelta(minutes=10))
+    vk.postponed_post_ids.side_effect = None
+    vk.postponed_post_ids.return_value = {21}
+    vk.publish_post.return_value = "https://vk.com/wall-1_31"
+
+    service.process_vk_flow()
+
+    sheets.mark_vk_published.assert_called_once_with(regular, "https://vk.com/wall-1_31")
+    assert [post.post_id for post in store.all("vk")] == [21]
+
+
+def test_close_stops_stage_pool(clients):
+    service = clients[-1]
+
+    service.close()
+
+    with pytest.raises(RuntimeError):
+        service._executor.submit(lambda: None)
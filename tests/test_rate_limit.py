@@ -0,0 +1,59 @@
+"""Тесты ограничения частоты запросов."""
+
+import time
+
+import pytest
+
+from publisher.core.rate_limit import (
+    RateLimitedError,
+    RateLimiterRegistry,
+    TokenBucket,
+    raise_for_rate_limit,
+    retry_after_seconds,
+)
+
+
+def test_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=1000, capacity=2)
+
+    assert bucket._reserve() == 0
+    assert bucket._reserve() == 0
+    assert 0 < bucket._reserve() <= 0.001
+
+
+def test_defer_blocks_bucket_until_hint_expires():
+    bucket = TokenBucket(rate=100, capacity=5)
+
+    bucket.defer(0.05)
+    started = time.monotonic()
+    bucket.acquire()
+
+    assert time.monotonic() - started >= 0.05
+
+
+def test_registry_shares_bucket_per_key():
+    registry = RateLimiterRegistry({"vk": (3, 3), "sheets": (0, 1)})
+
+    assert registry.bucket("vk", "token") is registry.bucket("vk", "token")
+    assert registry.bucket("vk", "token") is not registry.bucket("vk", "other")
+    assert registry.bucket("sheets", "account") is None
+    assert registry.bucket("telegram", "@channel") is None
+
+
+def test_retry_after_hints_are_parsed():
+    assert retry_after_seconds({"Retry-After": "7"}) == 7
+    assert retry_after_seconds(payload={"ok": False, "parameters": {"retry_after": 15}}) == 15
+    assert retry_after_seconds(payload={"ok": False, "error": "FLOOD_WAIT_4"}) == 4
+    assert retry_after_seconds({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert retry_after_seconds({}) is None
+
+
+def test_rate_limited_response_defers_bucket():
+    bucket = TokenBucket(rate=100, capacity=5)
+
+    with pytest.raises(RateLimitedError) as error:
+        raise_for_rate_limit(bucket, 429, {}, {"ok": False, "parameters": {"retry_after": 3}})
+
+    assert error.value.retry_after == 3
+    assert bucket._reserve() > 2
+    raise_for_rate_limit(bucket, 200, {}, {"ok": True})
@@ -0,0 +1,122 @@
+"""Тесты политики повторов и предохранителей площадок."""
+
+import pytest
+import requests
+
+from publisher.core.rate_limit import RateLimitedError
+from publisher.core.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    is_retryable,
+    retry_budget,
+    retry_on_exceptions,
+    tenant_scope,
+)
+
+
+def _http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+def _flaky(errors, destination=None):
+    calls = []
+
+    @retry_on_exceptions((requests.RequestException, RateLimitedError), destination=destination)
+    def call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    call.retry.sleep = lambda seconds: None
+    return call, calls
+
+
+def test_classifies_transient_and_terminal_errors():
+    assert is_retryable(requests.ConnectionError())
+    assert is_retryable(_http_error(503))
+    assert is_retryable(_http_error(429))
+    assert is_retryable(RateLimitedError("wait", 1))
+    assert not is_retryable(_http_error(400))
+    assert not is_retryable(_http_error(403))
+    assert not is_retryable(CircuitOpenError("open"))
+
+
+def test_terminal_error_is_not_retried():
+    call, calls = _flaky([_http_error(400)])
+
+    with pytest.raises(requests.HTTPError):
+        call()
+    assert len(calls) == 1
+
+
+def test_transient_error_is_retried():
+    call, calls = _flaky([_http_error(502), requests.Timeout()])
+
+    assert call() == "ok"
+    assert len(calls) == 3
+
+
+def test_flow_budget_limits_retries():
+    call, calls = _flaky([requests.Timeout()] * 2)
+
+    with retry_budget(1):
+        with pytest.raises(requests.Timeout):
+            call()
+    assert len(calls) == 2
+
+
+def test_breaker_opens_after_failures_and_probes_after_timeout(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("publisher.core.retry.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] += 30
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+
+
+def test_open_breaker_fails_fast_without_calling():
+    call, calls = _flaky([requests.ConnectionError()] * 20, destination="test-fail-fast")
+
+    with pytest.raises(requests.ConnectionError):
+        call()
+    with pytest.raises(CircuitOpenError):
+        call()
+    assert len(calls) == 5
+
+    with pytest.raises(CircuitOpenError):
+        call()
+    assert len(calls) == 5
+
+
+def test_breakers_and_budgets_are_kept_per_tenant():
+    call, calls = _flaky([requests.ConnectionError()] * 20, destination="test-tenants")
+
+    with tenant_scope("alpha"):
+        with pytest.raises(requests.ConnectionError):
+            call()
+        with pytest.raises(CircuitOpenError):
+            call()
+    assert len(calls) == 5
+
+    # Недоступность площадки для одного клиента не отключает запросы другого
+    with tenant_scope("beta"), retry_budget(1):
+        with pytest.raises(requests.ConnectionError):
+            call()
+    assert len(calls) == 7
+
+    with tenant_scope("alpha"):
+        with pytest.raises(CircuitOpenError):
+            call()
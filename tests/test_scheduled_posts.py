@@ -0,0 +1,25 @@
+"""Тесты учёта отложенных постов VK."""
+
+from datetime import datetime
+
+import pytz
+
+from publisher.vk.scheduled_posts import ScheduledPosts
+
+
+def test_scheduled_posts_survive_restart_and_are_ordered(tmp_path):
+    path = tmp_path / "vk_scheduled.sqlite3"
+    evening = datetime(2024, 5, 6, 18, 0, tzinfo=pytz.utc)
+    morning = datetime(2024, 5, 6, 8, 0, tzinfo=pytz.utc)
+    store = ScheduledPosts(path)
+    store.add("rss", "b", 12, "https://vk.com/wall-1_12", evening)
+    store.add("rss", "a", 11, "https://vk.com/wall-1_11", morning)
+    store.add("vk", "c", 13, "https://vk.com/wall-1_13", morning)
+
+    restarted = ScheduledPosts(path)
+
+    assert [post.key for post in restarted.all("rss")] == ["a", "b"]
+    assert restarted.get("rss", "b").publish_at == evening
+    restarted.remove("rss", "b")
+    assert restarted.get("rss", "b") is None
+    assert restarted.get("vk", "c").post_id == 13
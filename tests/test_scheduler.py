@@ -0,0 +1,150 @@
+"""Тесты планировщика по cron-выражениям."""
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from publisher.core.scheduler import CronExpression, Job, Scheduler, ScheduleState, parse_publish_at
+
+MOSCOW = pytz.timezone("Europe/Moscow")
+
+
+def _hourly_job(name, minute, calls):
+    return Job(name, CronExpression(f"{minute} * * * *"), pytz.utc, lambda: calls.append(name))
+
+
+def test_cron_next_after_respects_weekdays_and_timezone():
+    cron = CronExpression("0 18 * * mon,wed,5")
+    friday_evening = MOSCOW.localize(datetime(2024, 5, 3, 18, 0))
+    assert cron.next_after(friday_evening, MOSCOW) == MOSCOW.localize(datetime(2024, 5, 6, 18, 0))
+    assert cron.next_after(datetime(2024, 5, 6, 14, 59, tzinfo=pytz.utc), MOSCOW).hour == 18
+
+    sunday = MOSCOW.localize(datetime(2024, 5, 5, 0, 0))
+    assert CronExpression("30 9 * * 0").next_after(sunday, MOSCOW) == CronExpression("30 9 * * 7").next_after(
+        sunday, MOSCOW
+    )
+    assert CronExpression("*/15 8-9 * * *").next_after(MOSCOW.localize(datetime(2024, 5, 5, 9, 50)), MOSCOW) == (
+        MOSCOW.localize(datetime(2024, 5, 6, 8, 0))
+    )
+    with pytest.raises(ValueError):
+        CronExpression("0 25 * * *")
+
+
+def test_missed_window_is_caught_up_once_across_restarts(tmp_path):
+    path = tmp_path / "schedule.sqlite3"
+    now = datetime.now(pytz.utc).replace(second=0, microsecond=0)
+    window = now - timedelta(minutes=30)
+    ScheduleState(path).set("rss", window - timedelta(hours=1))
+    calls = []
+
+    scheduler = Scheduler([_hourly_job("rss", window.minute, calls)], ScheduleState(path), timedelta(hours=6))
+    assert scheduler.next_fire_times()["rss"] == window
+    scheduler.run_due(now)
+    assert calls == ["rss"]
+    assert scheduler.next_fire_times()["rss"] == window + timedelta(hours=1)
+
+    restarted = Scheduler([_hourly_job("rss", window.minute, calls)], ScheduleState(path), timedelta(hours=6))
+    assert restarted.next_fire_times()["rss"] == window + timedelta(hours=1)
+    assert restarted.run_due(now) == []
+    assert calls == ["rss"]
+
+
+def test_window_is_persisted_only_after_completion(tmp_path):
+    path = tmp_path / "schedule.sqlite3"
+    now = datetime.now(pytz.utc).replace(second=0, microsecond=0)
+    window = now - timedelta(minutes=30)
+    ScheduleState(path).set("rss", window - timedelta(hours=1))
+    dispatched = []
+    job = _hourly_job("rss", window.minute, [])
+
+    scheduler = Scheduler([job], ScheduleState(path), timedelta(hours=6), dispatch=dispatched.extend)
+    scheduler.run_due(now)
+    assert [item.fire_at for item in dispatched] == [window]
+
+    # Флоу не завершился (процесс остановлен): после перезапуска окно догоняется
+    restarted = Scheduler([_hourly_job("rss", window.minute, [])], ScheduleState(path), timedelta(hours=6))
+    assert restarted.next_fire_times()["rss"] == window
+
+    scheduler.complete(job, window)
+    restarted = Scheduler([_hourly_job("rss", window.minute, [])], ScheduleState(path), timedelta(hours=6))
+    assert restarted.next_fire_times()["rss"] == window + timedelta(hours=1)
+
+
+def test_stale_window_is_skipped():
+    now = datetime.now(pytz.utc).replace(second=0, microsecond=0)
+    window = now - timedelta(minutes=30)
+    state = ScheduleState()
+    state.set("vk", window - timedelta(hours=1))
+
+    scheduler = Scheduler([_hourly_job("vk", window.minute, [])], state, timedelta(minutes=10))
+
+    assert scheduler.next_fire_times()["vk"] == window + timedelta(hours=1)
+
+
+def test_latest_missed_window_within_catch_up_is_not_dropped():
+    now = datetime.now(pytz.utc).replace(second=0, microsecond=0)
+    window = now - timedelta(minutes=30)
+    state = ScheduleState()
+    state.set("rss", now - timedelta(hours=24, minutes=30))
+    cron = CronExpression(f"{window.minute} {window.hour},{(window.hour + 12) % 24} * * *")
+
+    scheduler = Scheduler([Job("rss", cron, pytz.utc, lambda: None)], state, timedelta(hours=6))
+
+    assert scheduler.next_fire_times()["rss"] == window
+
+
+def test_simultaneous_jobs_are_dispatched_together():
+    batches = []
+    jobs = [_hourly_job(name, 0, []) for name in ("rss", "vk", "setka")]
+    jobs.append(_hourly_job("other", 30, []))
+    scheduler = Scheduler(jobs, ScheduleState(), timedelta(0), dispatch=lambda due: batches.append(due))
+    first = min(scheduler.next_fire_times()[name] for name in ("rss", "vk", "setka"))
+
+    scheduler.run_due(first + timedelta(seconds=1))
+
+    assert [sorted(job.name for job in batch if job.name != "other") for batch in batches][-1] == ["rss", "setka", "vk"]
+    assert all(scheduler.next_fire_times()[name] == first + timedelta(hours=1) for name in ("rss", "vk", "setka"))
+
+
+def test_warm_up_job_fires_before_window_and_is_not_persisted():
+    state = ScheduleState()
+    cron = CronExpression("0 8 * * *")
+    job = Job("rss:warmup", cron, MOSCOW, lambda: None, lead=timedelta(minutes=10), persistent=False)
+    window = cron.next_after(datetime.now(pytz.utc), MOSCOW)
+
+    scheduler = Scheduler([job], state, timedelta(hours=6))
+    fire_at = scheduler.next_fire_times()["rss:warmup"]
+    assert fire_at in (window - timedelta(minutes=10), window + timedelta(days=1) - timedelta(minutes=10))
+
+    scheduler.run_due(fire_at)
+    assert state.get("rss:warmup") is None
+    assert scheduler.next_fire_times()["rss:warmup"] == fire_at + timedelta(days=1)
+
+
+def test_one_shot_jobs_can_be_moved_and_cancelled():
+    calls = []
+    scheduler = Scheduler([], ScheduleState(), timedelta(0))
+    start = datetime(2024, 5, 6, 9, 0, tzinfo=pytz.utc)
+
+    def row_job(name):
+        return Job(name, None, pytz.utc, lambda: calls.append(name), persistent=False)
+
+    scheduler.schedule(row_job("row-a"), start + timedelta(minutes=10))
+    scheduler.schedule(row_job("row-a"), start + timedelta(minutes=30))
+    scheduler.schedule(row_job("row-b"), start + timedelta(minutes=20))
+    scheduler.cancel("row-b")
+
+    assert scheduler.run_due(start + timedelta(minutes=25)) == []
+    assert [job.name for job in scheduler.run_due(start + timedelta(minutes=30))] == ["row-a"]
+    assert calls == ["row-a"]
+    assert scheduler.next_fire_times() == {}
+
+
+def test_parse_publish_at_formats():
+    expected = MOSCOW.localize(datetime(2024, 5, 6, 18, 30))
+    assert parse_publish_at("2024-05-06 18:30", MOSCOW) == expected
+    assert parse_publish_at("06.05.2024 18:30", MOSCOW) == expected
+    assert parse_publish_at("2024-05-06T15:30:00+00:00", MOSCOW) == expected
+    with pytest.raises(ValueError):
+        parse_publish_at("завтра вечером", MOSCOW)
@@ -0,0 +1,270 @@
+"""Тесты клиента Google Sheets."""
+
+from pathlib import Path
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from publisher.config import GoogleSheetsConfig
+from publisher.gs import sheets as sheets_module
+from publisher.gs.mirror import SheetMirror
+from publisher.gs.sheets import RSSRow, SheetsClient, VKRow
+from publisher.gs.table import SheetTable
+
+RSS_VALUES = [
+    ["Status", "GPT Post Title", "GPT Post", "Short Post", "Telegraph Link", "VK Post Link", "TG Post Link", "Notes"],
+    ["Published", "Старый", "Текст", "Коротко", "https://telegra.ph/old", "", "", ""],
+    ["Revised", "Новый", "Текст", "Коротко", "", "", "", ""],
+]
+
+
+def _make_client(monkeypatch, spreadsheet, **options):
+    gspread_client = MagicMock()
+    gspread_client.open_by_key.return_value = spreadsheet
+    monkeypatch.setattr(sheets_module.gspread, "service_account", lambda filename: gspread_client)
+    config = GoogleSheetsConfig(sheet_id="sheet", service_account_json=Path("sa.json"), **options)
+    return SheetsClient(config)
+
+
+@pytest.fixture()
+def spreadsheet():
+    spreadsheet = MagicMock()
+    worksheet = MagicMock()
+    worksheet.get_all_values.return_value = RSS_VALUES
+    worksheet.row_values.return_value = RSS_VALUES[0]
+    spreadsheet.worksheet.return_value = worksheet
+    return spreadsheet
+
+
+def _rss_row(row_number: int) -> RSSRow:
+    return RSSRow(
+        row_number=row_number,
+        gpt_post_title="Новый",
+        gpt_post="Текст",
+        short_post="Коротко",
+        average_post="",
+        link="",
+        image_url="",
+        telegraph_link="",
+        vk_post_link="",
+        telegram_post_link="",
+        status="Revised",
+    )
+
+
+def test_update_rss_row_sends_single_batch(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet)
+
+    client.update_rss_row(_rss_row(3), "https://telegra.ph/new", "https://vk.com/wall-1_1", "https://t.me/c/1")
+
+    spreadsheet.values_batch_update.assert_called_once()
+    body = spreadsheet.values_batch_update.call_args[0][0]
+    assert body["valueInputOption"] == "RAW"
+    assert {item["range"]: item["values"] for item in body["data"]} == {
+        "'RSS'!E3": [["https://telegra.ph/new"]],
+        "'RSS'!F3": [["https://vk.com/wall-1_1"]],
+        "'RSS'!G3": [["https://t.me/c/1"]],
+        "'RSS'!A3": [["Published"]],
+        "'RSS'!H3": [[""]],
+    }
+
+
+def test_write_behind_defers_updates_until_flush(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet, write_behind=True)
+
+    client.write_rss_error(_rss_row(3), "Ошибка")
+    client.update_rss_row(_rss_row(2), "https://telegra.ph/a", "https://vk.com/wall-1_2", "https://t.me/c/2")
+    spreadsheet.values_batch_update.assert_not_called()
+
+    client.flush()
+    client.flush()
+
+    spreadsheet.values_batch_update.assert_called_once()
+    ranges = [item["range"] for item in spreadsheet.values_batch_update.call_args[0][0]["data"]]
+    assert "'RSS'!H3" in ranges
+    assert "'RSS'!A2" in ranges
+
+
+def test_deferred_writes_do_not_leak_into_concurrent_flows(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet)
+    entered, release = threading.Event(), threading.Event()
+
+    def batch_flow():
+        with client.deferred_writes():
+            client.write_rss_error(_rss_row(2), "Ошибка")
+            entered.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=batch_flow)
+    worker.start()
+    entered.wait(5)
+    client.write_rss_error(_rss_row(3), "Другая ошибка")
+    assert spreadsheet.values_batch_update.call_count == 1
+    release.set()
+    worker.join(5)
+
+    client.write_rss_error(_rss_row(3), "Ещё ошибка")
+    assert spreadsheet.values_batch_update.call_count == 2
+
+
+def test_mark_vk_published_skips_unknown_headers(monkeypatch, spreadsheet):
+    spreadsheet.worksheet.return_value.row_values.return_value = ["Status", "Post Link"]
+    client = _make_client(monkeypatch, spreadsheet)
+    row = VKRow(row_number=2, title="", content="", image_url="", post_link="", status="Revised")
+
+    client.mark_vk_published(row, "https://vk.com/wall-1_5")
+
+    data = spreadsheet.values_batch_update.call_args[0][0]["data"]
+    assert [item["range"] for item in data] == ["'VK'!B2", "'VK'!A2"]
+
+
+def test_publish_cycle_reads_sheet_once(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet)
+    worksheet = spreadsheet.worksheet.return_value
+
+    rows = client.fetch_rss_ready_rows()
+    client.update_rss_row(rows[0], "https://telegra.ph/new", "", "")
+    client.write_rss_error(rows[0], "Ошибка")
+
+    worksheet.get_all_values.assert_called_once()
+    worksheet.row_values.assert_not_called()
+    spreadsheet.worksheet.assert_called_once_with("RSS")
+
+
+def test_header_mismatch_reloads_schema(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet)
+    worksheet = spreadsheet.worksheet.return_value
+    worksheet.get_all_values.return_value = [["Status", "Telegraph Link"], ["Revised", ""]]
+    worksheet.row_values.return_value = ["Notes", "Status"]
+    rows = client.fetch_rss_ready_rows()
+
+    client.write_rss_error(rows[0], "Ошибка")
+    client.write_rss_error(rows[0], "Ошибка")
+
+    worksheet.row_values.assert_called_once_with(1)
+    data = spreadsheet.values_batch_update.call_args[0][0]["data"]
+    assert data == [{"range": "'RSS'!A2", "values": [["Ошибка"]]}]
+
+
+def test_projected_reads_fetch_only_needed_columns(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet, projected_reads=True)
+    worksheet = spreadsheet.worksheet.return_value
+    worksheet.row_values.return_value = ["Summary", "Status", "GPT Post Title", "GPT Post", "Notes", "Link"]
+    spreadsheet.values_batch_get.side_effect = [
+        {"valueRanges": [{"values": [["Published"], [], ["Revised"], ["revised"]]}]},
+        {
+            "valueRanges": [
+                {"values": [["Заголовок", " Текст "]]},
+                {"values": [["https://example.com"]]},
+            ]
+        },
+    ]
+
+    rows = client.fetch_rss_ready_rows(limit=1)
+
+    worksheet.get_all_values.assert_not_called()
+    assert spreadsheet.values_batch_get.call_args_list[0][0][0] == ["'RSS'!B2:B"]
+    assert spreadsheet.values_batch_get.call_args_list[1][0][0] == ["'RSS'!C4:D4", "'RSS'!F4:F4"]
+    assert len(rows) == 1
+    assert rows[0].row_number == 4
+    assert rows[0].gpt_post_title == "Заголовок"
+    assert rows[0].gpt_post == "Текст"
+    assert rows[0].link == "https://example.com"
+    assert rows[0].status == "Revised"
+
+
+def test_snapshot_serves_reads_and_reflects_writes(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet)
+    spreadsheet.values_batch_get.return_value = {
+        "valueRanges": [
+            {"values": [row[:] for row in RSS_VALUES]},
+            {"values": [["Status", "Title", "Post Link"], ["Revised", "Пост VK", ""]]},
+        ]
+    }
+
+    client.snapshot(["RSS", "VK"])
+    rss_rows = client.fetch_rss_ready_rows()
+    vk_rows = client.fetch_vk_rows()
+    client.update_rss_row(rss_rows[0], "https://telegra.ph/new", "", "")
+
+    spreadsheet.values_batch_get.assert_called_once_with(["'RSS'", "'VK'"])
+    spreadsheet.worksheet.assert_not_called()
+    assert [row.row_number for row in rss_rows] == [3]
+    assert vk_rows[0].title == "Пост VK"
+    assert client.fetch_rss_ready_rows() == []
+
+
+def test_snapshot_keeps_sheet_values_when_flush_fails(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet)
+    spreadsheet.values_batch_get.return_value = {"valueRanges": [{"values": [row[:] for row in RSS_VALUES]}]}
+    client.snapshot(["RSS"])
+    (row,) = client.fetch_rss_ready_rows()
+    spreadsheet.values_batch_update.side_effect = RuntimeError("Sheets недоступен")
+
+    with pytest.raises(RuntimeError):
+        client.update_rss_row(row, "https://telegra.ph/new", "", "")
+
+    assert [row.row_number for row in client.fetch_rss_ready_rows()] == [3]
+    spreadsheet.values_batch_update.side_effect = None
+    client.flush()
+    assert client.fetch_rss_ready_rows() == []
+
+
+def test_expired_snapshot_falls_back_to_full_read(monkeypatch, spreadsheet):
+    client = _make_client(monkeypatch, spreadsheet, snapshot_ttl=-1)
+    spreadsheet.values_batch_get.return_value = {"valueRanges": [{"values": [["Status"], ["Revised"]]}]}
+
+    client.snapshot(["RSS"])
+    rows = client.fetch_rss_ready_rows()
+
+    spreadsheet.worksheet.return_value.get_all_values.assert_called_once()
+    assert [row.row_number for row in rows] == [3]
+
+
+def test_mirror_skips_reads_when_sheet_unchanged(monkeypatch, spreadsheet, tmp_path):
+    client = _make_client(monkeypatch, spreadsheet, snapshot_ttl=-1, mirror_path=tmp_path / "mirror.sqlite3")
+    spreadsheet.get_lastUpdateTime.return_value = "2024-01-01T00:00:00Z"
+    spreadsheet.values_batch_get.return_value = {"valueRanges": [{"values": [row[:] for row in RSS_VALUES]}]}
+
+    first = client.fetch_rss_ready_rows()
+    second = client.fetch_rss_ready_rows()
+
+    spreadsheet.values_batch_get.assert_called_once_with(["'RSS'"])
+    spreadsheet.worksheet.assert_not_called()
+    assert first == second
+    assert [row.row_number for row in second] == [3]
+
+    spreadsheet.values_batch_update.side_effect = RuntimeError("Sheets недоступен")
+    with pytest.raises(RuntimeError):
+        client.update_rss_row(second[0], "https://telegra.ph/new", "", "")
+    # Незаписанный статус не попадает в зеркало: после перезапуска строка снова ждёт публикации
+    restarted = _make_client(monkeypatch, spreadsheet, snapshot_ttl=-1, mirror_path=tmp_path / "mirror.sqlite3")
+    assert [row.row_number for row in restarted.fetch_rss_ready_rows()] == [3]
+
+    spreadsheet.values_batch_update.side_effect = None
+    client.flush()
+    assert client.fetch_rss_ready_rows() == []
+
+
+def test_mirror_reindexes_only_changed_rows(tmp_path):
+    mirror = SheetMirror(tmp_path / "mirror.sqlite3")
+    values = [["Status", "Title"], ["Published", "Первый"], ["Revised", "Второй"]]
+
+    assert mirror.apply("VK", values, "t1") == 2
+    assert mirror.apply("VK", [values[0], values[1], ["Published", "Второй"]], "t2") == 1
+    assert mirror.modified_time("VK") == "t2"
+    assert mirror.rows("VK", status="Revised") == (["Status", "Title"], [])
+    assert mirror.rows("VK", status="published")[1] == [(2, ["Published", "Первый"]), (3, ["Published", "Второй"])]
+
+
+def test_sheet_table_builds_only_requested_columns():
+    table = SheetTable.from_values([[" Status ", "Title", "Summary"], ["Revised ", " Пост", "длинный текст"], ["Published"]])
+
+    views = list(table.where("Status", "revised"))
+
+    assert [view.row_number for view in views] == [2]
+    assert views[0].get("Title") == "Пост"
+    assert views[0].get("Missing") == ""
+    assert sorted(table._columns) == [0, 1]
+    assert not hasattr(RSSRow(2, "", "", "", "", "", "", "", "", "", ""), "__dict__")
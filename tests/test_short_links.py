@@ -0,0 +1,31 @@
+"""Тесты кэша сокращённых ссылок."""
+
+from publisher.vk.short_links import ShortLinkCache
+
+
+def test_short_links_survive_restart(tmp_path):
+    path = tmp_path / "short_links.sqlite3"
+    ShortLinkCache(path, ttl=60).put("https://telegra.ph/a", "https://vk.cc/a")
+
+    cache = ShortLinkCache(path, ttl=60)
+
+    assert cache.get("https://telegra.ph/a") == "https://vk.cc/a"
+    assert cache.get("https://telegra.ph/a") == "https://vk.cc/a"
+    assert cache.get("https://telegra.ph/b") is None
+    assert cache.stats() == {"memory_hits": 1, "disk_hits": 1, "misses": 1, "hit_rate": 0.667}
+
+
+def test_expired_short_links_are_ignored(tmp_path):
+    cache = ShortLinkCache(tmp_path / "short_links.sqlite3", ttl=-1)
+    cache.put("https://telegra.ph/a", "https://vk.cc/a")
+
+    assert cache.get("https://telegra.ph/a") is None
+
+
+def test_memory_lru_is_bounded(tmp_path):
+    cache = ShortLinkCache(tmp_path / "short_links.sqlite3", ttl=60, memory_size=1)
+    cache.put("https://telegra.ph/a", "https://vk.cc/a")
+    cache.put("https://telegra.ph/b", "https://vk.cc/b")
+
+    assert cache.get("https://telegra.ph/a") == "https://vk.cc/a"
+    assert cache.stats()["disk_hits"] == 1
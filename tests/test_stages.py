@@ -0,0 +1,45 @@
+"""Тесты исполнителя графа этапов."""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from publisher.core.stages import StageGraph
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def stage(value):
+        # Оба этапа должны одновременно дойти до барьера, иначе тест завершится по таймауту
+        barrier.wait()
+        return value
+
+    graph = StageGraph()
+    graph.add("left", lambda: stage("L"))
+    graph.add("right", lambda: stage("R"))
+    graph.add("join", lambda left, right: left + right, after=["left", "right"])
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = graph.run(executor)
+
+    assert results["join"] == "LR"
+
+
+def test_failed_stage_skips_dependents_and_raises():
+    calls = []
+    graph = StageGraph()
+    graph.add("first", lambda: (_ for _ in ()).throw(RuntimeError("сбой")))
+    graph.add("second", lambda first: calls.append(first), after=["first"])
+
+    with ThreadPoolExecutor(max_workers=2) as executor, pytest.raises(RuntimeError, match="сбой"):
+        graph.run(executor)
+
+    assert calls == []
+
+
+def test_unknown_dependency_is_rejected():
+    graph = StageGraph()
+    with pytest.raises(ValueError):
+        graph.add("stage", lambda missing: None, after=["missing"])
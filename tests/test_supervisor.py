@@ -0,0 +1,133 @@
+"""Тесты распределения клиентов по процессам."""
+
+from datetime import datetime
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+import pytz
+
+from publisher.config import check_tenant_state_paths, load_config, load_tenants
+from publisher.core.scheduler import CronExpression, Job
+from publisher.run import SharedResources, TenantRunner, run_forever
+from publisher.supervisor import assign_groups, group_tenants
+
+
+def _config(vk_token, bot_token, account="sa.json"):
+    return SimpleNamespace(
+        vk=SimpleNamespace(user_access_token=vk_token),
+        telegram=SimpleNamespace(bot_token=bot_token),
+        google=SimpleNamespace(service_account_json=account),
+    )
+
+
+def test_tenants_sharing_tokens_land_in_one_group():
+    configs = {
+        "a": _config("vk-1", "bot-1", "a.json"),
+        "b": _config("vk-2", "bot-2", "b.json"),
+        "c": _config("vk-3", "bot-1", "c.json"),
+        "d": _config("vk-2", "bot-4", "d.json"),
+    }
+
+    groups = group_tenants(configs)
+
+    assert sorted(sorted(group) for group in groups) == [["a", "c"], ["b", "d"]]
+
+
+def test_groups_are_balanced_across_processes():
+    slots = assign_groups([["a", "b", "c"], ["d"], ["e"], ["f", "g"]], processes=2)
+
+    assert sorted(len(slot) for slot in slots) == [3, 4]
+    assert assign_groups([["a"]], processes=4) == [["a"]]
+
+
+def test_load_tenants_validates_names(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": [{"name": "alpha", "env": {"VK_GROUP_ID": 1}}]}), encoding="utf-8")
+    assert load_tenants(path)[0].env == {"VK_GROUP_ID": "1"}
+
+    path.write_text(json.dumps([{"name": "alpha"}, {"name": "alpha"}]), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_tenants(path)
+
+
+def _set_base_env(tmp_path, monkeypatch):
+    account = tmp_path / "sa.json"
+    account.write_text("{}", encoding="utf-8")
+    base = {
+        "GOOGLE_SHEET_ID": "sheet",
+        "GOOGLE_SERVICE_ACCOUNT_JSON": str(account),
+        "TELEGRAPH_AUTHOR_NAME": "Автор",
+        "TELEGRAPH_AUTHOR_URL": "https://example.com",
+        "VK_USER_ACCESS_TOKEN": "token",
+        "VK_GROUP_ID": "1",
+        "TELEGRAM_BOT_TOKEN": "bot",
+        "TELEGRAM_CHANNEL_USERNAME": "@channel",
+        "PUBLISH_JOURNAL_PATH": str(tmp_path / "journal.sqlite3"),
+        "SHEETS_MIRROR_PATH": str(tmp_path / "mirror.sqlite3"),
+        "QUEUE_PATH": str(tmp_path / "queue.sqlite3"),
+        "IMAGE_CACHE_DIR": str(tmp_path / "images"),
+        "VK_SHORT_LINK_CACHE_PATH": str(tmp_path / "short_links.sqlite3"),
+    }
+    for key, value in base.items():
+        monkeypatch.setenv(key, value)
+
+
+def test_tenants_get_separate_state_files(tmp_path, monkeypatch):
+    _set_base_env(tmp_path, monkeypatch)
+    configs = {name: load_config({"GOOGLE_SHEET_ID": name}, tenant=name) for name in ("alpha", "beta")}
+
+    assert configs["alpha"].journal_path == tmp_path / "alpha" / "journal.sqlite3"
+    assert configs["beta"].google.mirror_path == tmp_path / "beta" / "mirror.sqlite3"
+    assert configs["alpha"].queue.path != configs["beta"].queue.path
+    assert configs["alpha"].image_cache.directory == tmp_path / "alpha" / "images"
+    assert configs["beta"].vk.short_link_cache_path == tmp_path / "beta" / "short_links.sqlite3"
+    check_tenant_state_paths(configs)
+
+    shared = str(tmp_path / "shared-queue.sqlite3")
+    configs = {name: load_config({"QUEUE_PATH": shared}, tenant=name) for name in ("alpha", "beta")}
+    with pytest.raises(ValueError):
+        check_tenant_state_paths(configs)
+
+
+def test_image_normalize_requires_cache_dir(tmp_path, monkeypatch):
+    _set_base_env(tmp_path, monkeypatch)
+
+    with pytest.raises(ValueError, match="IMAGE_CACHE_DIR"):
+        load_config({"IMAGE_NORMALIZE": "true", "IMAGE_CACHE_DIR": ""})
+    assert load_config({"IMAGE_NORMALIZE": "true", "IMAGE_CACHE_DIR": str(tmp_path / "images")}).image_cache.normalize
+
+
+def test_tenant_name_with_colon_dispatches_its_own_flow():
+    config = SimpleNamespace(schedule=SimpleNamespace(timezone="UTC", publish_at_scan=""))
+    runner = TenantRunner("team:alpha", config, MagicMock(), MagicMock())
+    runner.bind(MagicMock())
+    dispatcher = MagicMock()
+    dispatcher.busy.return_value = False
+    job = Job("team:alpha:vk", CronExpression("0 18 * * *"), pytz.utc, lambda: None, group="team:alpha")
+    job.fire_at = datetime(2024, 5, 6, 18, 0, tzinfo=pytz.utc)
+
+    runner.run([job], dispatcher)
+
+    dispatcher.submit.assert_called_once()
+    assert dispatcher.submit.call_args.args[0] == "team:alpha:vk"
+
+
+def test_shared_resources_are_closed_after_runners_stop(tmp_path, monkeypatch):
+    monkeypatch.setattr("publisher.run.Scheduler.run_forever", lambda self, stop: None)
+    monkeypatch.setattr("publisher.run.signal.signal", lambda *args: None)
+    events = []
+    runner = MagicMock()
+    runner.name = "alpha"
+    runner.jobs.return_value = []
+    runner.close.side_effect = lambda: events.append("runner")
+    normalizer = MagicMock()
+    normalizer.close.side_effect = lambda: events.append("normalizer")
+    shared = SharedResources(rate_limits=MagicMock(), session=MagicMock(), normalizer=normalizer)
+    schedule = SimpleNamespace(flow_workers=1, state_path=tmp_path / "state.sqlite3", catch_up_hours=0, drain_seconds=0)
+
+    run_forever([runner], schedule, shared)
+
+    assert events == ["runner", "normalizer"]
+    shared.session.close.assert_called_once()
@@ -0,0 +1,220 @@
+"""Тесты клиента VK."""
+
+from contextlib import nullcontext
+from datetime import datetime
+from io import BytesIO
+from unittest.mock import MagicMock
+
+import pytest
+import pytz
+import requests
+
+from publisher.config import VKConfig
+from publisher.vk.client import UploadedPhoto, VKClient, VKError
+from publisher.vk.short_links import ShortLinkCache
+
+
+def _make_client(upload_url_ttl=900.0):
+    client = VKClient(VKConfig(user_access_token="token", group_id=1, upload_url_ttl=upload_url_ttl))
+    servers = iter(["https://upload/1", "https://upload/2"])
+
+    def api_call(method, **params):
+        if method == "photos.getWallUploadServer":
+            return {"upload_url": next(servers)}
+        raise AssertionError(method)
+
+    client._api_call = MagicMock(side_effect=api_call)
+    client._open_image = MagicMock(side_effect=lambda url: nullcontext((BytesIO(b"img"), "image/jpeg", "a.jpg")))
+    client._session = MagicMock()
+    return client
+
+
+def _json_response(data):
+    response = MagicMock()
+    response.json.return_value = data
+    return response
+
+
+def _server_calls(client):
+    return [call for call in client._api_call.call_args_list if call.args[0] == "photos.getWallUploadServer"]
+
+
+def test_upload_url_is_reused_between_posts():
+    client = _make_client()
+    client._session.post.return_value = _json_response({"photo": "p", "server": 1, "hash": "h"})
+
+    assert client.upload_photo("https://img/1.jpg") == UploadedPhoto("p", 1, "h")
+    client.upload_photo("https://img/2.jpg")
+
+    assert len(_server_calls(client)) == 1
+    assert [call.args[0] for call in client._session.post.call_args_list] == ["https://upload/1", "https://upload/1"]
+
+
+def test_rejected_upload_url_is_refreshed():
+    client = _make_client()
+    client._session.post.side_effect = [
+        _json_response({"photo": "p", "server": 1, "hash": "h"}),
+        _json_response({"error": "upload url expired"}),
+        _json_response({"photo": "p", "server": 1, "hash": "h"}),
+    ]
+
+    client.upload_photo("https://img/1.jpg")
+    client.upload_photo("https://img/2.jpg")
+
+    assert len(_server_calls(client)) == 2
+    assert client._session.post.call_args.args[0] == "https://upload/2"
+
+
+def test_zero_ttl_requests_upload_url_every_time():
+    client = _make_client(upload_url_ttl=0)
+    client._session.post.return_value = _json_response({"photo": "p", "server": 1, "hash": "h"})
+
+    client.upload_photo("https://img/1.jpg")
+    client.upload_photo("https://img/2.jpg")
+
+    assert len(_server_calls(client)) == 2
+
+
+def test_publish_post_saves_photo_and_posts_in_one_execute():
+    client = _make_client()
+    client._session.post.side_effect = [
+        _json_response({"photo": "p", "server": 1, "hash": "h"}),
+        _json_response({"response": [[{"owner_id": -1, "id": 7}], {"post_id": 5}]}),
+    ]
+
+    link = client.publish_post("Текст", "https://img/1.jpg")
+
+    assert link == "https://vk.com/wall-1_5"
+    assert client._session.post.call_count == 2
+    code = client._session.post.call_args.kwargs["data"]["code"]
+    assert "API.photos.saveWallPhoto" in code and "API.wall.post" in code
+    assert '"message": "Текст"' in code
+
+
+def test_publish_post_raises_error_of_failed_execute_call():
+    client = _make_client()
+    client._session.post.return_value = _json_response(
+        {
+            "response": [[{"owner_id": -1, "id": 7}], False],
+            "execute_errors": [{"method": "wall.post", "error_code": 214, "error_msg": "Access denied"}],
+        }
+    )
+
+    with pytest.raises(VKError, match="Access denied"):
+        client.publish_post("Текст", "", attachment=UploadedPhoto("p", 1, "h"))
+
+
+def test_postponed_post_passes_publish_date_and_is_listed_by_pages():
+    client = _make_client()
+    client._api_call = MagicMock(return_value={"post_id": 9})
+    publish_date = datetime(2024, 5, 6, 15, 0, tzinfo=pytz.utc)
+
+    assert client.publish_post("Текст", "", attachment="photo-1_7", publish_date=publish_date) == "https://vk.com/wall-1_9"
+    assert client._api_call.call_args.kwargs["publish_date"] == 1715007600
+
+    client.WALL_PAGE_SIZE = 2
+    client._api_call = MagicMock(
+        side_effect=[{"count": 3, "items": [{"id": 9}, {"id": 10}]}, {"count": 3, "items": [{"id": 11}]}]
+    )
+    assert client.postponed_post_ids() == {9, 10, 11}
+    assert [call.kwargs["offset"] for call in client._api_call.call_args_list] == [0, 2]
+
+    client._api_call = MagicMock(
+        side_effect=[
+            {"count": 4, "items": [{"id": 40}, {"id": 39, "postponed_id": 10}]},
+            {"count": 4, "items": [{"id": 38, "postponed_id": 9}, {"id": 37}]},
+        ]
+    )
+    assert client.published_posts({9, 10}) == {9: "https://vk.com/wall-1_38", 10: "https://vk.com/wall-1_39"}
+
+
+def test_get_short_links_batches_and_skips_failures():
+    client = _make_client()
+    client._session.post.return_value = _json_response(
+        {
+            "response": [{"short_url": "https://vk.cc/a"}, False],
+            "execute_errors": [{"method": "utils.getShortLink", "error_code": 100, "error_msg": "bad url"}],
+        }
+    )
+
+    short_links = client.get_short_links(["https://a", "https://b", "https://a"])
+
+    assert short_links == {"https://a": "https://vk.cc/a"}
+    client._session.post.assert_called_once()
+
+
+def test_short_links_are_served_from_cache(tmp_path):
+    cache = ShortLinkCache(tmp_path / "short_links.sqlite3", ttl=60)
+    client = VKClient(VKConfig(user_access_token="token", group_id=1), short_link_cache=cache)
+    client._api_call = MagicMock(return_value={"short_url": "https://vk.cc/a"})
+    client._session = MagicMock()
+    client._session.post.return_value = _json_response({"response": [{"short_url": "https://vk.cc/b"}]})
+
+    assert client.get_short_link("https://a") == "https://vk.cc/a"
+    assert client.get_short_link("https://a") == "https://vk.cc/a"
+    assert client.get_short_links(["https://a", "https://b"]) == {
+        "https://a": "https://vk.cc/a",
+        "https://b": "https://vk.cc/b",
+    }
+
+    client._api_call.assert_called_once()
+    assert "https://a" not in client._session.post.call_args.kwargs["data"]["code"]
+
+
+def test_upload_body_is_rewound_between_attempts(monkeypatch):
+    client = _make_client()
+    bodies = []
+
+    def post(url, data, **kwargs):
+        bodies.append(b"".join(data))
+        if len(bodies) == 1:
+            return _json_response({"photo": "[]"})
+        return _json_response({"photo": "p", "server": 1, "hash": "h"})
+
+    client._session.post.side_effect = post
+    monkeypatch.setattr(VKClient._upload_photo.retry, "sleep", lambda seconds: None)
+
+    client.upload_photo("https://img/1.jpg")
+
+    assert len(bodies) == 2
+    assert bodies[0] == bodies[1]
+    assert b"\r\n\r\nimg\r\n" in bodies[0]
+
+
+def test_server_error_is_not_retried_for_wall_post(monkeypatch):
+    client = VKClient(VKConfig(user_access_token="token", group_id=1))
+    client._session = MagicMock()
+    client._session.post.return_value = _json_response({"error": {"error_code": 10, "error_msg": "Internal"}})
+    client._session.post.return_value.status_code = 200
+    client._session.post.return_value.headers = {}
+    monkeypatch.setattr(VKClient._send.retry, "sleep", lambda seconds: None)
+    monkeypatch.setattr(VKClient._send_post.retry, "sleep", lambda seconds: None)
+
+    with pytest.raises(VKError):
+        client._create_post({"owner_id": -1, "message": "text"}, "photo1_2")
+    assert client._session.post.call_count == 1
+
+    with pytest.raises(VKError):
+        client._api_call("wall.delete", owner_id=-1, post_id=5)
+    assert client._session.post.call_count > 2
+
+
+def test_read_timeout_is_not_retried_for_wall_post(monkeypatch):
+    client = VKClient(VKConfig(user_access_token="token", group_id=1))
+    client._session = MagicMock()
+    monkeypatch.setattr(VKClient._send_post.retry, "sleep", lambda seconds: None)
+    created = _json_response({"response": {"post_id": 7}})
+    created.status_code = 200
+    created.headers = {}
+
+    # Таймаут ответа: запись могла быть создана, повтор опубликовал бы её дважды
+    client._session.post.side_effect = requests.ReadTimeout("read timed out")
+    with pytest.raises(requests.ReadTimeout):
+        client._create_post({"owner_id": -1, "message": "text"}, "photo1_2")
+    assert client._session.post.call_count == 1
+
+    # Соединение не установлено: запрос до VK не дошёл, повтор безопасен
+    client._session.post.reset_mock()
+    client._session.post.side_effect = [requests.ConnectTimeout("connect timed out"), created]
+    assert client._create_post({"owner_id": -1, "message": "text"}, "photo1_2") == 7
+    assert client._session.post.call_count == 2
@@ -0,0 +1,43 @@
+"""Тесты локальной очереди публикаций."""
+
+from publisher.core.work_queue import WorkQueue
+
+
+def test_claim_hides_item_until_visibility_timeout(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("publisher.core.work_queue.time.time", lambda: now[0])
+    queue = WorkQueue(tmp_path / "queue.sqlite3", visibility_timeout=60, max_attempts=2)
+    queue.sync("rss", [("a", 1.0, {"row": 1}), ("b", 5.0, {"row": 2})])
+
+    first = queue.claim("rss", limit=1)
+    assert [item.payload for item in first] == [{"row": 2}]
+    assert [item.key for item in queue.claim("rss", limit=5)] == ["a"]
+    assert queue.claim("rss") == []
+
+    now[0] += 61
+    retried = queue.claim("rss", limit=5)
+    assert sorted(item.key for item in retried) == ["a", "b"]
+    assert {item.attempts for item in retried} == {2}
+
+    now[0] += 61
+    assert queue.claim("rss", limit=5) == []
+
+
+def test_sync_deduplicates_and_drops_vanished_rows(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+
+    assert queue.sync("vk", [("a", 0, {"v": 1}), ("b", 0, {})]) == 2
+    assert queue.sync("vk", [("a", 0, {"v": 2})]) == 0
+    assert queue.size("vk") == 1
+    assert queue.claim("vk")[0].payload == {"v": 2}
+
+
+def test_acked_item_is_not_requeued_while_row_is_still_scanned(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+    queue.sync("setka", [("a", 0, {})])
+    queue.ack(queue.claim("setka")[0])
+
+    assert queue.sync("setka", [("a", 0, {})]) == 0
+    assert queue.claim("setka") == []
+    queue.sync("setka", [])
+    assert queue.sync("setka", [("a", 0, {})]) == 1